@@ -0,0 +1,2 @@
+# benchmarks/__init__.py
+# Run the benchmarks from the repository root, e.g. `python -m benchmarks.decode_worker_backends`
@@ -0,0 +1,93 @@
+"""
+Compares the decoder's worker backends on synthetic DATACONTENT frames:
+  - process: multiprocessing.Pool, frames handed over through the SharedFrameRing
+  - thread:  ThreadPoolExecutor sharing the frames, with the numba kernels running without the GIL
+
+Usage (from the repository root):
+  python -m benchmarks.decode_worker_backends [--workers 8 16 32] [--frames 256] [--distinct-frames 16]
+"""
+import argparse
+import time
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import Pool, cpu_count
+from libs.config_loader import load_config
+from libs.content_type import ContentType
+from libs.build_config_params import build_config_params
+from libs.encode_frame import encode_frame
+from libs.process_frame_optimized import process_frame_optimized
+from libs.decode_worker import init_decode_worker, decode_frame_task
+from libs.SharedFrameRing import SharedFrameRing
+from libs.thread_pool_imap import thread_pool_imap
+
+
+def make_frames(config, distinct_frames):
+    """Renders `distinct_frames` frames of random symbols with the encoder's own encode_frame(...)."""
+    rng = np.random.default_rng(0)
+    symbols = np.array(list(config['encoding_color_map'].keys()))
+    databoxes_per_frame = config['usable_databoxes_in_frame'][ContentType.DATACONTENT.value]
+    frames = []
+    for _ in range(distinct_frames):
+        frame_data = ''.join(rng.choice(symbols, databoxes_per_frame))
+        blank_frame = np.zeros((config['frame_height'], config['frame_width'], 3), dtype=np.uint8)
+        frames.extend(encode_frame(([blank_frame], config, frame_data, ContentType.DATACONTENT, False)))
+    return frames
+
+
+def make_tasks(config_params, frames_or_slots, frame_count):
+    # A frame_index far from the end, so that no frame is treated as the last one
+    num_frames = frame_count * 2 + 2
+    for frame_index in range(frame_count):
+        yield (config_params, ContentType.DATACONTENT, frames_or_slots[frame_index % len(frames_or_slots)], frame_index, 1, None, num_frames, 0, None)
+
+
+def run_process_backend(config_params, frames, workers, frame_count):
+    frame_ring = SharedFrameRing(len(frames), frames[0].shape)
+    for slot_index, frame in enumerate(frames):
+        frame_ring.slots[slot_index][...] = frame
+    with Pool(workers, initializer=init_decode_worker, initargs=(frame_ring.name, frame_ring.slot_count, frame_ring.frame_shape)) as pool:
+        # Warm up the JIT in every worker before timing
+        list(pool.imap_unordered(decode_frame_task, make_tasks(config_params, list(range(len(frames))), workers * 2)))
+        start_time = time.perf_counter()
+        for _ in pool.imap_unordered(decode_frame_task, make_tasks(config_params, list(range(len(frames))), frame_count)):
+            pass
+        elapsed = time.perf_counter() - start_time
+    frame_ring.close()
+    return elapsed
+
+
+def run_thread_backend(config_params, frames, workers, frame_count):
+    with ThreadPoolExecutor(workers) as executor:
+        list(thread_pool_imap(executor, process_frame_optimized, make_tasks(config_params, frames, workers * 2), workers * 2, ordered=False))
+        start_time = time.perf_counter()
+        for _ in thread_pool_imap(executor, process_frame_optimized, make_tasks(config_params, frames, frame_count), workers * 2, ordered=False):
+            pass
+        elapsed = time.perf_counter() - start_time
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the decoder's process and thread worker backends.")
+    parser.add_argument("--config", default="config.ini")
+    parser.add_argument("--workers", type=int, nargs="+", default=[8, 16, 32])
+    parser.add_argument("--frames", type=int, default=256, help="Frames decoded per run.")
+    parser.add_argument("--distinct-frames", type=int, default=16, help="Distinct synthetic frames, reused round-robin.")
+    args = parser.parse_args()
+
+    config = load_config(args.config)
+    config_params = build_config_params(config)["DATACONTENT"]
+    frames = make_frames(config, args.distinct_frames)
+    payload_bytes_per_frame = config_params["databoxes_per_frame"] * config["encoding_bits_per_value"] / 8
+
+    print(f"{cpu_count()} cores, {args.frames} frames of {frames[0].shape[1]}x{frames[0].shape[0]}, "
+          f"{config_params['databoxes_per_frame']} boxes per frame (Base{config['encoding_base']}, box step {config_params['box_step']})")
+    print(f"{'backend':>8} {'workers':>8} {'seconds':>9} {'frames/s':>10} {'MB/s':>8}")
+    for workers in args.workers:
+        for backend, run_backend in (("process", run_process_backend), ("thread", run_thread_backend)):
+            elapsed = run_backend(config_params, frames, workers, args.frames)
+            print(f"{backend:>8} {workers:>8} {elapsed:>9.3f} {args.frames / elapsed:>10.1f} "
+                  f"{args.frames * payload_bytes_per_frame / elapsed / 1e6:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
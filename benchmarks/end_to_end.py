@@ -0,0 +1,252 @@
+"""
+Times the whole pipeline on synthetic payloads, stage by stage, on local files:
+  - encode: process_video_frames(...), the payload to the video segments
+  - merge:  merge_mp4_files_incremental(...), the segments to the final video
+  - decode: process_images(...), the video back to the payload (checked against it)
+
+Every stage runs in a process of its own, so its peak RSS (of its largest process, itself or one of its workers or ffmpeg)
+and CPU time (of all of them) are its own. The stages run in a scratch directory holding a copy of the config as config.ini,
+like the scripts expect in their working directory.
+
+The results are compared against a baseline saved by an earlier run (--save-baseline), a stage slower (MB/s) or bigger (peak RSS)
+than the baseline by more than --tolerance fails the run. Baselines only compare on the machine they were saved on.
+
+Usage (from the repository root):
+  python -m benchmarks.end_to_end [--sizes-mb 8 64] [--entropy-bits 8 4] [--output results.json] [--save-baseline]
+"""
+import argparse
+import filecmp
+import json
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+import cv2
+import numpy as np
+from libs.config_loader import load_config
+from libs.frame_index import get_frame_index_path
+
+try:
+    import resource
+except ImportError:  # Windows, the stages are only timed
+    resource = None
+
+STAGES = ("encode", "merge", "decode")
+DEFAULT_BASELINE_PATH = os.path.join("benchmarks", "end_to_end_baseline.json")
+
+
+def write_payload(payload_path, size, entropy_bits, seed, chunk_size=16 * 1024 * 1024):
+    """Writes `size` random bytes, every one drawn uniformly from 2**entropy_bits values, so the payload holds `entropy_bits` bits per byte."""
+    rng = np.random.default_rng(seed)
+    with open(payload_path, "wb") as f:
+        for offset in range(0, size, chunk_size):
+            f.write(rng.integers(0, 1 << entropy_bits, min(chunk_size, size - offset), dtype=np.uint8).tobytes())
+
+
+def get_resource_usage():
+    """Returns (cpu_seconds, peak_rss_bytes) of this process and its waited for children, (None, None) without the resource module."""
+    if resource is None:
+        return None, None
+    usage_self, usage_children = resource.getrusage(resource.RUSAGE_SELF), resource.getrusage(resource.RUSAGE_CHILDREN)
+    cpu_seconds = usage_self.ru_utime + usage_self.ru_stime + usage_children.ru_utime + usage_children.ru_stime
+    # ru_maxrss is in kilobytes, except on macOS
+    rss_unit = 1 if sys.platform == "darwin" else 1024
+    return cpu_seconds, max(usage_self.ru_maxrss, usage_children.ru_maxrss) * rss_unit
+
+
+def run_stage(stage, work_dir, payload_name, connection):
+    """Runs one stage in `work_dir`, in a process of its own, and sends back its (seconds, cpu_seconds, peak_rss_bytes)."""
+    os.chdir(work_dir)
+    # Imported here, so the scripts load the config.ini of the scratch directory
+    import encodeVids_IntoVideo
+    from libs.merge_mp4_files_incremental import merge_mp4_files_incremental
+    from decodeVids import process_images
+
+    config = encodeVids_IntoVideo.config
+    output_dir = os.path.join("storage", "output", payload_name + config['output_video_suffix'])
+    video_path = os.path.join("storage", "output", payload_name + ".mp4")
+
+    start_cpu_seconds, _ = get_resource_usage()
+    start_time = time.perf_counter()
+    if stage == "encode":
+        encodeVids_IntoVideo.process_video_frames(os.path.join("storage", payload_name), config, debug=False)
+    elif stage == "merge":
+        merge_mp4_files_incremental(output_dir, video_path, os.path.join("storage", "output"))
+    else:
+        process_images(video_path)
+    elapsed = time.perf_counter() - start_time
+    cpu_seconds, peak_rss = get_resource_usage()
+
+    connection.send((elapsed, cpu_seconds - start_cpu_seconds if cpu_seconds is not None else None, peak_rss))
+    connection.close()
+
+
+def time_stage(stage, work_dir, payload_name):
+    parent_connection, child_connection = multiprocessing.Pipe(duplex=False)
+    process = multiprocessing.Process(target=run_stage, args=(stage, work_dir, payload_name, child_connection))
+    process.start()
+    child_connection.close()
+    try:
+        result = parent_connection.recv()
+    except EOFError:
+        result = None
+    process.join()
+    if result is None or process.exitcode:
+        print(f"The {stage} stage failed (exit code {process.exitcode}).", file=sys.stderr)
+        sys.exit(1)
+    return result
+
+
+def count_video_frames(video_path):
+    cap = cv2.VideoCapture(video_path)
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+    return frame_count
+
+
+def run_case(work_dir, config, size, entropy_bits, seed, keep_files):
+    """Encodes, merges and decodes one synthetic payload, returns the case's results."""
+    case_name = f"{size // (1024 * 1024)}MB_{entropy_bits}bit"
+    payload_name = f"benchmark_{case_name}.bin"
+    payload_path = os.path.join(work_dir, "storage", payload_name)
+    output_dir = os.path.join(work_dir, "storage", "output", payload_name + config['output_video_suffix'])
+    video_path = os.path.join(work_dir, "storage", "output", payload_name + ".mp4")
+    # The decoder writes into its working directory
+    decoded_path = os.path.join(work_dir, payload_name)
+    write_payload(payload_path, size, entropy_bits, seed)
+
+    stage_results = {stage: time_stage(stage, work_dir, payload_name) for stage in STAGES}
+    video_frames, video_bytes = count_video_frames(video_path), os.path.getsize(video_path)
+    decoded_ok = os.path.exists(decoded_path) and filecmp.cmp(payload_path, decoded_path, shallow=False)
+
+    stages = {}
+    for stage, (elapsed, cpu_seconds, peak_rss) in stage_results.items():
+        stages[stage] = {
+            "seconds": elapsed,
+            "mb_per_second": size / elapsed / 1e6,
+            "frames_per_second": video_frames / elapsed,
+            "cpu_seconds": cpu_seconds,
+            # Average busy cores over the stage, and the same as a fraction of all the cores
+            "cpu_cores_busy": cpu_seconds / elapsed if cpu_seconds is not None else None,
+            "cpu_utilisation": cpu_seconds / elapsed / os.cpu_count() if cpu_seconds is not None else None,
+            "peak_rss_mb": peak_rss / 1e6 if peak_rss is not None else None,
+        }
+
+    if not keep_files:
+        shutil.rmtree(output_dir, ignore_errors=True)
+        frame_index_path = get_frame_index_path(config, os.path.join(work_dir, "storage", "output"), payload_name)
+        for file_path in (payload_path, video_path, decoded_path, frame_index_path):
+            if os.path.exists(file_path):
+                os.remove(file_path)
+    return {
+        "name": case_name,
+        "payload_bytes": size,
+        "entropy_bits": entropy_bits,
+        "video_frames": video_frames,
+        "video_bytes": video_bytes,
+        "decoded_ok": decoded_ok,
+        "stages": stages,
+    }
+
+
+def find_regressions(results, baseline, tolerance):
+    """Returns a line for every stage of a case in both runs, slower or bigger than the baseline by more than `tolerance`."""
+    baseline_cases = {case["name"]: case for case in baseline["cases"]}
+    regressions = []
+    for case in results["cases"]:
+        baseline_case = baseline_cases.get(case["name"])
+        if baseline_case is None:
+            continue
+        for stage, stage_result in case["stages"].items():
+            baseline_stage = baseline_case["stages"].get(stage)
+            if baseline_stage is None:
+                continue
+            if stage_result["mb_per_second"] < baseline_stage["mb_per_second"] * (1 - tolerance):
+                regressions.append(f"{case['name']} {stage}: {stage_result['mb_per_second']:.2f} MB/s, "
+                                   f"baseline {baseline_stage['mb_per_second']:.2f} MB/s")
+            if stage_result["peak_rss_mb"] and baseline_stage["peak_rss_mb"] and \
+                    stage_result["peak_rss_mb"] > baseline_stage["peak_rss_mb"] * (1 + tolerance):
+                regressions.append(f"{case['name']} {stage}: peak RSS {stage_result['peak_rss_mb']:.0f} MB, "
+                                   f"baseline {baseline_stage['peak_rss_mb']:.0f} MB")
+    return regressions
+
+
+def format_optional(value, format_spec):
+    return format(value, format_spec) if value is not None else "-"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the encode, merge and decode stages end to end on synthetic payloads.")
+    parser.add_argument("--config", default="config.ini", help="Config the stages run with.")
+    parser.add_argument("--sizes-mb", type=int, nargs="+", default=[8], help="Payload sizes, in MiB.")
+    parser.add_argument("--entropy-bits", type=int, nargs="+", default=[8], choices=range(9), help="Entropy of the payload bytes, in bits.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--work-dir", help="Scratch directory the stages run in, a temporary one if omitted.")
+    parser.add_argument("--keep-files", action="store_true", help="Keep the payloads, videos and decoded files.")
+    parser.add_argument("--output", help="File to write the results to, as JSON.")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE_PATH, help="Results of an earlier run to compare against.")
+    parser.add_argument("--save-baseline", action="store_true", help="Save the results as the baseline instead of comparing against it.")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Fraction a stage may be slower or bigger than the baseline.")
+    args = parser.parse_args()
+
+    config = load_config(args.config)
+    work_dir = os.path.abspath(args.work_dir or tempfile.mkdtemp(prefix="end_to_end_"))
+    os.makedirs(os.path.join(work_dir, "storage", "output"), exist_ok=True)
+    shutil.copy(args.config, os.path.join(work_dir, "config.ini"))
+    # Along with the files the config refers to, relative to the working directory
+    for file_path in (config['bgr_video_path'], config['encoding_map_path']):
+        if not os.path.isabs(file_path) and os.path.exists(file_path):
+            os.makedirs(os.path.join(work_dir, os.path.dirname(file_path)), exist_ok=True)
+            shutil.copy(file_path, os.path.join(work_dir, file_path))
+
+    results = {
+        "cpu_count": os.cpu_count(),
+        "encoding_base": config['encoding_base'],
+        "frame_size": f"{config['frame_width']}x{config['frame_height']}",
+        "cases": [],
+    }
+    print(f"{os.cpu_count()} cores, Base{config['encoding_base']}, {config['frame_width']}x{config['frame_height']} frames, "
+          f"running in {work_dir}")
+    print(f"{'case':>12} {'stage':>7} {'seconds':>9} {'MB/s':>8} {'frames/s':>10} {'cores':>6} {'RSS MB':>8}")
+    try:
+        for size_mb in args.sizes_mb:
+            for entropy_bits in args.entropy_bits:
+                case = run_case(work_dir, config, size_mb * 1024 * 1024, entropy_bits, args.seed, args.keep_files)
+                results["cases"].append(case)
+                for stage, stage_result in case["stages"].items():
+                    print(f"{case['name']:>12} {stage:>7} {stage_result['seconds']:>9.3f} {stage_result['mb_per_second']:>8.2f} "
+                          f"{stage_result['frames_per_second']:>10.1f} {format_optional(stage_result['cpu_cores_busy'], '>6.1f')} "
+                          f"{format_optional(stage_result['peak_rss_mb'], '>8.0f')}")
+                if not case["decoded_ok"]:
+                    print(f"{case['name']}: the decoded file differs from the payload.", file=sys.stderr)
+    finally:
+        if not args.work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=4)
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=4)
+        print(f"Baseline saved at: {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = find_regressions(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+        print(f"No regression against the baseline ({args.baseline}, tolerance {args.tolerance:.0%}).")
+    else:
+        print(f"No baseline at {args.baseline}, save one with --save-baseline.")
+
+    if not all(case["decoded_ok"] for case in results["cases"]):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+"""
+Microbenchmarks of the encoder's and decoder's hot kernels, per encoding base and DATACONTENT box step:
+  - symbolize: FileToEncodedData.__next__, a payload file to the baseN symbols of its data frames
+  - encode:    encode_frame(...), the symbols of a data frame to its BGR frame
+  - extract:   extract_baseN_data_numba(...) (determine_color_key(...) for every box), a frame back to its symbols
+  - decode:    the decoding_function(...) per chunk loop of process_frame_optimized(...), the symbols back to bytes
+  - write:     positional_write(...) of every data frame's bytes at its offset (what the decode workers do)
+
+Every kernel runs once before it is timed, so the numba kernels are compiled outside the timings,
+and reports the best of --repeat runs, as ns per box and payload MB/s. Every base runs with the config's color threshold,
+lowered until its palette's color bounds stop overlapping (Base64 needs 2%), unless --color-threshold-percent sets one.
+
+Usage (from the repository root):
+  python -m benchmarks.kernels [--bases 2 16 64] [--box-steps 2 4] [--kernels extract decode] [--frames 16] [--repeat 5]
+"""
+import argparse
+import configparser
+import json
+import os
+import tempfile
+import time
+import numpy as np
+from libs.config_loader import load_config, parse_list
+from libs.content_type import ContentType
+from libs.build_config_params import build_config_params
+from libs.detect_base_from_json import get_length_from_base
+from libs.FileToEncodedData import FileToEncodedData
+from libs.encode_frame import encode_frame
+from libs.process_frame_optimized import extract_baseN_data_numba, get_chunks
+from libs.positional_write import open_for_positional_write, positional_write
+
+KERNELS = ("symbolize", "encode", "extract", "decode", "write")
+
+
+def make_config(config_path, encoding_base, box_step, color_threshold_percent, work_dir):
+    """
+    Loads `config_path` with the encoding map of `encoding_base`, a DATACONTENT box step of `box_step` and,
+    if not None, `color_threshold_percent`, through a copy in `work_dir`.
+    """
+    parser = configparser.ConfigParser()
+    parser.read(config_path)
+    parser['DEFAULT']['encoding_map_path'] = os.path.join("encoding_color_map", f"Base{encoding_base:02}.json")
+    data_box_size_step = parse_list(parser['DEFAULT']['data_box_size_step'].split('#')[0].strip())
+    data_box_size_step[ContentType.DATACONTENT.value] = box_step
+    parser['DEFAULT']['data_box_size_step'] = json.dumps(data_box_size_step)
+    if color_threshold_percent is not None:
+        parser['DEFAULT']['color_threshold_percent'] = str(color_threshold_percent)
+
+    variant_path = os.path.join(work_dir, f"config_base{encoding_base}_step{box_step}.ini")
+    with open(variant_path, "w") as f:
+        parser.write(f)
+    return load_config(variant_path)
+
+
+def make_decodable_config(config_path, encoding_base, box_step, color_threshold_percent, work_dir):
+    """
+    Returns (config, color_threshold_percent) of make_config(...). Without a `color_threshold_percent`, the config's one is lowered
+    a percent at a time until the palette's color bounds stop overlapping, the larger bases need a smaller one.
+    """
+    if color_threshold_percent is not None:
+        return make_config(config_path, encoding_base, box_step, color_threshold_percent, work_dir), color_threshold_percent
+
+    parser = configparser.ConfigParser()
+    parser.read(config_path)
+    color_threshold_percent = float(parser['DEFAULT']['color_threshold_percent'].split('#')[0].strip())
+    while True:
+        try:
+            return make_config(config_path, encoding_base, box_step, color_threshold_percent, work_dir), color_threshold_percent
+        except ValueError:
+            if color_threshold_percent <= 1:
+                raise
+            color_threshold_percent = max(1, color_threshold_percent - 1)
+
+
+def time_best(run, repeat):
+    """Runs `run` once untimed (compiling any numba kernel it calls), then returns its best time of `repeat` runs, in seconds."""
+    run()
+    best = float("inf")
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - start_time)
+    return best
+
+
+def bench_kernels(config, kernels, frames_count, payload_path, output_path, repeat):
+    """
+    Returns {kernel: (seconds, boxes, payload_bytes)} of the `kernels`, the frame kernels on `frames_count` data frames of random symbols,
+    symbolize on the payload file.
+    """
+    config_params = build_config_params(config)["DATACONTENT"]
+    databoxes_per_frame = config_params["databoxes_per_frame"]
+    bytes_per_data_frame = get_length_from_base(databoxes_per_frame, config["encoding_bits_per_value"])
+    decoding_function, encoding_chunk_size = config_params["decoding_function"], config_params["encoding_chunk_size"]
+
+    rng = np.random.default_rng(0)
+    symbols = np.array(list(config['encoding_color_map'].keys()))
+    frames_data = [''.join(rng.choice(symbols, databoxes_per_frame)) for _ in range(frames_count)]
+    blank_frame = np.zeros((config['frame_height'], config['frame_width'], 3), dtype=np.uint8)
+    frames = [encode_frame(([blank_frame.copy()], config, frame_data, ContentType.DATACONTENT, False))[0] for frame_data in frames_data]
+
+    def extract(frame):
+        return extract_baseN_data_numba(config_params["start_height"], config_params["start_width"], config_params["box_step"],
+                                        config_params["usable_w"], config_params["usable_h"], databoxes_per_frame, frame,
+                                        config_params["encoding_color_map_keys"], config_params["encoding_color_map_values"],
+                                        config_params["encoding_color_map_values_lower_bounds"],
+                                        config_params["encoding_color_map_values_upper_bounds"], None, 0, False)
+
+    if [extract(frame).tobytes().decode('ascii') for frame in frames] != frames_data:
+        raise ValueError(f"Base{config['encoding_base']}: the frames did not extract back to the symbols they were encoded from.")
+
+    symbolized_boxes = [0]
+
+    def run_symbolize():
+        symbolized_boxes[0] = 0
+        # The first StopIteration ends the DATACONTENT frames
+        for _, frame_data in FileToEncodedData(config, payload_path):
+            symbolized_boxes[0] += len(frame_data)
+
+    def run_encode():
+        for frame_data in frames_data:
+            encode_frame(([blank_frame], config, frame_data, ContentType.DATACONTENT, False))
+
+    def run_extract():
+        for frame in frames:
+            extract(frame)
+
+    def decode(frame_data):
+        return b''.join(decoding_function(chunk_slice) for chunk_slice, _ in get_chunks(frame_data, encoding_chunk_size))
+
+    def run_decode():
+        for frame_data in frames_data:
+            decode(frame_data)
+
+    frames_bytes = [decode(frame_data) for frame_data in frames_data]
+
+    def run_write():
+        output_fd = open_for_positional_write(output_path, frames_count * bytes_per_data_frame)
+        for data_frame, data_bytes in enumerate(frames_bytes):
+            positional_write(output_fd, data_bytes, data_frame * bytes_per_data_frame)
+        os.close(output_fd)
+
+    runs = dict(symbolize=run_symbolize, encode=run_encode, extract=run_extract, decode=run_decode, write=run_write)
+    results = {}
+    for kernel in kernels:
+        seconds = time_best(runs[kernel], repeat)
+        if kernel == "symbolize":
+            results[kernel] = (seconds, symbolized_boxes[0], os.path.getsize(payload_path))
+        else:
+            results[kernel] = (seconds, frames_count * databoxes_per_frame, frames_count * bytes_per_data_frame)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmark the encoder's and decoder's hot kernels per encoding base and box step.")
+    parser.add_argument("--config", default="config.ini")
+    parser.add_argument("--bases", type=int, nargs="+", default=[2, 16, 64], choices=[2, 16, 64])
+    parser.add_argument("--box-steps", type=int, nargs="+", default=[2, 4], help="DATACONTENT box steps.")
+    parser.add_argument("--kernels", nargs="+", default=list(KERNELS), choices=KERNELS)
+    parser.add_argument("--frames", type=int, default=16, help="Data frames every frame kernel runs over.")
+    parser.add_argument("--payload-mb", type=int, default=8, help="Payload symbolized, in MiB.")
+    parser.add_argument("--color-threshold-percent",
+                        type=float,
+                        help="Overrides the config's, by default lowered per base until the palette's colors don't overlap.")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs, the best one is reported.")
+    args = parser.parse_args()
+
+    print(f"{'base':>5} {'step':>5} {'threshold':>10} {'kernel':>10} {'boxes':>10} {'ns/box':>9} {'MB/s':>9}")
+    with tempfile.TemporaryDirectory(prefix="kernels_") as work_dir:
+        payload_path = os.path.join(work_dir, "payload.bin")
+        with open(payload_path, "wb") as f:
+            f.write(np.random.default_rng(0).integers(0, 256, args.payload_mb * 1024 * 1024, dtype=np.uint8).tobytes())
+
+        for encoding_base in args.bases:
+            for box_step in args.box_steps:
+                try:
+                    config, color_threshold_percent = make_decodable_config(args.config, encoding_base, box_step, args.color_threshold_percent,
+                                                                            work_dir)
+                except ValueError as e:
+                    print(f"{encoding_base:>5} {box_step:>5} skipped, {e} (lower --color-threshold-percent)")
+                    continue
+                results = bench_kernels(config, args.kernels, args.frames, payload_path, os.path.join(work_dir, "output.bin"), args.repeat)
+                for kernel, (seconds, boxes, payload_bytes) in results.items():
+                    ns_per_box, mb_per_second = seconds / boxes * 1e9, payload_bytes / seconds / 1e6
+                    print(f"{encoding_base:>5} {box_step:>5} {color_threshold_percent:>9g}% {kernel:>10} {boxes:>10} {ns_per_box:>9.2f} "
+                          f"{mb_per_second:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""
+Round trips a synthetic payload through the in-memory loopback transport (libs/loopback_transport.py), without ffmpeg
+or video files, so the renderer's (encode_frame) and the classifier's (process_frame_optimized) throughput are measured
+on their own, for every channel model: lossless, gaussian noise, JPEG quantization and yuv420p chroma subsampling.
+
+Usage (from the repository root):
+  python -m benchmarks.loopback [--payload-mb 4] [--channels none gaussian jpeg yuv420] [--gaussian-sigma 4] [--jpeg-quality 75]
+"""
+import argparse
+import numpy as np
+from libs.config_loader import load_config
+from libs.content_type import ContentType
+from libs.loopback_transport import CHANNEL_MODELS, loopback_round_trip
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the renderer and the classifier through the in-memory loopback transport.")
+    parser.add_argument("--config", default="config.ini")
+    parser.add_argument("--payload-mb", type=float, default=4, help="Payload round tripped, in MiB.")
+    parser.add_argument("--channels", nargs="+", default=list(CHANNEL_MODELS), choices=CHANNEL_MODELS)
+    parser.add_argument("--gaussian-sigma", type=float, default=4.0, help="Standard deviation of the gaussian channel's noise.")
+    parser.add_argument("--jpeg-quality", type=int, default=75, help="Quality of the jpeg channel.")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    config = load_config(args.config)
+    payload = np.random.default_rng(args.seed).integers(0, 256, int(args.payload_mb * 1024 * 1024), dtype=np.uint8).tobytes()
+    channel_strengths = {"gaussian": args.gaussian_sigma, "jpeg": args.jpeg_quality}
+
+    # Compiles the numba kernels outside the timings
+    loopback_round_trip(config, payload[:1024])
+
+    print(f"{len(payload)} bytes, Base{config['encoding_base']}, box step {config['data_box_size_step'][ContentType.DATACONTENT.value]}")
+    print(f"{'channel':>9} {'frames':>7} {'render MB/s':>12} {'decode MB/s':>12} {'channel s':>10} "
+          f"{'symbol errors':>14} {'CRC failed':>11} {'exact':>6}")
+    for channel_model in args.channels:
+        decoded, stats = loopback_round_trip(config, payload, channel_model, channel_strengths.get(channel_model), args.seed)
+        print(f"{channel_model:>9} {stats['data_frames']:>7} {len(payload) / stats['render_seconds'] / 1e6:>12.2f} "
+              f"{len(payload) / stats['decode_seconds'] / 1e6:>12.2f} {stats['channel_seconds']:>10.3f} "
+              f"{stats['symbol_error_rate']:>14.4%} {stats['crc_failed_frames']:>11} {str(decoded == payload):>6}")
+
+
+if __name__ == "__main__":
+    main()
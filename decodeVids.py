@@ -1,104 +1,282 @@
 import cv2
 import os
+import math
 import json
 import heapq
 import sys
 import hashlib
 import threading
+import time
+import argparse
 from queue import Queue
 from tqdm import tqdm
-from multiprocessing import Pool, cpu_count, Manager, Process, Queue as multiprocessingQueue
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import Pool, cpu_count, Manager
 from libs.config_loader import load_config
-from libs.check_video_file import check_video_file
 from libs.content_type import ContentType
 from libs.downloadFromYT import downloadFromYT
 from libs.get_available_filename_to_decode import get_available_filename_to_decode
-from libs.count_frames import count_frames
-from libs.writer_process import writer_process
-from libs.process_frame_optimized import process_frame_optimized
-from libs.get_file_metadata import get_file_metadata
+from libs.decode_worker import init_decode_worker, close_decode_worker, decode_frame_task
+from libs.SharedFrameRing import SharedFrameRing
+from libs.thread_pool_imap import thread_pool_imap
+from libs.reread_data_frame import reread_data_frame
+from libs.read_video_header import read_video_header
+from libs.decode_frame_span import decode_frame_span, split_into_spans
+from libs.frame_index import load_frame_index, get_frame_index_path
+from libs.positional_write import open_for_positional_write, positional_write
+from libs.detect_base_from_json import get_length_from_base
 from libs.produce_tasks import produce_tasks
 from libs.frame_reader_thread import frame_reader_thread
+from libs.vote_copies import get_copy_offsets
+from libs.temporal_sync_reader_thread import temporal_sync_reader_thread
+from libs.ffmpeg_frame_reader_thread import ffmpeg_frame_reader_thread, block_grid_config_params
+from libs.TreeHash import TreeHash, get_tree_hash_leaf_size
+from libs.PipelineMetrics import PipelineMetrics
+from libs.profiling import profiled_initializer, start_profiling_run, finish_profiling_run
 
 config = load_config('config.ini')
 
 
-def process_images(video_path, debug=False):
-    cap = cv2.VideoCapture(video_path)
-    check_video_file(config, cap)
-    num_frames = count_frames(video_path)
-    print(f"Number of frames: {num_frames}")
-
-    # Common parameters that do not depend on content type
-    common_config_params = {
-        "start_height": config["start_height"],
-        "start_width": config["start_width"],
-        "encoding_base": config["encoding_base"],
-        "encoding_chunk_size": config["encoding_chunk_size"],
-        "decoding_function": config["decoding_function"],
-        "encoding_color_map_keys": config["encoding_color_map_keys"],
-        "encoding_color_map_values": config["encoding_color_map_values"],
-        "encoding_color_map_values_lower_bounds": config["encoding_color_map_values_lower_bounds"],
-        "encoding_color_map_values_upper_bounds": config["encoding_color_map_values_upper_bounds"],
-        "premetadata_metadata_main_delimiter": config['premetadata_metadata_main_delimiter'],
-        "premetadata_metadata_sub_delimiter": config['premetadata_metadata_sub_delimiter'],
-        "length_of_digits_to_represent_size": config['length_of_digits_to_represent_size']
-    }
-
-    config_params = {}
-    content_types = ["PREMETADATA", "METADATA", "DATACONTENT"]
-    for content_type in content_types:
-        specific_config_params = {
-            "box_step": config["data_box_size_step"][ContentType[content_type].value],
-            "usable_w": config["usable_width"][ContentType[content_type].value],
-            "usable_h": config["usable_height"][ContentType[content_type].value],
-            "databoxes_per_frame": config["usable_databoxes_in_frame"][ContentType[content_type].value],
-            "pick_frame_to_read": config["pick_frame_to_read"][ContentType[content_type].value],
-            "total_frames_repetition": config["total_frames_repetition"][ContentType[content_type].value],
-        }
+def check_decoded_file(file_metadata, available_filename, video_path, tree_hash, sha1_hexdigest, debug, keep_failed_file=False):
+    """
+    Compares the decoded file's tree hash root with the metadata's, or its whole file SHA1 for videos encoded before the tree hash
+    (`sha1_hexdigest`, computed over the finished file if None), and removes the file on a mismatch (unless debugging or `keep_failed_file`).
+    A tree hash mismatch is pinned down to its data frames with the leaves recorded in the frame index sidecar, if there is one.
+    """
+    if file_metadata.metadata["tree_hash"]:
+        hash_name, expected_hexdigest, hexdigest = "tree hash", file_metadata.metadata["tree_hash"], tree_hash.hexdigest()
+    else:
+        hash_name, expected_hexdigest, hexdigest = "SHA1", file_metadata.metadata["sha1_checksum"], sha1_hexdigest or sha1_of_file(available_filename)
+
+    if hexdigest == expected_hexdigest:
+        print(f"Files decoded successfully, {hash_name} ({hexdigest}) matched: {available_filename}")
+        return
+
+    print(
+        f"Files decoded was unsuccessful, {hash_name} mismatched, metadata {hash_name} ({expected_hexdigest}) != computed {hash_name} ({hexdigest}) "
+        f"=> {'keeping' if debug or keep_failed_file else 'removing'} file (debug={debug})")
+    failed_data_frames = get_failed_data_frames(tree_hash, file_metadata, video_path) if file_metadata.metadata["tree_hash"] else None
+    if failed_data_frames is not None:
+        print(f"{len(failed_data_frames)} data frame(s) decoded wrong, the first ones: {failed_data_frames[:20]}")
+    if not debug and not keep_failed_file:
+        os.remove(available_filename)
+
+
+def get_failed_data_frames(tree_hash, file_metadata, video_path):
+    """Returns the data frames whose tree hash leaf differs from the one in the frame index sidecar, None without a sidecar holding the leaves."""
+    frame_index = load_frame_index(get_frame_index_path(config, os.path.dirname(video_path), file_metadata.metadata["filename"]))
+    if not frame_index or not frame_index.get("tree_hash_leaves"):
+        return None
+    leaf_hexdigests = tree_hash.leaf_hexdigests()
+    return [
+        data_frame for data_frame, expected_leaf in enumerate(frame_index["tree_hash_leaves"])
+        if data_frame >= len(leaf_hexdigests) or leaf_hexdigests[data_frame] != expected_leaf
+    ]
+
+
+def print_verify_report(report):
+    print(f"Verified {report['filename']} ({report['filesize']} bytes, {report['data_frames']} data frames) in {report['elapsed_seconds']:.2f}s: "
+          f"{report['bytes_per_second'] / 1024**2:.2f} MB/s, {report['frames_per_second']:.1f} data frames/s")
+    print(f"Ambiguous boxes (classified by the nearest color fallback): {report['ambiguous_boxes']} of {report['data_boxes']} "
+          f"({report['ambiguous_box_rate']:.4%}), data frames failing their CRC: {report['crc_failed_frames']}")
+    if report["decodable"]:
+        print(f"Decodable, {report['hash_name']} matched.")
+    else:
+        print(f"Not decodable, {report['hash_name']} mismatched, first failing data frame: {report['first_failed_data_frame']}")
+
+
+def sha1_of_file(file_path):
+    """Returns the SHA1 hex digest of a finished file, for outputs whose parts were written in any order."""
+    sha1 = hashlib.sha1()
+    with open(file_path, "rb") as decoded_file:
+        while data_bytes := decoded_file.read(16 * 1024 * 1024):
+            sha1.update(data_bytes)
+    return sha1.hexdigest()
 
-        config_params[content_type] = {**common_config_params, **specific_config_params}
 
-    metadata_frames, file_metadata = get_file_metadata(cap, config_params["PREMETADATA"], config_params["METADATA"], num_frames, debug)
-    cap.release()  # Close video file
+def process_images_in_spans(config,
+                            video_path,
+                            config_params,
+                            num_frames,
+                            metadata_frames,
+                            file_metadata,
+                            available_filename,
+                            debug=False,
+                            keep_failed_file=False):
+    """
+    Decodes the DATACONTENT frames in independent time spans, one worker process per span, every worker
+    opens its own capture, seeks to its span and writes its frames' bytes at their offsets in the output.
+    """
+    content_config_params = config_params["DATACONTENT"]
+    if not content_config_params["frames_are_chunk_aligned"]:
+        print("Decoding in spans needs chunk aligned frames, set allow_byte_to_be_split_between_frames = False when encoding.")
+        sys.exit(1)
+
+    frame_step = config['total_frames_repetition'][ContentType.DATACONTENT.value]
+    total_baseN_length = file_metadata.metadata["total_baseN_length"]
+    databoxes_per_frame = content_config_params["databoxes_per_frame"]
+    bytes_per_data_frame = get_length_from_base(databoxes_per_frame, config["encoding_bits_per_value"])
+    total_data_frames = math.ceil(total_baseN_length / databoxes_per_frame)
+
+    frame_index = load_frame_index(get_frame_index_path(config, os.path.dirname(video_path), file_metadata.metadata["filename"]))
+    keyframe_data_frames = [entry[0] for entry in frame_index["keyframes"]] if frame_index else None
+    spans = split_into_spans(total_data_frames, config['decoder_spans'] or cpu_count(), keyframe_data_frames)
+    print(f"Decoding {total_data_frames} data frames in {len(spans)} spans.")
+
+    # Preallocate the output, every span writes its own part of it
+    os.close(open_for_positional_write(available_filename, file_metadata.metadata["filesize"]))
+
+    span_args = [(video_path, available_filename, content_config_params, first_data_frame, end_data_frame, metadata_frames, frame_step,
+                  total_baseN_length, num_frames, bytes_per_data_frame) for first_data_frame, end_data_frame in spans]
+
+    tree_hash = TreeHash(get_tree_hash_leaf_size(config))
+    metrics = PipelineMetrics.from_config(config, "decode")
+    pbar = tqdm(total=total_data_frames, desc="Decoding DATACONTENT spans")
+    initializer, initargs = profiled_initializer("decode_span")
+    with Pool(len(spans), initializer, initargs) as pool:
+        for first_data_frame, end_data_frame, _, tree_hash_leaves in metrics.timed("decode_spans", pool.imap_unordered(decode_frame_span, span_args)):
+            for data_frame, leaf_digest in tree_hash_leaves:
+                tree_hash.set_leaf(data_frame, leaf_digest)
+            pbar.update(end_data_frame - first_data_frame)
+        pool.close()
+        pool.join()
+    pbar.close()
+    metrics.close()
+
+    # The spans completed in any order, so a legacy SHA1 is computed over the finished file
+    check_decoded_file(file_metadata, available_filename, video_path, tree_hash, None, debug, keep_failed_file)
+
+
+def process_images(video_path, debug=False, verify_only=False, keep_failed_file=False):
+    """
+    Decodes the file encoded in `video_path` next to the decoder, checking it against the metadata's tree hash (or SHA1).
+    With `verify_only`, nothing is written: the data frames are decoded and hashed by the workers (always streamed, whatever the
+    decoder_mode), and a report is printed and returned instead, with the throughput, the first failing data frame
+    and the rate of ambiguous boxes, to check an encode right after it is made.
+    With `keep_failed_file`, a decoded file failing its check is kept, to compare it against the original.
+    Returns the path of the decoded file (removed if it failed its check, unless kept), or the report with `verify_only`.
+    """
+    start_time = time.perf_counter()
+    # The header is read in a single forward pass, so the capture is left right after it, ready for the content
+    # The layout settings (frame strip, calibration frame...) are the video's own, read from its header, see read_video_header(...),
+    # what depends on them (the tree hash leaf size...) is taken from video_config
+    cap, num_frames, video_config, config_params, metadata_frames, file_metadata = read_video_header(config, video_path, debug)
     cv2.destroyAllWindows()
 
     # 2) Prepare parameters
-    frame_start = metadata_frames + config['pick_frame_to_read'][ContentType.DATACONTENT.value]
+    frame_start = metadata_frames + config['pick_frame_to_read'][ContentType.DATACONTENT.value] - 1
     frame_step = config['total_frames_repetition'][ContentType.DATACONTENT.value]
     end_index = num_frames - 1
     total_baseN_length = file_metadata.metadata["total_baseN_length"]
 
+    available_filename = get_available_filename_to_decode(config, file_metadata.metadata["filename"]) if not verify_only else None
+    if config['decoder_mode'] == 'spans' and not verify_only:
+        cap.release()
+        process_images_in_spans(video_config, video_path, config_params, num_frames, metadata_frames, file_metadata, available_filename, debug,
+                                keep_failed_file)
+        return available_filename
+
     #---------------------------------------------------------------------
     # B) PREP FOR WRITING & SHA1
     #---------------------------------------------------------------------
-    write_queue = multiprocessingQueue()
-    available_filename = get_available_filename_to_decode(config, file_metadata.metadata["filename"])
-    writer_proc = Process(target=writer_process, args=(write_queue, available_filename))
-    writer_proc.start()
+    # The output is preallocated and written with positional writes, by the workers themselves for chunk aligned frames
+    # (every data frame's bytes have a known offset), so frames complete in any order and their bytes never travel
+    # back to this process. The debug stream check needs the bytes here, in order, so it keeps them in this process.
+    # Without pwrite (Windows), positional writes share the descriptor's file position, which thread workers can't.
+    # Verifying writes nothing, the workers only hash their frames, unless the video has no tree hash to check them against.
+    frames_are_chunk_aligned = config_params["DATACONTENT"]["frames_are_chunk_aligned"]
+    use_thread_workers = config['decoder_worker_backend'] == 'thread'
+    if verify_only:
+        workers_write_output = frames_are_chunk_aligned and not debug and bool(file_metadata.metadata["tree_hash"])
+    else:
+        workers_write_output = frames_are_chunk_aligned and not debug and (hasattr(os, 'pwrite') or not use_thread_workers)
+    output_fd = open_for_positional_write(available_filename, file_metadata.metadata["filesize"]) if not verify_only else None
+    bytes_per_data_frame = get_length_from_base(config_params["DATACONTENT"]["databoxes_per_frame"], config["encoding_bits_per_value"])
+    output_file_layout = (available_filename, frame_start, frame_step, bytes_per_data_frame) if workers_write_output else None
+    next_write_offset = 0
 
-    sha1 = hashlib.sha1()
+    # Every data frame's bytes are hashed into a tree hash leaf, by the worker writing them, or here.
+    # Videos without a tree hash are checked with their whole file SHA1, over the finished file when the workers write it.
+    tree_hash = TreeHash(get_tree_hash_leaf_size(video_config))
+    sha1 = hashlib.sha1() if not workers_write_output and not file_metadata.metadata["tree_hash"] else None
+    data_boxes = ambiguous_boxes = 0
+    first_failed_data_frame = None
 
     #---------------------------------------------------------------------
-    # C) OPEN VIDEO & LAUNCH READER THREAD
+    # C) LAUNCH READER THREAD
     #---------------------------------------------------------------------
-    cap = cv2.VideoCapture(video_path)
-
     # This event allows us to signal the thread to stop if needed
     stop_event = threading.Event()
 
     # Create a queue to hold frames
     frame_queue = Queue(maxsize=256)  # buffer up to N frames
+    metrics = PipelineMetrics.from_config(config, "verify" if verify_only else "decode")
+    metrics.watch_queue("frame_queue", frame_queue)
+
+    # Chunk aligned frames are decoded statelessly, so they can complete in any order and are re-ordered below,
+    # otherwise the partial chunk carried over between frames needs them in order, in a single worker.
+    decode_workers = cpu_count() if frames_are_chunk_aligned else 1
+    use_ffmpeg_frame_source = config['decoder_frame_source'] == 'ffmpeg'
+    use_vote_copies = config['vote_copies'] > 1 and not use_ffmpeg_frame_source and not config['temporal_sync']
+
+    # Frames are handed to the process workers through shared memory, only the slot index gets pickled,
+    # thread workers share the frames of the reader thread as they are, box sized frames (ffmpeg's, voted ones) are small enough to pickle.
+    frame_shape = (config['frame_height'], config['frame_width'], 3)
+    frame_ring = None
+    if config['shared_frame_ring_slots_per_worker'] > 0 and not use_thread_workers and not use_ffmpeg_frame_source and not use_vote_copies:
+        frame_ring = SharedFrameRing(decode_workers * config['shared_frame_ring_slots_per_worker'], frame_shape)
 
     # Start the dedicated reading thread
-    t_reader = threading.Thread(target=frame_reader_thread, args=(cap, frame_queue, stop_event, frame_start, end_index, frame_step), daemon=True)
+    if use_ffmpeg_frame_source:
+        cap.release()
+        content_config_params = block_grid_config_params(config_params["DATACONTENT"])
+        t_reader = threading.Thread(target=ffmpeg_frame_reader_thread,
+                                    args=(video_path, config_params["DATACONTENT"], frame_queue, stop_event, frame_start, end_index, frame_step),
+                                    daemon=True)
+    elif config['temporal_sync']:
+        content_config_params = config_params["DATACONTENT"]
+        # Syncing starts in the middle of the header's last repetition group, the calibration group if there is one
+        if video_config['calibration_frame']:
+            sync_start = metadata_frames - frame_step // 2
+        else:
+            sync_start = metadata_frames - max(config['total_frames_repetition'][ContentType.PREMETADATA.value],
+                                               config['total_frames_repetition'][ContentType.METADATA.value]) // 2
+        t_reader = threading.Thread(target=temporal_sync_reader_thread,
+                                    args=(cap, content_config_params, frame_queue, stop_event, sync_start, frame_start, end_index, frame_step,
+                                          config['sync_boundary_fraction'], frame_ring),
+                                    kwargs={"debug": debug},
+                                    daemon=True)
+    elif use_vote_copies:
+        content_config_params = block_grid_config_params(config_params["DATACONTENT"])
+        copy_offsets = get_copy_offsets(config['pick_frame_to_read'][ContentType.DATACONTENT.value], frame_step, config['vote_copies'])
+        t_reader = threading.Thread(target=frame_reader_thread,
+                                    args=(cap, frame_queue, stop_event, frame_start, end_index, frame_step, None, True, copy_offsets,
+                                          config_params["DATACONTENT"]),
+                                    kwargs={"debug": debug},
+                                    daemon=True)
+    else:
+        content_config_params = config_params["DATACONTENT"]
+        t_reader = threading.Thread(target=frame_reader_thread,
+                                    args=(cap, frame_queue, stop_event, frame_start, end_index, frame_step, frame_ring, True),
+                                    kwargs={"debug": debug},
+                                    daemon=True)
     t_reader.start()
 
     #---------------------------------------------------------------------
     # D) MULTIPROCESSING POOL & IMAP
     #---------------------------------------------------------------------
-    # We'll feed tasks from produce_tasks(...) to process_frame_optimized(...)
-    pool = Pool(cpu_count())
+    # We'll feed tasks from produce_tasks(...) to process_frame_optimized(...),
+    # either in a multiprocessing.Pool or in threads, as the numba kernels release the GIL.
+    # The workers are profiled too when this process is (--profile).
+    if use_thread_workers:
+        # The thread workers share this process' decode worker state
+        init_decode_worker(None, 0, frame_shape, output_file_layout, verify_only)
+        initializer, initargs = profiled_initializer("decode_thread", threads=True)
+        executor = ThreadPoolExecutor(decode_workers, initializer=initializer, initargs=initargs)
+    else:
+        worker_initargs = ((frame_ring.name, frame_ring.slot_count) if frame_ring else (None, 0)) + (frame_shape, output_file_layout, verify_only)
+        initializer, initargs = profiled_initializer("decode_worker", init_decode_worker, worker_initargs)
+        pool = Pool(decode_workers, initializer=initializer, initargs=initargs)
 
     # If you keep a debug text check:
     stream_encoded_file = open(f"{file_metadata.metadata['filename']}_encoded_stream.txt", "r") if debug else None
@@ -111,76 +289,175 @@ def process_images(video_path, debug=False):
     count_main_frames = max(0, (end_index - frame_start) // frame_step + 1)
     pbar = tqdm(total=count_main_frames, desc="Decoding DATACONTENT")
 
+    pending_results = []
+    reread_cap = None
+    crc_failed_frames = 0
+
     # Fire off the parallel tasks
-    result_iterator = pool.imap(
-        process_frame_optimized,
-        produce_tasks(frame_queue=frame_queue,
-                      stop_event=stop_event,
-                      config_params=config_params["DATACONTENT"],
-                      content_type=ContentType.DATACONTENT,
-                      frame_step=frame_step,
-                      total_baseN_length=total_baseN_length,
-                      num_frames=num_frames,
-                      metadata_frames=metadata_frames,
-                      convert_return_output_data=None))
+    tasks = produce_tasks(frame_queue=frame_queue,
+                          stop_event=stop_event,
+                          config_params=content_config_params,
+                          content_type=ContentType.DATACONTENT,
+                          frame_step=frame_step,
+                          total_baseN_length=total_baseN_length,
+                          num_frames=num_frames,
+                          metadata_frames=metadata_frames,
+                          convert_return_output_data=None,
+                          metrics=metrics)
+    if use_thread_workers:
+        result_iterator = thread_pool_imap(executor, decode_frame_task, tasks, decode_workers * 2, ordered=not frames_are_chunk_aligned)
+    else:
+        result_iterator = (pool.imap_unordered if frames_are_chunk_aligned else pool.imap)(decode_frame_task, tasks)
+    # Waiting on the next result is the seconds this process spends blocked on the decode workers
+    result_iterator = metrics.timed("decode_workers", result_iterator)
 
     # E) COLLECT RESULTS
     for result in result_iterator:
-        frame_index, output_data = result[0], result[1]
-
-        # Update SHA1 & debug checks
-        for data_bytes in output_data:
-            sha1.update(data_bytes)
-            if stream_encoded_file:
-                data_binary_string = ''.join(f"{byte:08b}" for byte in data_bytes)
-                if stream_decoded_file:
-                    stream_decoded_file.write(data_binary_string)
-                expected_binary_string = stream_encoded_file.read(len(data_binary_string))
-                if data_binary_string != expected_binary_string:
-                    print(f"Mismatch at frame {frame_index}: "
-                          f"expected={expected_binary_string}, got={data_binary_string}")
-                    sys.exit(1)
-
-        # Pass data to writer
-        write_queue.put((frame_index, output_data))
-
-        next_frame_to_write += frame_step
+        collect_start_time = time.perf_counter()
+        frame_ring and frame_ring.release(result.frame_index)
+        # Ordered by their frame_index, every frame is decoded once
+        heapq.heappush(pending_results, result)
+        if result.box_counts is not None:
+            data_boxes += result.box_counts[0]
+            ambiguous_boxes += result.box_counts[1]
         pbar.update(1)
 
+        while pending_results and pending_results[0].frame_index == next_frame_to_write:
+            pending_result = heapq.heappop(pending_results)
+            frame_index, output_data, frame_check = pending_result.frame_index, pending_result.output_data, pending_result.frame_check
+            data_frame = (frame_index - frame_start) // frame_step
+
+            # Frames with a header strip are checked against their CRC (re-reading another copy of theirs if it fails)
+            # and against their expected sequence number, which catches dropped or duplicated frames
+            if frame_check is not None:
+                sequence_number, crc_matches = frame_check
+                if not crc_matches and frames_are_chunk_aligned:
+                    reread_cap = reread_cap or cv2.VideoCapture(video_path)
+                    reread_result = reread_data_frame(reread_cap, (config_params["DATACONTENT"], ContentType.DATACONTENT, None, frame_index,
+                                                                   frame_step, total_baseN_length, num_frames, metadata_frames, None),
+                                                      config['pick_frame_to_read'][ContentType.DATACONTENT.value])
+                    if reread_result is not None:
+                        output_data, (sequence_number, crc_matches) = reread_result.output_data, reread_result.frame_check
+                crc_failed_frames += not crc_matches
+                if sequence_number is not None and sequence_number != data_frame:
+                    print(f"Frame {frame_index} holds data frame {sequence_number} instead of {data_frame}, frames were dropped or duplicated.")
+                if first_failed_data_frame is None and (not crc_matches or sequence_number not in (None, data_frame)):
+                    first_failed_data_frame = data_frame
+
+            # Frames written by the workers and not re-read have no bytes left to handle here
+            if output_data is None:
+                tree_hash.set_leaf(data_frame, pending_result.leaf_digest)
+                next_frame_to_write += frame_step
+                continue
+
+            # Update SHA1 & debug checks
+            for data_bytes in output_data:
+                sha1 and sha1.update(data_bytes)
+                if stream_encoded_file:
+                    data_binary_string = ''.join(f"{byte:08b}" for byte in data_bytes)
+                    if stream_decoded_file:
+                        stream_decoded_file.write(data_binary_string)
+                    expected_binary_string = stream_encoded_file.read(len(data_binary_string))
+                    if data_binary_string != expected_binary_string:
+                        print(f"Mismatch at frame {frame_index}: "
+                              f"expected={expected_binary_string}, got={data_binary_string}")
+                        sys.exit(1)
+
+            # Write the bytes at the frame's offset (known for chunk aligned frames) or right after the previous frame's
+            data_bytes = b''.join(output_data)
+            if frames_are_chunk_aligned:
+                next_write_offset = data_frame * bytes_per_data_frame
+                tree_hash.set_leaf(data_frame, hashlib.sha1(data_bytes).digest())
+            else:
+                tree_hash.update(data_bytes)
+            output_fd is not None and positional_write(output_fd, data_bytes, next_write_offset)
+            next_write_offset += len(data_bytes)
+
+            next_frame_to_write += frame_step
+        metrics.count("collect", time.perf_counter() - collect_start_time)
+
+    if pending_results:
+        print(f"Frames missing from the decoded stream, expected frame {next_frame_to_write}, "
+              f"{len(pending_results)} later frame(s) were not written.")
+    if crc_failed_frames:
+        print(f"{crc_failed_frames} data frame(s) failed their CRC in every copy.")
+
     #---------------------------------------------------------------------
     # F) CLEANUP
     #---------------------------------------------------------------------
     # 1) Stop the thread & close the pool
     stop_event.set()
     frame_queue.put(None)  # to ensure produce_tasks stops
-    pool.close()
-    pool.join()
+    if use_thread_workers:
+        executor.shutdown()
+        close_decode_worker()
+    else:
+        pool.close()
+        pool.join()
 
     t_reader.join(timeout=1.0)
     cap.release()
+    reread_cap and reread_cap.release()
+    frame_ring and frame_ring.close()
     pbar.close()
+    metrics.close()
 
-    # 2) Signal writer to finish
-    write_queue.put(None)
-    writer_proc.join()
-    write_queue.close()
-    write_queue.join_thread()
+    # 2) Close the output, the workers have written their frames once the pool is joined
+    output_fd is not None and os.close(output_fd)
 
     stream_encoded_file and stream_encoded_file.close()
     stream_decoded_file and stream_decoded_file.close()
 
+    if verify_only:
+        if file_metadata.metadata["tree_hash"]:
+            hash_name, hash_matched = "tree hash", tree_hash.hexdigest() == file_metadata.metadata["tree_hash"]
+        else:
+            hash_name, hash_matched = "SHA1", sha1.hexdigest() == file_metadata.metadata["sha1_checksum"]
+        # The sidecar's leaves pin the first failing data frame down even when every CRC passed, a gap in the stream is one too
+        failed_data_frames = []
+        if not hash_matched and file_metadata.metadata["tree_hash"]:
+            failed_data_frames = get_failed_data_frames(tree_hash, file_metadata, video_path) or []
+        if pending_results:
+            failed_data_frames.append((next_frame_to_write - frame_start) // frame_step)
+        if first_failed_data_frame is not None:
+            failed_data_frames.append(first_failed_data_frame)
+        first_failed_data_frame = min(failed_data_frames) if failed_data_frames else None
+
+        elapsed_seconds = time.perf_counter() - start_time
+        data_frames = (next_frame_to_write - frame_start) // frame_step
+        report = {
+            "video_path": video_path,
+            "filename": file_metadata.metadata["filename"],
+            "filesize": file_metadata.metadata["filesize"],
+            "data_frames": data_frames,
+            "elapsed_seconds": elapsed_seconds,
+            "bytes_per_second": file_metadata.metadata["filesize"] / elapsed_seconds,
+            "frames_per_second": data_frames / elapsed_seconds,
+            "hash_name": hash_name,
+            "decodable": hash_matched,
+            "first_failed_data_frame": first_failed_data_frame,
+            "crc_failed_frames": crc_failed_frames,
+            "data_boxes": data_boxes,
+            "ambiguous_boxes": ambiguous_boxes,
+            "ambiguous_box_rate": ambiguous_boxes / data_boxes if data_boxes else 0.0,
+        }
+        print_verify_report(report)
+        return report
+
     # 4) Check final SHA1
-    if sha1.hexdigest() == file_metadata.metadata["sha1_checksum"]:
-        print(f"Files decoded successfully, SHA1 ({sha1.hexdigest()}) matched: {available_filename}")
-    else:
-        print(
-            f"Files decoded was unsuccessful, SHA1 mismatched, metadata SHA1 ({file_metadata.metadata['sha1_checksum']}) != computed SHA1 ({sha1.hexdigest()}) => removing file (debug={debug})"
-        )
-        if not debug:
-            os.remove(available_filename)
+    check_decoded_file(file_metadata, available_filename, video_path, tree_hash, sha1.hexdigest() if sha1 else None, debug, keep_failed_file)
+    return available_filename
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Downloads a video and decodes the file encoded in it, as set up in config.ini.")
+    parser.add_argument("--profile",
+                        metavar="DIR",
+                        help="Profile this process and its pool workers, their stats and a merged report (profile_report.txt) are written to DIR.")
+    args = parser.parse_args()
+
     video_url = input("Please enter the URL to the video file: ")
     downloadFromYT(video_url)
+    args.profile and start_profiling_run(args.profile, "decode")
     process_images(os.path.join("storage", "output", "Test03.iso.mp4"))
+    args.profile and finish_profiling_run()
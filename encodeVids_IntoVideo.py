@@ -1,6 +1,8 @@
 import gc
+import argparse
 from os import path, makedirs
 import sys
+import time
 import json
 import cv2
 import shutil
@@ -17,6 +19,10 @@ from libs.check_video_file import check_video_file
 from libs.encode_frame import encode_frame
 from libs.write_frames import write_frames
 from libs.background_reader import background_reader
+from libs.frame_index import build_frame_index, write_frame_index, get_frame_index_path
+from libs.calibration import get_calibration_frame_data
+from libs.PipelineMetrics import PipelineMetrics
+from libs.profiling import profiled_initializer, start_profiling_run, finish_profiling_run
 
 config = load_config('config.ini')
 
@@ -43,15 +49,35 @@ def process_video_frames(file_path, config, debug):
     frame_queue = Queue(maxsize=14 * 4)
     stop_event = threading.Event()
 
+    # Where the time goes: the background reader, symbolization, the encode_frame pool or writing to ffmpeg (blocked while x264 is behind)
+    metrics = PipelineMetrics.from_config(config, "encode")
+    metrics.watch_queue("bgr_frame_queue", frame_queue)
+
     frame_start = 0
     frame_step = 1
     reader_thread = threading.Thread(
         target=background_reader,
-        args=(cap, frame_queue, stop_event, frame_start, frame_step),
+        args=(cap, frame_queue, stop_event, frame_start, frame_step, metrics),
         daemon=True  # optionally make it a daemon if you want auto-stop
     )
     reader_thread.start()
 
+    # The calibration frame shows every palette color, merged right after the header, before the content
+    calibration_frames = 0
+    if config['calibration_frame']:
+        content_and_metadata_stream = create_ffmpeg_process(output_dir, config, 0, ContentType.DATACONTENT, 'calibration.mp4')
+        print(f"Started FFmpeg process for calibration segment.")
+        bgr_frames_count = 1 if config["use_same_bgr_frame_for_repetetion"] else config["total_frames_repetition"][ContentType.DATACONTENT.value]
+        write_frames(
+            content_and_metadata_stream,
+            encode_frame(
+                ([frame_queue.get() for _ in range(bgr_frames_count)], config, get_calibration_frame_data(config), ContentType.DATACONTENT, debug)),
+            metrics, "write_calibration_frames")
+        calibration_frames = config['total_frames_repetition'][ContentType.DATACONTENT.value]
+        start_time = time.perf_counter()
+        close_ffmpeg_process(content_and_metadata_stream, ContentType.DATACONTENT, "calibration")
+        metrics.count("ffmpeg_close", time.perf_counter() - start_time)
+
     # Initialize FFmpeg process for content segments
     segment_index = 0
 
@@ -61,8 +87,16 @@ def process_video_frames(file_path, config, debug):
     last_gc_count = 0
     last_segment_count = 0
 
-    with Pool(cpu_count()) as pool:
-        result_iterator = pool.imap(encode_frame, generate_frame_args(frame_queue, config, frame_data_iter, debug))
+    # Every encode_frame result is one data frame (one repetition group), track which of them start on a keyframe
+    data_frames_count = 0
+    segment_first_data_frame = 0
+    keyframe_data_frames = []
+
+    # The workers are profiled too when this process is (--profile)
+    initializer, initargs = profiled_initializer("encode_worker")
+    with Pool(cpu_count(), initializer, initargs) as pool:
+        result_iterator = metrics.timed("encode_frame_pool",
+                                        pool.imap(encode_frame, generate_frame_args(frame_queue, config, frame_data_iter, debug, metrics)))
 
         for frames_to_write in result_iterator:
             if frames_count == 0 or frames_count - last_segment_count >= config['frames_per_content_part_file']:
@@ -73,9 +107,14 @@ def process_video_frames(file_path, config, debug):
                 content_and_metadata_stream = create_ffmpeg_process(output_dir, config, segment_index, ContentType.DATACONTENT)
                 print(f"Started FFmpeg process for content segment {segment_index:02d}.")
                 last_segment_count = frames_count  # Reset tracking for next segment start
+                segment_first_data_frame = data_frames_count
+
+            if config['keyframe_interval_groups'] > 0 and (data_frames_count - segment_first_data_frame) % config['keyframe_interval_groups'] == 0:
+                keyframe_data_frames.append(data_frames_count)
+            data_frames_count += 1
 
             # Write the frames
-            write_frames(content_and_metadata_stream, frames_to_write)
+            write_frames(content_and_metadata_stream, frames_to_write, metrics)
 
             # Roughly trigger garbage collection
             if frames_count - last_gc_count >= 1000:
@@ -84,39 +123,88 @@ def process_video_frames(file_path, config, debug):
             frames_count += len(frames_to_write)
             del frames_to_write
         gc.collect()
+        # Joined rather than terminated on leaving the block, so the workers exit cleanly (and dump their profiles)
+        pool.close()
+        pool.join()
 
+    # Closing the last segment waits for x264 to encode the frames still in its pipe
+    start_time = time.perf_counter()
     content_and_metadata_stream = close_ffmpeg_process(content_and_metadata_stream, ContentType.DATACONTENT,
                                                        f"{segment_index:02d}") if content_and_metadata_stream else None
-    # Start a new FFmpeg process
-    content_and_metadata_stream = create_ffmpeg_process(output_dir, config, segment_index, ContentType.METADATA)
-    print(f"Started FFmpeg process for metadata segment.")
-
-    for frames_to_write in (encode_frame(frame_args) for frame_args in generate_frame_args(frame_queue, config, frame_data_iter, debug)):
-        # Write the frame multiple times as specified in the config
-        write_frames(content_and_metadata_stream, frames_to_write)
-    gc.collect()
+    metrics.count("ffmpeg_close", time.perf_counter() - start_time)
+
+    metadata_frames = 0
+    # The binary header has no metadata segment, it is all in the pre_metadata segment
+    if config['header_format'] != 'binary':
+        # Start a new FFmpeg process
+        content_and_metadata_stream = create_ffmpeg_process(output_dir, config, segment_index, ContentType.METADATA)
+        print(f"Started FFmpeg process for metadata segment.")
+
+        for frames_to_write in metrics.timed("encode_header_frame",
+                                             (encode_frame(frame_args)
+                                              for frame_args in generate_frame_args(frame_queue, config, frame_data_iter, debug, metrics))):
+            # Write the frame multiple times as specified in the config
+            write_frames(content_and_metadata_stream, frames_to_write, metrics, "write_header_frames")
+            metadata_frames += config['total_frames_repetition'][ContentType.METADATA.value]
+        gc.collect()
 
-    # Release everything if the job is finished
-    content_and_metadata_stream = close_ffmpeg_process(content_and_metadata_stream, ContentType.METADATA, None)
+        # Release everything if the job is finished
+        start_time = time.perf_counter()
+        content_and_metadata_stream = close_ffmpeg_process(content_and_metadata_stream, ContentType.METADATA, None)
+        metrics.count("ffmpeg_close", time.perf_counter() - start_time)
 
     # Start a new FFmpeg process
     content_and_metadata_stream = create_ffmpeg_process(output_dir, config, segment_index, ContentType.PREMETADATA)
     print(f"Started FFmpeg process for pre_metadata segment.")
 
-    for frames_to_write in (encode_frame(frame_args) for frame_args in generate_frame_args(frame_queue, config, frame_data_iter, debug)):
+    header_frames_to_write = []
+    for frames_to_write in metrics.timed("encode_header_frame",
+                                         (encode_frame(frame_args)
+                                          for frame_args in generate_frame_args(frame_queue, config, frame_data_iter, debug, metrics))):
         # Write the frame multiple times as specified in the config
-        write_frames(content_and_metadata_stream, frames_to_write)
+        write_frames(content_and_metadata_stream, frames_to_write, metrics, "write_header_frames")
+        metadata_frames += config['total_frames_repetition'][ContentType.PREMETADATA.value]
+        header_frames_to_write.append(frames_to_write)
     gc.collect()
 
     # Release everything if the job is finished
     stop_event.set()
     reader_thread.join()
     cap.release()
+    start_time = time.perf_counter()
     content_and_metadata_stream = close_ffmpeg_process(content_and_metadata_stream, ContentType.PREMETADATA, None)
+    metrics.count("ffmpeg_close", time.perf_counter() - start_time)
+
+    # The same binary header frames once more, merged at the end of the video
+    if config['header_format'] == 'binary' and config['header_trailer']:
+        content_and_metadata_stream = create_ffmpeg_process(output_dir, config, segment_index, ContentType.PREMETADATA, 'header_trailer.mp4')
+        print(f"Started FFmpeg process for header trailer segment.")
+        for frames_to_write in header_frames_to_write:
+            write_frames(content_and_metadata_stream, frames_to_write, metrics, "write_header_frames")
+        start_time = time.perf_counter()
+        content_and_metadata_stream = close_ffmpeg_process(content_and_metadata_stream, ContentType.PREMETADATA, None)
+        metrics.count("ffmpeg_close", time.perf_counter() - start_time)
+    del header_frames_to_write
+    # Every segment is written, the header ones included
+    metrics.close()
+
+    # Write the frame index sidecar, the pre_metadata, metadata and calibration frames come first in the merged video
+    frame_index_path = get_frame_index_path(config, path.join("storage", "output"), path.basename(file_path))
+    write_frame_index(
+        build_frame_index(config, path.basename(file_path), frame_data_iter.file_size, metadata_frames + calibration_frames, keyframe_data_frames,
+                          frame_data_iter.tree_hash.leaf_hexdigests()), frame_index_path)
+    print(f"Frame index written at: {frame_index_path}")
     print("Modification is done.")
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Encodes storage/Test03.iso into a video, as set up in config.ini.")
+    parser.add_argument("--profile",
+                        metavar="DIR",
+                        help="Profile this process and its pool workers, their stats and a merged report (profile_report.txt) are written to DIR.")
+    args = parser.parse_args()
+    args.profile and start_profiling_run(args.profile, "encode")
+
     # Ask the user for the path to the file they wish to encode
     # file_path = input("Please enter the file path to encode: ")
 
@@ -130,6 +218,11 @@ if __name__ == "__main__":
 
     process_video_frames(file_path, config, debug=False)
     merge_mp4_files_incremental(output_dir, path.join("storage", "output", "Test03.iso.mp4"), path.join("storage", "output"))
+    if config['verify_after_encode']:
+        # Imported here, importing the decoder loads its config and its whole import graph
+        from decodeVids import process_images
+        process_images(path.join("storage", "output", "Test03.iso.mp4"), verify_only=True)
+    args.profile and finish_profiling_run()
 
     # process_video_frames(path.join("storage", "gparted.iso"), config)
 
@@ -0,0 +1,38 @@
+import argparse
+import contextlib
+import sys
+import time
+from libs.config_loader import load_config
+from libs.extract_range import extract_range
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Extracts a byte range of the file encoded in a video, decoding only the frames holding it.")
+    parser.add_argument("video_path")
+    parser.add_argument("offset", type=int, help="Offset of the first byte in the encoded file.")
+    parser.add_argument("length", type=int, help="Number of bytes to extract.")
+    parser.add_argument("-o", "--output", help="File to write the bytes to, stdout if omitted.")
+    parser.add_argument("--config", default="config.ini")
+    parser.add_argument("--debug", action="store_true")
+    args = parser.parse_args()
+
+    config = load_config(args.config)
+    start_time = time.perf_counter()
+    # Without an output file, stdout carries the bytes alone, what the decoder prints (frame counts, header errors...) goes to stderr
+    try:
+        with contextlib.redirect_stdout(sys.stdout if args.output else sys.stderr):
+            data_bytes = extract_range(config, args.video_path, args.offset, args.length, args.debug)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        sys.exit(1)
+
+    if args.output:
+        with open(args.output, "wb") as f:
+            f.write(data_bytes)
+        print(f"Extracted {len(data_bytes)} bytes to {args.output} in {time.perf_counter() - start_time:.2f}s")
+    else:
+        sys.stdout.buffer.write(data_bytes)
+
+
+if __name__ == "__main__":
+    main()
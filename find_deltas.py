@@ -1,39 +1,48 @@
-import numpy as np
-import mmap
-
-
-def generate_unicode_delta_numpy(file1, file2, output_file, chunk_size=65536):
-    with open(file1, "rb") as f1, open(file2, "rb") as f2, open(output_file, "w", encoding="utf-8") as out:
-        # Memory-map both files
-        mm1 = mmap.mmap(f1.fileno(), 0, access=mmap.ACCESS_READ)
-        mm2 = mmap.mmap(f2.fileno(), 0, access=mmap.ACCESS_READ)
-
-        offset = 0
-        while offset < len(mm1) and offset < len(mm2):
-            # Read chunks
-            chunk1 = mm1[offset:offset + chunk_size]
-            chunk2 = mm2[offset:offset + chunk_size]
-
-            # Convert chunks to NumPy arrays
-            arr1 = np.frombuffer(chunk1, dtype=np.uint8)
-            arr2 = np.frombuffer(chunk2, dtype=np.uint8)
-
-            # Find differences
-            diffs = np.where(arr1 != arr2)[0]
-            for diff in diffs:
-                out.write(f"{offset + diff}: {arr1[diff]:02x} -> {arr2[diff]:02x}\n")
-
-            offset += chunk_size
-
-        # Handle case where files have different lengths
-        if len(mm1) != len(mm2):
-            longer, shorter, label = (mm1, mm2, "file1") if len(mm1) > len(mm2) else (mm2, mm1, "file2")
-            for i in range(len(shorter), len(longer)):
-                value = longer[i]
-                out.write(f"{i}: {value:02x} -> None ({label} extra byte)\n")
-
-        print(f"Differences written to {output_file}")
-
-
-# Example usage
-generate_unicode_delta_numpy("Windows 10 Lite Edition 19H2 x64.iso", "decoded_Windows 10 Lite Edition 19H2 x64.iso", "delta_file_unicode.txt")
+import argparse
+import json
+import os
+import sys
+from libs.config_loader import load_config
+from libs.corruption_map import (find_differing_ranges, get_frame_geometry, get_symbol_ranges, get_box_error_counts, write_heatmap,
+                                 build_corruption_summary)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compares an encoded file with its decoded copy and maps the differing bytes back to the data frames and boxes holding them.")
+    parser.add_argument("original_path")
+    parser.add_argument("decoded_path")
+    parser.add_argument("--config", default="config.ini", help="Config the video was encoded with, for its frame geometry.")
+    parser.add_argument("--summary", help="File to write the summary to, as JSON, stdout if omitted.")
+    parser.add_argument("--ranges", help="File to write every differing range to, one 'start end' line per range.")
+    parser.add_argument("--heatmap", help="Image to write the heatmap of the corrupted boxes to, over the frame's data region.")
+    parser.add_argument("--top", type=int, default=20, help="Worst data frames and largest ranges listed in the summary.")
+    args = parser.parse_args()
+
+    for file_path in (args.original_path, args.decoded_path):
+        if not os.path.exists(file_path):
+            print(f"File not found: {file_path}", file=sys.stderr)
+            sys.exit(1)
+
+    config = load_config(args.config)
+    geometry = get_frame_geometry(config)
+    starts, ends = find_differing_ranges(args.original_path, args.decoded_path)
+
+    if args.ranges:
+        with open(args.ranges, "w", encoding="utf-8") as f:
+            f.writelines(f"{start} {end}\n" for start, end in zip(starts.tolist(), ends.tolist()))
+    if args.heatmap:
+        write_heatmap(get_box_error_counts(*get_symbol_ranges(starts, ends, geometry), geometry), geometry, args.heatmap)
+
+    summary = build_corruption_summary(starts, ends, os.path.getsize(args.original_path), geometry, args.top)
+    if args.summary:
+        with open(args.summary, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=4)
+        print(f"{summary['differing_bytes']} bytes differ in {summary['differing_ranges']} ranges over {summary['affected_data_frames']} "
+              f"of {summary['data_frames']} data frames, summary written to {args.summary}")
+    else:
+        print(json.dumps(summary, indent=4))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+import argparse
+import json
+import sys
+from libs.gray_code_palette import gray_code_palette, get_palette_confusion_cost
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Reassigns the colors of an encoding map to its symbols so that colors that look alike stand for values one bit apart.")
+    parser.add_argument("encoding_map_path")
+    parser.add_argument("-o", "--output", help="Encoding map file to write, stdout if omitted.")
+    args = parser.parse_args()
+
+    with open(args.encoding_map_path, "r") as f:
+        encoding_color_map = json.load(f)
+    try:
+        gray_coded_color_map = gray_code_palette(encoding_color_map)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        sys.exit(1)
+
+    print(
+        f"Bits flipped per color confusion: {get_palette_confusion_cost(encoding_color_map):.3f} -> "
+        f"{get_palette_confusion_cost(gray_coded_color_map):.3f}",
+        file=sys.stderr)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(gray_coded_color_map, f, indent=4)
+            f.write("\n")
+    else:
+        print(json.dumps(gray_coded_color_map, indent=4))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,15 @@
-import base64
-import binascii
 from tqdm import tqdm
 import os
 import sys
 import math
 import hashlib
-from .detect_base_from_json import get_length_from_base
+from .detect_base_from_json import get_length_from_base, get_length_in_base
 from .content_type import ContentType
 from .metadata_utils import get_metadata, get_pre_metadata
+from .binary_header import pack_binary_header
+from .bytes_to_baseN import bytes_to_baseN
+from .frame_strip import pack_frame_strip
+from .TreeHash import TreeHash, get_tree_hash_leaf_size
 
 
 class FileToEncodedData:
@@ -20,10 +22,14 @@ class FileToEncodedData:
         self.config = config
         self.file_path = file_path
         self.debug = debug
-        self.sha1 = hashlib.sha1()
+        # The tree hash is hashed per data frame, the legacy whole file SHA1 only for decoders that check nothing else
+        self.sha1 = hashlib.sha1() if config['legacy_sha1'] else None
+        self.tree_hash = TreeHash(get_tree_hash_leaf_size(config))
         self.total_baseN_length = 0
+        self.data_frames_count = 0
         self.format_string = config["encoding_format_string"]
         self.usable_databoxes_in_frame = config['usable_databoxes_in_frame']
+        self.bytes_per_chunk = get_length_from_base(config["encoding_chunk_size"], config["encoding_bits_per_value"])
         self.stream_encoded_file = open(f"{file_path}_encoded_stream.txt", "w") if debug else None
         self.file_size = os.path.getsize(file_path)
         self.file = open(file_path, "rb", buffering=100 * 1024 * 1024)
@@ -43,6 +49,17 @@ class FileToEncodedData:
         self.metadata_or_pre_metadata_read_position = 0
         self.pbar = tqdm(total=len(self.pre_metadata), desc="Processing Pre Metadata", unit="B", unit_scale=True)
 
+    def create_binary_header(self):
+        self.buffer = ''
+        self.pre_metadata = pack_binary_header(os.path.basename(self.file_path), self.file_size, self.total_baseN_length, self.get_sha1_hexdigest(),
+                                               self.tree_hash.hexdigest(), self.config, self.bytes_per_chunk)
+        header_baseN_length = get_length_in_base(len(self.pre_metadata), self.config["encoding_bits_per_value"])
+        if header_baseN_length > self.usable_databoxes_in_frame[ContentType.PREMETADATA.value]:
+            print("The binary header does not fit in a single pre_metadata frame, use header_format = text or a smaller data_box_size_step.")
+            sys.exit(1)
+        self.metadata_or_pre_metadata_read_position = 0
+        self.pbar = tqdm(total=len(self.pre_metadata), desc="Processing Binary Header", unit="B", unit_scale=True)
+
     def create_metadata(self):
         self.buffer = ''
         self.metadata_or_pre_metadata_read_position = 0
@@ -81,6 +98,8 @@ class FileToEncodedData:
         needed_baseN_data = self.usable_databoxes_in_frame[self.content_type.value] - len(self.buffer)
         if needed_baseN_data > 0:
             bytes_to_read = max(math.ceil((needed_baseN_data * self.config["encoding_bits_per_value"]) / 8), 10 * 1024 * 1024)  # Read at least 10 MB
+            # Keep reads on whole decoding chunks, so Base64 never pads ('=') in the middle of the stream
+            bytes_to_read = math.ceil(bytes_to_read / self.bytes_per_chunk) * self.bytes_per_chunk
             file_chunk = b''
 
             if self.content_type == ContentType.PREMETADATA or self.content_type == ContentType.METADATA:
@@ -92,7 +111,8 @@ class FileToEncodedData:
                     start_pos = self.metadata_or_pre_metadata_read_position
                     end_pos = min(start_pos + bytes_to_read, len(metadata_or_premetadata_str))
 
-                    file_chunk = metadata_or_premetadata_str[start_pos:end_pos].encode('utf-8')
+                    file_chunk = metadata_or_premetadata_str[start_pos:end_pos]
+                    file_chunk = file_chunk.encode('utf-8') if isinstance(file_chunk, str) else file_chunk
                     self.metadata_or_pre_metadata_read_position += (end_pos - start_pos)
             else:
                 file_chunk = self.file.read(bytes_to_read)
@@ -107,20 +127,21 @@ class FileToEncodedData:
                 elif self.content_type == ContentType.DATACONTENT:
                     self.stream_encoded_file.close() if self.stream_encoded_file else None
                     self.file.close()
-                    self.create_metadata()
-                    self.content_type = ContentType.METADATA
+                    if self.config['header_format'] == 'binary':
+                        # The binary header replaces the pre_metadata and metadata, it has no METADATA frames
+                        self.create_binary_header()
+                        self.content_type = ContentType.PREMETADATA
+                    else:
+                        self.create_metadata()
+                        self.content_type = ContentType.METADATA
                 raise StopIteration
 
-            self.sha1.update(file_chunk)
+            if self.content_type == ContentType.DATACONTENT:
+                self.sha1 and self.sha1.update(file_chunk)
+                self.tree_hash.update(file_chunk)
 
             # Convert file_chunk to baseN data (either C-based or fallback)
-            if self.config["encoding_base"] == 16:  # Hex encoding
-                chunk_baseN_data = binascii.hexlify(file_chunk).decode('ascii') if file_chunk else ''
-            elif self.config["encoding_base"] == 64:  # Base64 encoding
-                chunk_baseN_data = base64.b64encode(file_chunk).decode('ascii') if file_chunk else ''
-            else:
-                # Fallback to old method if the encoding is custom
-                chunk_baseN_data = "".join(f"{byte:{self.format_string}}" for byte in file_chunk)
+            chunk_baseN_data = bytes_to_baseN(file_chunk, self.config["encoding_base"], self.format_string)
 
             self.total_baseN_length += len(chunk_baseN_data)
 
@@ -138,13 +159,21 @@ class FileToEncodedData:
         self.pbar.update(get_length_from_base(len(data_to_yield), self.config["encoding_bits_per_value"]))
 
         self.stream_encoded_file.write(data_to_yield) if self.stream_encoded_file and self.content_type == ContentType.DATACONTENT else None
+        # Prefix every data frame with its header strip, its sequence number and the CRC32 of its payload
+        if self.content_type == ContentType.DATACONTENT and self.config['frame_header_strip']:
+            data_to_yield = pack_frame_strip(self.data_frames_count, data_to_yield, self.config['frame_strip_bytes'], self.config["encoding_base"],
+                                             self.format_string) + data_to_yield
+            self.data_frames_count += 1
         self.metadata_item_frame_count = self.metadata_item_frame_count + 1 if self.content_type == ContentType.METADATA else 0
         return (self.content_type, data_to_yield)
 
     def get_metadata(self):
         metadata_dict, self.metadata_rscodec_value = get_metadata(self.config, self.file_path, self.file_size, self.total_baseN_length,
-                                                                  self.sha1.hexdigest())
+                                                                  self.get_sha1_hexdigest(), self.tree_hash.hexdigest())
         return metadata_dict
 
+    def get_sha1_hexdigest(self):
+        return self.sha1.hexdigest() if self.sha1 else None
+
     def get_pre_metadata(self):
         return get_pre_metadata(self.config, self.metadata_frames_and_details)
@@ -3,7 +3,9 @@ from .config_loader import load_config
 
 class Metadata:
     # Define the metadata keys
-    METADATA_KEYS = ["filename", "filesize", "total_baseN_length", "sha1_checksum"]
+    METADATA_KEYS = ["filename", "filesize", "total_baseN_length", "sha1_checksum", "tree_hash"]
+    # Metadata of videos encoded before the tree hash ends at the SHA1
+    LEGACY_METADATA_KEYS = METADATA_KEYS[:-1]
 
     def __init__(self):
         self.config = load_config('config.ini')
@@ -12,7 +14,8 @@ class Metadata:
     def parse(self, meta_str):
         """
         Parse a metadata string of the form:
-          |::-::|METADATA|:-:|Test03.iso|:-:|2134119|:-:|17072952|:-:|13c1d0cd49f31cf5976a14ca8821f1da69f6167a|::-::|
+          |::-::|METADATA|:-:|Test03.iso|:-:|2134119|:-:|17072952|:-:|13c1d0cd49f31cf5976a14ca8821f1da69f6167a|:-:|<tree hash>|::-::|
+        An empty SHA1 (encoded without legacy_sha1) or a missing tree hash (legacy metadata) are parsed as None.
         """
         main_delim = self.config['premetadata_metadata_main_delimiter']
         sub_delim = self.config['premetadata_metadata_sub_delimiter']
@@ -28,12 +31,15 @@ class Metadata:
         if tokens[0] != "METADATA":
             raise ValueError("Metadata.py: Invalid metadata header: expected 'METADATA'")
 
-        if len(tokens[1:]) != len(Metadata.METADATA_KEYS):
+        if len(tokens[1:]) not in (len(Metadata.METADATA_KEYS), len(Metadata.LEGACY_METADATA_KEYS)):
             raise ValueError("Metadata.py: Invalid metadata format: incorrect number of fields")
 
         # Assign parsed values
-        for i, key in enumerate(Metadata.METADATA_KEYS):
-            self.metadata[key] = tokens[i + 1] if key == "filename" or key == "sha1_checksum" else int(tokens[i + 1])
+        for i, key in enumerate(Metadata.METADATA_KEYS[:len(tokens[1:])]):
+            if key in ("sha1_checksum", "tree_hash"):
+                self.metadata[key] = tokens[i + 1] or None
+            else:
+                self.metadata[key] = tokens[i + 1] if key == "filename" else int(tokens[i + 1])
 
     def __str__(self):
         # Build a string representation of the object.
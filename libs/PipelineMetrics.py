@@ -0,0 +1,153 @@
+import json
+import os
+import threading
+import time
+
+
+class PipelineMetrics:
+    """
+    Counters and timers of a pipeline's stages and queues, cheap enough to leave on (a perf_counter() pair and a lock per item).
+    Every stage counts its items, their bytes and the seconds it spent on them (busy, or blocked on the next stage,
+    e.g. writing to ffmpeg blocks while x264 is behind), every queue the seconds spent waiting on it and its depth.
+    With a `metrics_dir`, a background thread exports them every `interval_seconds`, appended as a JSON line
+    to <pipeline>_metrics.jsonl (restarted by every run) and as a Prometheus text file, <pipeline>_metrics.prom
+    (for node_exporter's textfile collector).
+    """
+
+    def __init__(self, pipeline, metrics_dir=None, interval_seconds=0):
+        self.pipeline = pipeline
+        self.metrics_dir = metrics_dir
+        self.interval_seconds = interval_seconds
+        self.start_time = time.time()
+        self.start_perf_counter = time.perf_counter()
+        self.lock = threading.Lock()
+        self.stages = {}
+        self.queue_waits = {}
+        self.queues = {}
+        self.last_export = (self.start_perf_counter, {})
+        self.stop_event = threading.Event()
+        self.export_thread = None
+
+    @classmethod
+    def from_config(cls, config, pipeline):
+        """Returns the pipeline's metrics, exported as the config sets it up (pipeline_metrics...)."""
+        metrics_dir = config['pipeline_metrics_dir'] if config['pipeline_metrics'] and config['pipeline_metrics_interval_seconds'] > 0 else None
+        return cls(pipeline, metrics_dir, config['pipeline_metrics_interval_seconds']).start()
+
+    def start(self):
+        if self.metrics_dir is not None:
+            os.makedirs(self.metrics_dir, exist_ok=True)
+            # The JSON lines of a previous run are dropped, so the file doesn't grow run after run
+            open(os.path.join(self.metrics_dir, f"{self.pipeline}_metrics.jsonl"), "w").close()
+            self.export_thread = threading.Thread(target=self.export_periodically, daemon=True)
+            self.export_thread.start()
+        return self
+
+    def close(self):
+        """Stops the periodic export and exports the final counts."""
+        if self.export_thread is not None:
+            self.stop_event.set()
+            self.export_thread.join()
+            self.export_thread = None
+            self.export()
+
+    def count(self, stage, seconds, items=1, nbytes=0):
+        with self.lock:
+            counters = self.stages.get(stage)
+            if counters is None:
+                counters = self.stages[stage] = [0, 0, 0.0]
+            counters[0] += items
+            counters[1] += nbytes
+            counters[2] += seconds
+
+    def wait(self, queue_name, seconds):
+        """Counts `seconds` spent blocked on getting from or putting to the queue `queue_name`."""
+        with self.lock:
+            waits = self.queue_waits.get(queue_name)
+            if waits is None:
+                waits = self.queue_waits[queue_name] = [0, 0.0]
+            waits[0] += 1
+            waits[1] += seconds
+
+    def watch_queue(self, queue_name, queue):
+        """Samples the depth of `queue` (anything with qsize()) at every export."""
+        self.queues[queue_name] = queue
+
+    def timed(self, stage, iterable, nbytes=None):
+        """Yields the items of `iterable`, counting the seconds waited on every next one to `stage`, and their nbytes(item) if given."""
+        iterator = iter(iterable)
+        while True:
+            start_time = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            self.count(stage, time.perf_counter() - start_time, 1, nbytes(item) if nbytes else 0)
+            yield item
+
+    def snapshot(self):
+        """Returns the counts so far, with every stage's rates since the previous snapshot."""
+        now = time.perf_counter()
+        with self.lock:
+            stages = {stage: tuple(counters) for stage, counters in self.stages.items()}
+            queue_waits = {queue_name: tuple(waits) for queue_name, waits in self.queue_waits.items()}
+        last_time, last_stages = self.last_export
+        interval = max(now - last_time, 1e-9)
+        self.last_export = (now, stages)
+
+        snapshot = {
+            "time": time.time(),
+            "pipeline": self.pipeline,
+            "start_time": self.start_time,
+            "elapsed_seconds": now - self.start_perf_counter,
+            "stages": {},
+            "queues": {},
+        }
+        for stage, (items, nbytes, seconds) in stages.items():
+            last_items, last_nbytes, _ = last_stages.get(stage, (0, 0, 0.0))
+            snapshot["stages"][stage] = {
+                "items": items,
+                "bytes": nbytes,
+                "seconds": seconds,
+                "items_per_second": (items - last_items) / interval,
+                "bytes_per_second": (nbytes - last_nbytes) / interval,
+            }
+        for queue_name in sorted(set(queue_waits) | set(self.queues)):
+            waits, wait_seconds = queue_waits.get(queue_name, (0, 0.0))
+            queue = self.queues.get(queue_name)
+            snapshot["queues"][queue_name] = {
+                "depth": queue.qsize() if queue is not None else None,
+                "waits": waits,
+                "wait_seconds": wait_seconds,
+            }
+        return snapshot
+
+    def export(self):
+        snapshot = self.snapshot()
+        with open(os.path.join(self.metrics_dir, f"{self.pipeline}_metrics.jsonl"), "a", encoding="utf-8") as f:
+            f.write(json.dumps(snapshot) + "\n")
+
+        lines = []
+        for name, help_text, metric_type, key, values in (
+            ("stage_items_total", "Items a stage handled.", "counter", "items", snapshot["stages"]),
+            ("stage_bytes_total", "Bytes a stage handled.", "counter", "bytes", snapshot["stages"]),
+            ("stage_seconds_total", "Seconds a stage spent on its items.", "counter", "seconds", snapshot["stages"]),
+            ("queue_depth", "Items waiting in a queue.", "gauge", "depth", snapshot["queues"]),
+            ("queue_waits_total", "Waits on a queue.", "counter", "waits", snapshot["queues"]),
+            ("queue_wait_seconds_total", "Seconds spent waiting on a queue.", "counter", "wait_seconds", snapshot["queues"]),
+        ):
+            label = "stage" if name.startswith("stage") else "queue"
+            lines.append(f"# HELP filetoyoutube_{name} {help_text}")
+            lines.append(f"# TYPE filetoyoutube_{name} {metric_type}")
+            for value_name, value in values.items():
+                if value[key] is not None:
+                    lines.append(f'filetoyoutube_{name}{{pipeline="{self.pipeline}",{label}="{value_name}"}} {value[key]}')
+        # Written aside and renamed, so a scrape never reads a partial file
+        prometheus_path = os.path.join(self.metrics_dir, f"{self.pipeline}_metrics.prom")
+        with open(prometheus_path + ".tmp", "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(prometheus_path + ".tmp", prometheus_path)
+
+    def export_periodically(self):
+        while not self.stop_event.wait(self.interval_seconds):
+            self.export()
@@ -0,0 +1,56 @@
+import queue
+import numpy as np
+from multiprocessing import shared_memory
+
+
+class SharedFrameRing:
+    """
+    A ring of frame sized slots in shared memory, the reader thread decodes frames straight into a free slot
+    and the pool workers only receive the slot index, instead of a pickled copy of the whole frame.
+    """
+
+    def __init__(self, slot_count, frame_shape):
+        if slot_count < 1:
+            raise ValueError("SharedFrameRing.py: slot_count must be at least 1")
+        self.slot_count = slot_count
+        self.frame_shape = tuple(frame_shape)
+        self.shared_memory = shared_memory.SharedMemory(create=True, size=slot_count * int(np.prod(self.frame_shape)))
+        self.slots = np.ndarray((slot_count, *self.frame_shape), dtype=np.uint8, buffer=self.shared_memory.buf)
+        self.free_slots = queue.Queue()
+        for slot_index in range(slot_count):
+            self.free_slots.put(slot_index)
+        self.slot_of_frame = {}
+
+    @property
+    def name(self):
+        return self.shared_memory.name
+
+    def acquire(self, frame_index, stop_event=None):
+        """Blocks until a slot is free and reserves it for `frame_index`, returns None if `stop_event` is set meanwhile."""
+        while True:
+            try:
+                slot_index = self.free_slots.get(timeout=0.5)
+                break
+            except queue.Empty:
+                if stop_event is not None and stop_event.is_set():
+                    return None
+        self.slot_of_frame[frame_index] = slot_index
+        return slot_index
+
+    def release(self, frame_index):
+        """Returns the slot of `frame_index` to the ring, once the worker is done with it."""
+        slot_index = self.slot_of_frame.pop(frame_index, None)
+        if slot_index is not None:
+            self.free_slots.put(slot_index)
+
+    def close(self):
+        del self.slots
+        self.shared_memory.close()
+        self.shared_memory.unlink()
+
+    @staticmethod
+    def attach(name, slot_count, frame_shape):
+        """Attaches to an existing ring from a worker process, returns the shared memory and the slots array over it."""
+        attached_memory = shared_memory.SharedMemory(name=name)
+        slots = np.ndarray((slot_count, *frame_shape), dtype=np.uint8, buffer=attached_memory.buf)
+        return attached_memory, slots
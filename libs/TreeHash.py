@@ -0,0 +1,57 @@
+import hashlib
+from .content_type import ContentType
+from .detect_base_from_json import get_length_from_base
+
+
+def get_tree_hash_leaf_size(config):
+    """Returns the bytes hashed into one leaf of the tree hash, those of one (full) data frame."""
+    return get_length_from_base(config['usable_databoxes_in_frame'][ContentType.DATACONTENT.value], config['encoding_bits_per_value'])
+
+
+class TreeHash:
+    """
+    Two level hash of a payload: every `leaf_size` bytes are hashed on their own (SHA1) into a leaf,
+    the root is the SHA1 of all the leaf digests in order.
+    Leaves can be fed as a byte stream (update) or set directly, in any order, by whoever hashed their bytes (set_leaf),
+    so the payload is hashed in parallel, and a mismatching root is pinned down to its leaves by comparing them.
+    """
+
+    def __init__(self, leaf_size):
+        self.leaf_size = leaf_size
+        self.leaves = {}
+        self.leaf_index = 0
+        self.leaf_sha1 = hashlib.sha1()
+        self.leaf_fill = 0
+
+    def update(self, data):
+        """Hashes the next bytes of the payload, in order."""
+        data = memoryview(data)
+        while data:
+            taken = data[:self.leaf_size - self.leaf_fill]
+            self.leaf_sha1.update(taken)
+            self.leaf_fill += len(taken)
+            data = data[len(taken):]
+            if self.leaf_fill == self.leaf_size:
+                self.set_leaf(self.leaf_index, self.leaf_sha1.digest())
+                self.leaf_index += 1
+                self.leaf_sha1 = hashlib.sha1()
+                self.leaf_fill = 0
+
+    def set_leaf(self, leaf_index, leaf_digest):
+        self.leaves[leaf_index] = leaf_digest
+
+    def finish(self):
+        """Hashes the last, partial, leaf fed by update(...), if any."""
+        if self.leaf_fill:
+            self.set_leaf(self.leaf_index, self.leaf_sha1.digest())
+            self.leaf_index += 1
+            self.leaf_sha1 = hashlib.sha1()
+            self.leaf_fill = 0
+
+    def leaf_hexdigests(self):
+        self.finish()
+        return [self.leaves[leaf_index].hex() for leaf_index in sorted(self.leaves)]
+
+    def hexdigest(self):
+        self.finish()
+        return hashlib.sha1(b''.join(self.leaves[leaf_index] for leaf_index in sorted(self.leaves))).hexdigest()
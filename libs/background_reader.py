@@ -1,12 +1,14 @@
 import cv2
 import queue
+import time
 
 
-def background_reader(cap, frame_queue, stop_event, frame_start, frame_step):
+def background_reader(cap, frame_queue, stop_event, frame_start, frame_step, metrics=None):
     """
     Continuously reads frames from the given VideoCapture 'cap' and
     pushes them into 'frame_queue' (bounded to 'max_frames'). The 'stop_event'
     is used to stop reading before we exhaust the video if needed.
+    With `metrics` (PipelineMetrics), the reads are counted to the "bgr_reader" stage and the blocked puts to the "bgr_frame_queue".
     """
     cap.set(cv2.CAP_PROP_POS_FRAMES, frame_start)  # Set the initial frame position
     frame_idx = frame_start
@@ -14,11 +16,17 @@ def background_reader(cap, frame_queue, stop_event, frame_start, frame_step):
     while not stop_event.is_set():
         try:
             if frame is None:
+                start_time = time.perf_counter()
                 ret, frame = cap.read()
+                metrics and ret and metrics.count("bgr_reader", time.perf_counter() - start_time, 1, frame.nbytes)
             if not ret:
                 frame_queue.put(None, timeout=0.5)
                 break
-            frame_queue.put(frame, timeout=0.5)
+            start_time = time.perf_counter()
+            try:
+                frame_queue.put(frame, timeout=0.5)
+            finally:
+                metrics and metrics.wait("bgr_frame_queue", time.perf_counter() - start_time)
 
             for _ in range(frame_step - 1):
                 ret_skip, _ = cap.read()
@@ -0,0 +1,76 @@
+import math
+import struct
+import zlib
+from reedsolo import RSCodec, ReedSolomonError
+
+BINARY_HEADER_MAGIC = b'FTYV'
+BINARY_HEADER_VERSION = 1
+# magic, version, filename length, filename (utf-8, zero padded), filesize, total_baseN_length, sha1 digest (zeros without legacy_sha1),
+# tree hash root digest, video layout flags (BINARY_HEADER_LAYOUT_FLAGS)
+BINARY_HEADER_STRUCT = struct.Struct("<4sBH255sQQ20s20sB")
+# The bit of every video layout setting (the config settings the decoder must share with the encoder) in the layout flags
+BINARY_HEADER_LAYOUT_FLAGS = {
+    'allow_byte_to_be_split_between_frames': 0x01,
+    'gray_coded_palette': 0x02,
+    'frame_header_strip': 0x04,
+    'calibration_frame': 0x08,
+}
+BINARY_HEADER_CRC_STRUCT = struct.Struct("<I")
+BINARY_HEADER_RSCODEC_VALUE = 32
+
+binary_header_rscodec = RSCodec(BINARY_HEADER_RSCODEC_VALUE)
+# The header is encoded as a single Reed-Solomon protected copy of the struct followed by its CRC32
+BINARY_HEADER_SIZE = len(binary_header_rscodec.encode(bytes(BINARY_HEADER_STRUCT.size + BINARY_HEADER_CRC_STRUCT.size)))
+
+
+def get_binary_header_length(bytes_per_chunk):
+    """Returns the length of the encoded header, padded to whole decoding chunks."""
+    return math.ceil(BINARY_HEADER_SIZE / bytes_per_chunk) * bytes_per_chunk
+
+
+def pack_binary_header(filename, file_size, total_baseN_length, sha1hex, tree_hash_hex, layout, bytes_per_chunk):
+    """
+    Returns the binary header of an encoded file: the fixed size struct and its CRC32, Reed-Solomon encoded
+    and zero padded to whole decoding chunks. A None `sha1hex` (encoded without legacy_sha1) is stored as zeros.
+    `layout` holds the video layout settings (the config), stored as flags.
+    """
+    filename_bytes = filename.encode('utf-8')[:255]
+    layout_flags = sum(flag for key, flag in BINARY_HEADER_LAYOUT_FLAGS.items() if layout[key])
+    header = BINARY_HEADER_STRUCT.pack(BINARY_HEADER_MAGIC, BINARY_HEADER_VERSION, len(filename_bytes), filename_bytes, file_size, total_baseN_length,
+                                       bytes.fromhex(sha1hex) if sha1hex else bytes(20), bytes.fromhex(tree_hash_hex), layout_flags)
+    header += BINARY_HEADER_CRC_STRUCT.pack(zlib.crc32(header))
+    return bytes(binary_header_rscodec.encode(header)).ljust(get_binary_header_length(bytes_per_chunk), b'\0')
+
+
+def unpack_binary_header(data):
+    """
+    Returns the metadata fields (keyed as in Metadata.METADATA_KEYS) of the binary header at the start of `data`,
+    None if `data` doesn't hold a valid one (e.g. it holds a text pre_metadata instead).
+    "layout" holds the video layout settings (keyed as in BINARY_HEADER_LAYOUT_FLAGS).
+    """
+    if len(data) < BINARY_HEADER_SIZE:
+        return None
+    try:
+        header = bytes(binary_header_rscodec.decode(bytes(data[:BINARY_HEADER_SIZE]))[0])
+    except ReedSolomonError:
+        return None
+
+    header, (crc32, ) = header[:BINARY_HEADER_STRUCT.size], BINARY_HEADER_CRC_STRUCT.unpack(header[BINARY_HEADER_STRUCT.size:])
+    if zlib.crc32(header) != crc32:
+        return None
+    magic, version, filename_length, filename_bytes, file_size, total_baseN_length, sha1_digest, tree_hash_digest, layout_flags = BINARY_HEADER_STRUCT.unpack(
+        header)
+    if magic != BINARY_HEADER_MAGIC or version != BINARY_HEADER_VERSION:
+        return None
+
+    return {
+        "filename": filename_bytes[:filename_length].decode('utf-8', errors='ignore'),
+        "filesize": file_size,
+        "total_baseN_length": total_baseN_length,
+        "sha1_checksum": sha1_digest.hex() if any(sha1_digest) else None,
+        "tree_hash": tree_hash_digest.hex(),
+        "layout": {
+            key: bool(layout_flags & flag)
+            for key, flag in BINARY_HEADER_LAYOUT_FLAGS.items()
+        },
+    }
@@ -0,0 +1,42 @@
+from .content_type import ContentType
+
+
+def build_config_params(config):
+    """
+    Returns the decoding parameters for every content type, keyed by the content type's name,
+    in the shape process_frame_optimized(...) expects them.
+    """
+    # Common parameters that do not depend on content type
+    common_config_params = {
+        "start_height": config["start_height"],
+        "start_width": config["start_width"],
+        "encoding_base": config["encoding_base"],
+        "encoding_chunk_size": config["encoding_chunk_size"],
+        "encoding_bits_per_value": config["encoding_bits_per_value"],
+        "decoding_function": config["decoding_function"],
+        "encoding_color_map_keys": config["encoding_color_map_keys"],
+        "encoding_color_map_values": config["encoding_color_map_values"],
+        "encoding_color_map_values_lower_bounds": config["encoding_color_map_values_lower_bounds"],
+        "encoding_color_map_values_upper_bounds": config["encoding_color_map_values_upper_bounds"],
+        "premetadata_metadata_main_delimiter": config['premetadata_metadata_main_delimiter'],
+        "premetadata_metadata_sub_delimiter": config['premetadata_metadata_sub_delimiter'],
+        "length_of_digits_to_represent_size": config['length_of_digits_to_represent_size']
+    }
+
+    config_params = {}
+    content_types = ["PREMETADATA", "METADATA", "DATACONTENT"]
+    for content_type in content_types:
+        specific_config_params = {
+            "box_step": config["data_box_size_step"][ContentType[content_type].value],
+            "usable_w": config["usable_width"][ContentType[content_type].value],
+            "usable_h": config["usable_height"][ContentType[content_type].value],
+            "databoxes_per_frame": config["usable_databoxes_in_frame"][ContentType[content_type].value],
+            "frame_strip_databoxes": config["frame_strip_databoxes"][ContentType[content_type].value],
+            "pick_frame_to_read": config["pick_frame_to_read"][ContentType[content_type].value],
+            "total_frames_repetition": config["total_frames_repetition"][ContentType[content_type].value],
+            "frames_are_chunk_aligned": config["frames_are_chunk_aligned"][ContentType[content_type].value],
+        }
+
+        config_params[content_type] = {**common_config_params, **specific_config_params}
+
+    return config_params
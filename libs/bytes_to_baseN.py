@@ -0,0 +1,13 @@
+import base64
+import binascii
+
+
+def bytes_to_baseN(data, encoding_base, format_string):
+    """Converts `data` to the baseN values (the characters of the encoding map) it is encoded as."""
+    if encoding_base == 16:  # Hex encoding
+        return binascii.hexlify(data).decode('ascii') if data else ''
+    elif encoding_base == 64:  # Base64 encoding
+        return base64.b64encode(data).decode('ascii') if data else ''
+    else:
+        # Fallback to old method if the encoding is custom
+        return "".join(f"{byte:{format_string}}" for byte in data)
@@ -0,0 +1,47 @@
+import numpy as np
+from .content_type import ContentType
+from .vote_copies import sample_block_grid
+
+
+def get_calibration_frame_data(config):
+    """
+    Returns the data of the calibration frame: the encoding map's keys in order, repeated over every data box
+    of a content frame (frame strip included), so every palette color is shown on many boxes spread over the frame.
+    """
+    content_type = ContentType.DATACONTENT.value
+    box_step = config['data_box_size_step'][content_type]
+    total_blocks = (config['usable_width'][content_type] // box_step) * (config['usable_height'][content_type] // box_step)
+    keys = ''.join(config['encoding_color_map'].keys())
+    return (keys * (total_blocks // len(keys) + 1))[:total_blocks]
+
+
+def fit_calibration_palette(frame, config_params, color_threshold):
+    """
+    Returns (values, lower_bounds, upper_bounds), the lookup tables of determine_color_key(...) rebuilt around the
+    per channel median color observed for every key on the calibration `frame` (BGR) instead of its palette color.
+    A key's bounds are `color_threshold` wide, narrowed where needed so that no two keys' bounds overlap in all three channels.
+    """
+    keys = config_params["encoding_color_map_keys"]
+    block_grid = sample_block_grid(frame, config_params).reshape(-1, 3)
+    # The calibration frame shows the keys in order, over and over
+    key_of_block = np.arange(len(block_grid)) % len(keys)
+
+    values = np.array([np.median(block_grid[key_of_block == key_index], axis=0)[::-1] for key_index in range(len(keys))]).round().astype(np.int64)
+
+    # Keys whose bounds stay under half their (largest channel) distance never overlap in that channel
+    distances = np.abs(values[:, None, :] - values[None, :, :]).max(axis=2)
+    np.fill_diagonal(distances, 2 * color_threshold + 2)
+    thresholds = np.clip(np.minimum(color_threshold, (distances.min(axis=1) + 1) // 2 - 1), 0, None)[:, None]
+
+    lower_bounds = np.clip(values - thresholds, 0, 255).astype(np.uint8)
+    upper_bounds = np.clip(values + thresholds, 0, 255).astype(np.uint8)
+    return values, lower_bounds, upper_bounds
+
+
+def apply_calibration_palette(config_params, palette):
+    """Replaces the color lookup tables of every content type's config_params with the fitted `palette`."""
+    values, lower_bounds, upper_bounds = palette
+    for content_config_params in config_params.values():
+        content_config_params["encoding_color_map_values"] = values
+        content_config_params["encoding_color_map_values_lower_bounds"] = lower_bounds
+        content_config_params["encoding_color_map_values_upper_bounds"] = upper_bounds
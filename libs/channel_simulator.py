@@ -0,0 +1,75 @@
+import cv2
+import ffmpeg
+import numpy as np
+
+# Re-encodes a video the way a platform would, every profile holds the codec (libx264 or libvpx-vp9), its crf or bitrate,
+# and optionally the height the video is downscaled to (and upscaled back from) and the frame rate it is resampled to.
+# Every profile outputs yuv420p, what the platforms serve.
+CHANNEL_PROFILES = {
+    "h264_crf23": dict(codec="libx264", crf=23),
+    "h264_crf30": dict(codec="libx264", crf=30),
+    "h264_4mbps": dict(codec="libx264", bitrate="4M"),
+    "vp9_crf32": dict(codec="libvpx-vp9", crf=32),
+    "vp9_crf40": dict(codec="libvpx-vp9", crf=40),
+    "h264_720p": dict(codec="libx264", crf=23, scale_height=720),
+    "h264_480p": dict(codec="libx264", crf=23, scale_height=480),
+    "h264_60fps": dict(codec="libx264", crf=23, fps=60),
+    "h264_25fps": dict(codec="libx264", crf=23, fps=25),
+}
+
+
+def simulate_channel(video_path, output_path, frame_width, frame_height, profile):
+    """Re-encodes `video_path` into `output_path` (a .mkv holds every codec) through the channel `profile`, see CHANNEL_PROFILES."""
+    stream = ffmpeg.input(video_path).video
+    if profile.get("scale_height"):
+        stream = stream.filter("scale", -2, profile["scale_height"]).filter("scale", frame_width, frame_height)
+    if profile.get("fps"):
+        stream = stream.filter("fps", fps=profile["fps"])
+
+    output_args = dict(vcodec=profile["codec"], pix_fmt="yuv420p")
+    if profile.get("bitrate"):
+        output_args["b:v"] = profile["bitrate"]
+    else:
+        output_args["crf"] = profile["crf"]
+        if profile["codec"] == "libvpx-vp9":
+            # Constant quality, VP9 otherwise caps the crf with a default bitrate
+            output_args["b:v"] = 0
+    ffmpeg.output(stream, output_path, **output_args).overwrite_output().run(capture_stdout=True, capture_stderr=True)
+
+
+def get_video_duration(video_path):
+    """Returns the duration of `video_path` in seconds, from its frame count and rate."""
+    cap = cv2.VideoCapture(video_path)
+    frame_count, fps = cap.get(cv2.CAP_PROP_FRAME_COUNT), cap.get(cv2.CAP_PROP_FPS)
+    cap.release()
+    return frame_count / fps if fps else 0.0
+
+
+def count_symbol_errors(original_path, decoded_path, bits_per_value, chunk_size=16 * 1024 * 1024):
+    """
+    Returns (symbol_errors, symbols), how many of the original's baseN symbols (boxes) the decoded file holds wrong.
+    Every symbol is `bits_per_value` bits of the byte stream, most significant first, so they are compared bit by bit
+    without converting either file to baseN. Symbols missing from a shorter decoded file count as wrong.
+    """
+    bits_per_value = int(bits_per_value)
+    symbol_errors = 0
+    original_bytes = 0
+    carried_bits = np.empty(0, dtype=np.uint8)
+    with open(original_path, "rb") as original, open(decoded_path, "rb") as decoded:
+        while original_chunk := original.read(chunk_size):
+            original_chunk = np.frombuffer(original_chunk, dtype=np.uint8)
+            decoded_chunk = np.frombuffer(decoded.read(len(original_chunk)), dtype=np.uint8)
+            original_bytes += len(original_chunk)
+            # Bytes past the end of the decoded file differ in all their bits
+            differing = np.full(len(original_chunk), 0xFF, dtype=np.uint8)
+            differing[:len(decoded_chunk)] = original_chunk[:len(decoded_chunk)] ^ decoded_chunk
+
+            # A symbol can straddle two chunks (Base64), its bits are carried over to the next one
+            differing_bits = np.concatenate((carried_bits, np.unpackbits(differing)))
+            whole_bits = len(differing_bits) - len(differing_bits) % bits_per_value
+            symbol_errors += int(np.count_nonzero(differing_bits[:whole_bits].reshape(-1, bits_per_value).any(axis=1)))
+            carried_bits = differing_bits[whole_bits:]
+
+    # The last symbol is padded with zero bits
+    symbol_errors += int(carried_bits.any())
+    return symbol_errors, -(-original_bytes * 8 // bits_per_value)
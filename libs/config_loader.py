@@ -5,7 +5,19 @@ import os
 import json
 import re
 import numpy as np
-from .detect_base_from_json import detect_base_from_json
+from .detect_base_from_json import detect_base_from_json, get_length_from_base
+from .content_type import ContentType
+from .frame_strip import get_frame_strip_size
+from .gray_code_palette import gray_code_palette
+
+# The layout of text header videos, the only one there was before the binary header: bytes split between frames,
+# no frame header strip, no calibration frame and the encoding map's own colors
+LEGACY_VIDEO_LAYOUT = {
+    'allow_byte_to_be_split_between_frames': True,
+    'frame_header_strip': False,
+    'calibration_frame': False,
+    'gray_coded_palette': False,
+}
 
 
 def convert_to_appropriate_type(value):
@@ -46,6 +58,10 @@ def load_config(filename):
         # Parse the list from JSON format
         config_dict[key] = value.split('#')[0].strip()
 
+    boolean_keys = [
+        'allow_byte_to_be_split_between_frames', 'use_same_bgr_frame_for_repetetion', 'header_trailer', 'frame_header_strip', 'temporal_sync',
+        'calibration_frame', 'gray_coded_palette', 'legacy_sha1', 'verify_after_encode', 'pipeline_metrics'
+    ]
     for key, value in config_dict.items():
         if key in ['total_frames_repetition', 'pick_frame_to_read', 'data_box_size_step']:
             # Parse the list from JSON format
@@ -53,7 +69,7 @@ def load_config(filename):
             # Ensure all elements are integers
             if not all(isinstance(item, int) for item in config_dict[key]):
                 raise ValueError(f"All elements in '{key}' must be integers.")
-        elif key in ['allow_byte_to_be_split_between_frames', 'use_same_bgr_frame_for_repetetion']:
+        elif key in boolean_keys:
             # Parse and validate boolean value
             lower_value = value.lower().strip()
             if lower_value in ['true', 'yes', '1']:
@@ -67,6 +83,24 @@ def load_config(filename):
         else:
             config_dict[key] = convert_to_appropriate_type(value)
 
+    # A text header has no room for the video layout, so text header videos always have the legacy one, whatever the config says
+    if config_dict.get('header_format') == 'text':
+        config_dict.update(LEGACY_VIDEO_LAYOUT)
+
+    return derive_config(config_dict)
+
+
+def apply_video_layout(config, layout):
+    """
+    Returns a copy of `config` with the video layout settings of `layout` (e.g. the ones recorded in a video's binary header,
+    see binary_header.BINARY_HEADER_LAYOUT_FLAGS) and the values derived from them, so a video is decoded with the layout
+    it was encoded with, whatever the decoder's config says.
+    """
+    return derive_config({**config, **layout})
+
+
+def derive_config(config_dict):
+    """Validates the parsed configuration settings and adds the values derived from them (color lookup tables, usable boxes...)."""
     # Ensure 'allow_byte_to_be_split_between_frames' has a default value
     if 'allow_byte_to_be_split_between_frames' not in config_dict:
         config_dict['allow_byte_to_be_split_between_frames'] = False
@@ -117,22 +151,6 @@ def load_config(filename):
         encoding_speed = config_dict['encoding_speed']
         if not isinstance(encoding_speed, int) or not 1 <= encoding_speed <= 9:
             raise ValueError("'encoding_speed' must be an integer value between 1 and 9 (inclusive).")
-
-    config_dict['usable_width'] = []
-    config_dict['usable_height'] = []
-    config_dict['usable_databoxes_in_frame'] = []
-    config_dict['available_width'] = config_dict['end_width'] - config_dict['start_width']
-    config_dict['available_height'] = config_dict['end_height'] - config_dict['start_height']
-
-    for box_size in config_dict['data_box_size_step']:
-        usable_width = (config_dict['available_width'] // box_size) * box_size
-        usable_height = (config_dict['available_height'] // box_size) * box_size
-        config_dict['usable_width'].append(usable_width)
-        config_dict['usable_height'].append(usable_height)
-        usable_databoxes_in_frame = (usable_width // box_size) * (usable_height // box_size)
-        usable_databoxes_in_frame = usable_databoxes_in_frame if config_dict['allow_byte_to_be_split_between_frames'] else (
-            (usable_databoxes_in_frame // 8) * 8)
-        config_dict['usable_databoxes_in_frame'].append(usable_databoxes_in_frame)
     #
     #
     """
@@ -150,6 +168,9 @@ def load_config(filename):
                     r"#[0-9A-Fa-f]{6}", color_code):
                 raise ValueError(f"Invalid color code: {color_code} in encoding map.")
 
+        if config_dict.get('gray_coded_palette'):
+            config_dict['encoding_color_map'] = gray_code_palette(config_dict['encoding_color_map'])
+
         config_dict["encoding_base"], config_dict["encoding_format_string"], config_dict["encoding_chunk_size"], config_dict[
             "encoding_function"], config_dict["decoding_function"] = detect_base_from_json(config_dict['encoding_color_map'])
         config_dict["encoding_bits_per_value"] = math.log2(config_dict["encoding_base"])
@@ -159,6 +180,7 @@ def load_config(filename):
 
         # Read "color_threshold_percent" from config.ini (like 5 => 0.05)
         color_threshold = math.ceil(config_dict.get("color_threshold_percent") / 100.0 * 255)
+        config_dict["color_threshold"] = color_threshold
 
         for key, hex_color in config_dict['encoding_color_map'].items():
             # Convert HEX (#RRGGBB) to BGR
@@ -203,4 +225,37 @@ def load_config(filename):
         config_dict["encoding_color_map_values_lower_bounds"] = encoding_color_map_values_lower_bounds
         config_dict["encoding_color_map_values_upper_bounds"] = encoding_color_map_values_upper_bounds
 
+    config_dict['usable_width'] = []
+    config_dict['usable_height'] = []
+    config_dict['usable_databoxes_in_frame'] = []
+    config_dict['frames_are_chunk_aligned'] = []
+    config_dict['available_width'] = config_dict['end_width'] - config_dict['start_width']
+    config_dict['available_height'] = config_dict['end_height'] - config_dict['start_height']
+
+    # A frame must end on a whole byte and on a whole decoding chunk (e.g. 4 Base64 chars) so that
+    # every frame can be decoded on its own, without the partial chunk of its predecessor.
+    encoding_chunk_size = config_dict.get('encoding_chunk_size', 8)
+    databoxes_alignment = 8 * encoding_chunk_size // math.gcd(8, encoding_chunk_size)
+
+    # The header strip (frame_strip.py) takes the first boxes of every DATACONTENT frame, the rest is the frame's payload
+    config_dict['frame_strip_databoxes'] = [0] * len(config_dict['data_box_size_step'])
+    config_dict.pop('frame_strip_bytes', None)
+    if config_dict.get('frame_header_strip') and 'encoding_base' in config_dict:
+        databoxes_alignment_of_strip = encoding_chunk_size if config_dict['allow_byte_to_be_split_between_frames'] else databoxes_alignment
+        config_dict['frame_strip_bytes'], config_dict['frame_strip_databoxes'][ContentType.DATACONTENT.value] = get_frame_strip_size(
+            config_dict['encoding_base'], config_dict['encoding_format_string'],
+            get_length_from_base(encoding_chunk_size, config_dict['encoding_bits_per_value']), databoxes_alignment_of_strip)
+
+    for box_size, frame_strip_databoxes in zip(config_dict['data_box_size_step'], config_dict['frame_strip_databoxes']):
+        usable_width = (config_dict['available_width'] // box_size) * box_size
+        usable_height = (config_dict['available_height'] // box_size) * box_size
+        config_dict['usable_width'].append(usable_width)
+        config_dict['usable_height'].append(usable_height)
+        usable_databoxes_in_frame = (usable_width // box_size) * (usable_height // box_size)
+        usable_databoxes_in_frame = usable_databoxes_in_frame if config_dict['allow_byte_to_be_split_between_frames'] else (
+            (usable_databoxes_in_frame // databoxes_alignment) * databoxes_alignment)
+        usable_databoxes_in_frame -= frame_strip_databoxes
+        config_dict['usable_databoxes_in_frame'].append(usable_databoxes_in_frame)
+        config_dict['frames_are_chunk_aligned'].append(usable_databoxes_in_frame % encoding_chunk_size == 0)
+
     return config_dict
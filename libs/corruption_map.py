@@ -0,0 +1,156 @@
+import mmap
+import math
+import cv2
+import numpy as np
+from .content_type import ContentType
+
+
+def find_differing_ranges(file1, file2, chunk_size=16 * 1024 * 1024):
+    """
+    Returns the ranges of bytes that differ between two files, as (starts, ends) arrays of [start..end) offsets,
+    merged over whole runs of differing bytes. Bytes past the end of the shorter file all differ.
+    """
+    starts, ends = [], []
+    with open(file1, "rb") as f1, open(file2, "rb") as f2:
+        size1, size2 = f1.seek(0, 2), f2.seek(0, 2)
+        common_size = min(size1, size2)
+        if common_size:
+            with mmap.mmap(f1.fileno(), 0, access=mmap.ACCESS_READ) as mm1, mmap.mmap(f2.fileno(), 0, access=mmap.ACCESS_READ) as mm2:
+                for offset in range(0, common_size, chunk_size):
+                    count = min(chunk_size, common_size - offset)
+                    chunk1 = np.frombuffer(mm1, dtype=np.uint8, count=count, offset=offset)
+                    chunk2 = np.frombuffer(mm2, dtype=np.uint8, count=count, offset=offset)
+                    differs = chunk1 != chunk2
+                    # A run starts where the mask goes 0 -> 1 and ends where it goes 1 -> 0
+                    edges = np.flatnonzero(np.diff(differs.view(np.int8), prepend=0, append=0))
+                    starts.append(edges[0::2] + offset)
+                    ends.append(edges[1::2] + offset)
+                    # An mmap still exported to an array can't be closed
+                    del chunk1, chunk2
+        if size1 != size2:
+            starts.append(np.array([common_size]))
+            ends.append(np.array([max(size1, size2)]))
+
+    if not starts:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    starts, ends = np.concatenate(starts).astype(np.int64), np.concatenate(ends).astype(np.int64)
+
+    # Runs cut by a chunk boundary are joined again
+    joined = np.flatnonzero(starts[1:] == ends[:-1])
+    return np.delete(starts, joined + 1), np.delete(ends, joined)
+
+
+def count_covered_bytes(starts, ends, offsets):
+    """Returns, for every offset, how many bytes of the sorted, disjoint [start..end) ranges lie below it."""
+    covered_before = np.concatenate(([0], np.cumsum(ends - starts)))
+    range_index = np.searchsorted(starts, offsets, side="right")
+    partial = np.where(range_index > 0, np.minimum(offsets, ends[np.maximum(range_index - 1, 0)]) - starts[np.maximum(range_index - 1, 0)], 0)
+    return covered_before[np.maximum(range_index - 1, 0)] * (range_index > 0) + partial
+
+
+def get_frame_geometry(config):
+    """Returns the data frame layout the encoder used, the parameters the byte offsets are mapped back to frames and boxes with."""
+    content_type = ContentType.DATACONTENT.value
+    box_step = config['data_box_size_step'][content_type]
+    return {
+        "databoxes_per_frame": config['usable_databoxes_in_frame'][content_type],
+        "frame_strip_databoxes": config['frame_strip_databoxes'][content_type],
+        "bits_per_value": config['encoding_bits_per_value'],
+        "box_step": box_step,
+        "boxes_x": config['usable_width'][content_type] // box_step,
+        "boxes_y": config['usable_height'][content_type] // box_step,
+        "start_width": config['start_width'],
+        "start_height": config['start_height'],
+    }
+
+
+def get_symbol_ranges(starts, ends, geometry):
+    """Returns the [first..end) baseN symbols (payload boxes, in encoding order) that hold the bytes of every range."""
+    bits_per_value = geometry["bits_per_value"]
+    return np.floor(starts * 8 / bits_per_value).astype(np.int64), np.ceil(ends * 8 / bits_per_value).astype(np.int64)
+
+
+def get_box_of_symbol(symbol, geometry):
+    """Returns (data_frame, box) of a payload symbol, the box as its row, column and the pixel of its top left corner."""
+    data_frame, position = divmod(int(symbol), geometry["databoxes_per_frame"])
+    box_row, box_column = divmod(geometry["frame_strip_databoxes"] + position, geometry["boxes_x"])
+    box = dict(row=box_row,
+               column=box_column,
+               x=geometry["start_width"] + box_column * geometry["box_step"],
+               y=geometry["start_height"] + box_row * geometry["box_step"])
+    return data_frame, box
+
+
+def get_box_error_counts(symbol_starts, symbol_ends, geometry):
+    """
+    Returns a (boxes_y, boxes_x) grid counting, for every box of the frame, in how many data frames it holds a corrupted symbol.
+    The ranges are folded onto one frame with a difference array, so a range spanning many frames costs the same as a short one.
+    """
+    databoxes_per_frame = geometry["databoxes_per_frame"]
+    difference = np.zeros(databoxes_per_frame + 1, dtype=np.int64)
+
+    full_frames, rest = np.divmod(symbol_ends - symbol_starts, databoxes_per_frame)
+    difference[0] += full_frames.sum()
+    difference[databoxes_per_frame] -= full_frames.sum()
+
+    first = symbol_starts % databoxes_per_frame
+    last = first + rest
+    wraps = last > databoxes_per_frame
+    np.add.at(difference, first[rest > 0], 1)
+    np.add.at(difference, np.minimum(last, databoxes_per_frame)[rest > 0], -1)
+    difference[0] += np.count_nonzero(wraps)
+    np.add.at(difference, last[wraps] - databoxes_per_frame, -1)
+
+    box_counts = np.zeros(geometry["boxes_y"] * geometry["boxes_x"], dtype=np.int64)
+    strip = geometry["frame_strip_databoxes"]
+    box_counts[strip:strip + databoxes_per_frame] = np.cumsum(difference[:-1])
+    return box_counts.reshape(geometry["boxes_y"], geometry["boxes_x"])
+
+
+def write_heatmap(box_counts, geometry, heatmap_path):
+    """Writes the box error counts as a color mapped image of the data region, one box_step square per box."""
+    scaled = (box_counts * (255.0 / box_counts.max())).astype(np.uint8) if box_counts.max() else np.zeros(box_counts.shape, dtype=np.uint8)
+    heatmap = cv2.applyColorMap(scaled, cv2.COLORMAP_JET)
+    heatmap = cv2.resize(heatmap, (geometry["boxes_x"] * geometry["box_step"], geometry["boxes_y"] * geometry["box_step"]),
+                         interpolation=cv2.INTER_NEAREST)
+    cv2.imwrite(heatmap_path, heatmap)
+
+
+def build_corruption_summary(starts, ends, file_size, geometry, top_count=20):
+    """
+    Returns the summary of the differing ranges: totals, the differing bytes of every affected data frame (the worst first)
+    and the largest ranges, with the data frames and boxes holding them.
+    """
+    bytes_per_frame = geometry["databoxes_per_frame"] * geometry["bits_per_value"] / 8
+    total_data_frames = max(1, math.ceil(max(file_size, int(ends[-1]) if len(ends) else 0) / bytes_per_frame))
+    frame_bounds = np.floor(np.arange(total_data_frames + 1) * bytes_per_frame).astype(np.int64)
+    differing_bytes_per_frame = np.diff(count_covered_bytes(starts, ends, frame_bounds)) if len(starts) else np.zeros(total_data_frames, np.int64)
+    affected_frames = np.flatnonzero(differing_bytes_per_frame)
+    worst_frames = affected_frames[np.argsort(-differing_bytes_per_frame[affected_frames], kind="stable")[:top_count]]
+
+    symbol_starts, symbol_ends = get_symbol_ranges(starts, ends, geometry)
+    largest_ranges = np.argsort(-(ends - starts), kind="stable")[:top_count]
+
+    def describe_range(index):
+        first_data_frame, first_box = get_box_of_symbol(symbol_starts[index], geometry)
+        last_data_frame, last_box = get_box_of_symbol(symbol_ends[index] - 1, geometry)
+        return {
+            "start": int(starts[index]),
+            "end": int(ends[index]),
+            "bytes": int(ends[index] - starts[index]),
+            "first_data_frame": first_data_frame,
+            "last_data_frame": last_data_frame,
+            "first_box": first_box,
+            "last_box": last_box,
+        }
+
+    return {
+        "file_size": file_size,
+        "differing_bytes": int((ends - starts).sum()),
+        "differing_ranges": len(starts),
+        "data_frames": total_data_frames,
+        "affected_data_frames": len(affected_frames),
+        "first_affected_data_frame": int(affected_frames[0]) if len(affected_frames) else None,
+        "worst_data_frames": [dict(data_frame=int(frame), differing_bytes=int(differing_bytes_per_frame[frame])) for frame in worst_frames],
+        "largest_ranges": [describe_range(index) for index in largest_ranges],
+    }
@@ -0,0 +1,15 @@
+import numpy as np
+from .vote_copies import sample_block_grid
+
+
+def count_ambiguous_boxes(frame, config_params, boxes):
+    """
+    Returns how many of the first `boxes` data boxes of `frame` (BGR) fall within no key's bounds, the boxes
+    determine_color_key(...) can only classify by its nearest color fallback, so the ones most likely decoded wrong.
+    """
+    block_grid = sample_block_grid(frame, config_params).reshape(-1, 3)[:boxes, ::-1]
+    in_bounds = np.zeros(len(block_grid), dtype=bool)
+    for lower_bounds, upper_bounds in zip(config_params["encoding_color_map_values_lower_bounds"],
+                                          config_params["encoding_color_map_values_upper_bounds"]):
+        in_bounds |= ((block_grid >= lower_bounds) & (block_grid <= upper_bounds)).all(axis=1)
+    return len(block_grid) - int(np.count_nonzero(in_bounds))
@@ -0,0 +1,85 @@
+import os
+import hashlib
+import threading
+import cv2
+from bisect import bisect_right
+from queue import Queue
+from .content_type import ContentType
+from .frame_reader_thread import frame_reader_thread
+from .process_frame_optimized import process_frame_optimized
+from .reread_data_frame import reread_data_frame
+from .positional_write import open_for_positional_write, positional_write
+
+
+def split_into_spans(total_data_frames, span_count, keyframe_data_frames=None):
+    """
+    Splits data frames [0..total_data_frames) into `span_count` contiguous (first, end) ranges of near equal size.
+    With `keyframe_data_frames` (from the frame index), every span starts on a keyframe, so its seek is exact and cheap.
+    """
+    span_count = max(1, min(span_count, total_data_frames))
+    boundaries = [i * total_data_frames // span_count for i in range(span_count)]
+    if keyframe_data_frames:
+        boundaries = [keyframe_data_frames[max(0, bisect_right(keyframe_data_frames, boundary) - 1)] for boundary in boundaries]
+    boundaries = sorted(set(boundaries) | {0}) + [total_data_frames]
+    return [(boundaries[i], boundaries[i + 1]) for i in range(len(boundaries) - 1)]
+
+
+def decode_frame_span(args):
+    """
+    Pool task decoding the data frames [first_data_frame..end_data_frame) of a video on its own:
+    opens its own capture, seeks to the span, decodes its picked frames and writes every
+    frame's bytes at the frame's offset in the output file.
+    Needs chunk aligned frames, so that every data frame holds a whole number of bytes.
+    Returns (first_data_frame, end_data_frame, bytes_written, tree_hash_leaves), the leaves as (data_frame, SHA1 digest of its bytes).
+    """
+    (video_path, output_path, config_params, first_data_frame, end_data_frame, metadata_frames, frame_step, total_baseN_length, num_frames,
+     bytes_per_data_frame) = args
+
+    first_frame_index = metadata_frames + config_params["pick_frame_to_read"] - 1
+    start_index = first_frame_index + first_data_frame * frame_step
+    end_index = first_frame_index + (end_data_frame - 1) * frame_step
+
+    cap = cv2.VideoCapture(video_path)
+    stop_event = threading.Event()
+    frame_queue = Queue(maxsize=8)
+    t_reader = threading.Thread(target=frame_reader_thread,
+                                args=(cap, frame_queue, stop_event, start_index, end_index, frame_step, None, True),
+                                daemon=True)
+    t_reader.start()
+
+    fd = open_for_positional_write(output_path)
+    reread_cap = None
+    bytes_written = 0
+    tree_hash_leaves = []
+    try:
+        while True:
+            item = frame_queue.get()
+            if item is None:
+                break
+            frame_index, frame_to_decode = item
+            process_frame_args = (config_params, ContentType.DATACONTENT, frame_to_decode, frame_index, frame_step, total_baseN_length, num_frames,
+                                  metadata_frames, None)
+            decoded_frame = process_frame_optimized(process_frame_args)
+            output_data, frame_check = decoded_frame.output_data, decoded_frame.frame_check
+            data_frame = (frame_index - first_frame_index) // frame_step
+
+            # A frame failing its header strip CRC is re-read from another copy of its group
+            if frame_check is not None and not frame_check[1]:
+                reread_cap = reread_cap or cv2.VideoCapture(video_path)
+                reread_result = reread_data_frame(reread_cap, process_frame_args, config_params["pick_frame_to_read"])
+                if reread_result is not None:
+                    output_data, frame_check = reread_result.output_data, reread_result.frame_check
+            if frame_check is not None and frame_check[0] is not None and frame_check[0] != data_frame:
+                print(f"Frame {frame_index} holds data frame {frame_check[0]} instead of {data_frame}, frames were dropped or duplicated.")
+            data_bytes = b''.join(output_data)
+            positional_write(fd, data_bytes, data_frame * bytes_per_data_frame)
+            bytes_written += len(data_bytes)
+            tree_hash_leaves.append((data_frame, hashlib.sha1(data_bytes).digest()))
+    finally:
+        stop_event.set()
+        t_reader.join(timeout=1.0)
+        cap.release()
+        reread_cap and reread_cap.release()
+        os.close(fd)
+
+    return first_data_frame, end_data_frame, bytes_written, tree_hash_leaves
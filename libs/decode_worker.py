@@ -0,0 +1,86 @@
+import os
+import hashlib
+from typing import NamedTuple, Optional
+from .SharedFrameRing import SharedFrameRing
+from .process_frame_optimized import process_frame_optimized
+from .positional_write import open_for_positional_write, positional_write
+from .count_ambiguous_boxes import count_ambiguous_boxes
+
+# Per worker process state, set up once by the pool initializer
+frame_ring_memory = None
+frame_ring_slots = None
+output_fd = None
+output_layout = None
+count_ambiguous = False
+
+
+class DecodeResult(NamedTuple):
+    """A DATACONTENT frame decoded by decode_frame_task(...)."""
+    frame_index: int
+    # The decoded chunks' bytes, None when the worker handled them (wrote or hashed them)
+    output_data: Optional[list]
+    # The (sequence_number, crc_matches) of the frame's header strip, None for frames without one
+    frame_check: Optional[tuple]
+    # The SHA1 digest of the frame's bytes (its tree hash leaf) when the worker handled them
+    leaf_digest: Optional[bytes]
+    # The frame's (data_boxes, ambiguous_boxes) when the worker counts them
+    box_counts: Optional[tuple]
+
+
+def init_decode_worker(frame_ring_name, frame_ring_slot_count, frame_shape, output_file_layout=None, count_ambiguous_boxes_of_frames=False):
+    """
+    Pool initializer, attaches the worker to the parent's shared frame ring (if any).
+    With `output_file_layout`, (output_path, first_frame_index, frame_step, bytes_per_data_frame), the worker opens
+    the (preallocated) output itself and writes every frame's bytes at the frame's offset, instead of returning them.
+    A None output_path only hashes the bytes, without writing them (verify only decoding).
+    With `count_ambiguous_boxes_of_frames`, the worker also counts every frame's ambiguous boxes (see count_ambiguous_boxes(...)).
+    Thread workers share the state of the process calling it, close_decode_worker() resets it again.
+    """
+    global frame_ring_memory, frame_ring_slots, output_fd, output_layout, count_ambiguous
+
+    if frame_ring_name is not None:
+        frame_ring_memory, frame_ring_slots = SharedFrameRing.attach(frame_ring_name, frame_ring_slot_count, frame_shape)
+    if output_file_layout is not None:
+        output_fd = open_for_positional_write(output_file_layout[0]) if output_file_layout[0] is not None else None
+        output_layout = output_file_layout[1:]
+    count_ambiguous = count_ambiguous_boxes_of_frames
+
+
+def close_decode_worker():
+    global output_fd, output_layout, count_ambiguous
+
+    if output_fd is not None:
+        os.close(output_fd)
+        output_fd = None
+    output_layout = None
+    count_ambiguous = False
+
+
+def decode_frame_task(args):
+    """
+    Pool task for the DATACONTENT frames, same arguments as process_frame_optimized(...),
+    except that the frame can be a slot index of the shared frame ring instead of the frame itself.
+    Returns a DecodeResult. When the worker writes (or only hashes) the output, the frame's bytes are written at their offset
+    and the result holds None in their place, so they are pickled neither back to the parent nor on to a writer,
+    and frames can complete in any order.
+    """
+    if frame_ring_slots is not None:
+        args = args[:2] + (frame_ring_slots[args[2]], ) + args[3:]
+    decoded_frame = process_frame_optimized(args)
+
+    box_counts = None
+    if count_ambiguous:
+        config_params, _, frame_to_decode, frame_index, frame_step, total_baseN_length, _, metadata_frames, _ = args
+        databoxes_per_frame = config_params["databoxes_per_frame"]
+        data_frame = (frame_index - metadata_frames - config_params["pick_frame_to_read"] + 1) // frame_step
+        data_boxes = config_params["frame_strip_databoxes"] + min(databoxes_per_frame, total_baseN_length - data_frame * databoxes_per_frame)
+        box_counts = (data_boxes, count_ambiguous_boxes(frame_to_decode, config_params, data_boxes))
+
+    if output_layout is None:
+        return DecodeResult(decoded_frame.frame_index, decoded_frame.output_data, decoded_frame.frame_check, None, box_counts)
+
+    first_frame_index, frame_step, bytes_per_data_frame = output_layout
+    data_bytes = b''.join(decoded_frame.output_data)
+    if output_fd is not None:
+        positional_write(output_fd, data_bytes, (decoded_frame.frame_index - first_frame_index) // frame_step * bytes_per_data_frame)
+    return DecodeResult(decoded_frame.frame_index, None, decoded_frame.frame_check, hashlib.sha1(data_bytes).digest(), box_counts)
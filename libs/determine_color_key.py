@@ -2,7 +2,7 @@ import numpy as np
 import numba
 
 
-@numba.njit
+@numba.njit(nogil=True)
 def determine_color_key(
     frame: np.ndarray,
     x: int,
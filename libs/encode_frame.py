@@ -1,23 +1,17 @@
-import json
 import sys
 import cv2
 import datetime
 import numpy as np
 from os import path
-from .config_loader import load_config
 
-config = load_config('config.ini')
 
-
-def build_bgr_map():
+def build_bgr_map(config):
     """
     Convert encoding_color_map's #RRGGBB strings into BGR tuples for direct OpenCV usage.
+    The map is the one the config loaded (Gray coded, with gray_coded_palette), the same the decoder classifies against.
     """
-    with open(config['encoding_map_path'], 'r') as file:
-        encoding_color_map = json.load(file)
-
     bgr_map = {}
-    for c, hex_str in encoding_color_map.items():
+    for c, hex_str in config['encoding_color_map'].items():
         b = int(hex_str[5:7], 16)
         g = int(hex_str[3:5], 16)
         r = int(hex_str[1:3], 16)
@@ -25,9 +19,6 @@ def build_bgr_map():
     return bgr_map
 
 
-bgr_map = build_bgr_map()
-
-
 def encode_frame(args):
     frames_batch, config, frame_data, content_type, debug = args
 
@@ -55,8 +46,9 @@ def encode_frame(args):
     num_blocks_to_fill = min(total_blocks, len(frame_data))
 
     # ------------------------------------------------------
-    # Create the color array for actual data
+    # Create the color array for actual data, with the colors of the config's own map
     # ------------------------------------------------------
+    bgr_map = build_bgr_map(config)
     colors_arr = np.array([bgr_map.get(c, (0, 0, 0)) for c in frame_data[:num_blocks_to_fill]], dtype=np.uint8)
 
     # ------------------------------------------------------
@@ -0,0 +1,82 @@
+import math
+import os
+import numpy as np
+from .read_video_header import read_video_header
+from .read_frame_at import read_frame_at
+from .frame_index import load_frame_index, get_frame_index_path
+from .detect_base_from_json import get_length_from_base
+from .process_frame_optimized import extract_baseN_data_numba
+
+
+def get_data_frames_of_range(config_params, total_baseN_length, bits_per_value, offset, length):
+    """
+    Maps the byte range [offset..offset+length) of the encoded file to the baseN symbols holding it.
+    Returns (first_chunk_byte, first_symbol, end_symbol, first_data_frame, last_data_frame), the range is
+    widened to whole decoding chunks, the only unit a baseN value can be decoded in.
+    """
+    encoding_chunk_size = config_params["encoding_chunk_size"]
+    databoxes_per_frame = config_params["databoxes_per_frame"]
+    bytes_per_chunk = get_length_from_base(encoding_chunk_size, bits_per_value)
+
+    first_chunk = offset // bytes_per_chunk
+    end_chunk = math.ceil((offset + length) / bytes_per_chunk)
+    first_symbol = first_chunk * encoding_chunk_size
+    end_symbol = min(end_chunk * encoding_chunk_size, total_baseN_length)
+
+    return first_chunk * bytes_per_chunk, first_symbol, end_symbol, first_symbol // databoxes_per_frame, (end_symbol - 1) // databoxes_per_frame
+
+
+def extract_range(config, video_path, offset, length, debug=False):
+    """
+    Returns `length` bytes of the encoded file starting at `offset`, decoding only the data frames holding them.
+    The frames are reached by seeking, guided by the frame index sidecar next to the video, if there is one.
+    """
+    cap, num_frames, config, config_params, metadata_frames, file_metadata = read_video_header(config, video_path, debug)
+    try:
+        file_size = file_metadata.metadata["filesize"]
+        if offset < 0 or length < 0 or offset + length > file_size:
+            raise ValueError(f"Range [{offset}..{offset + length}) is outside of the encoded file ({file_size} bytes).")
+        if length == 0:
+            return b''
+
+        content_config_params = config_params["DATACONTENT"]
+        total_baseN_length = file_metadata.metadata["total_baseN_length"]
+        first_chunk_byte, first_symbol, end_symbol, first_data_frame, last_data_frame = get_data_frames_of_range(
+            content_config_params, total_baseN_length, config["encoding_bits_per_value"], offset, length)
+
+        frame_index = load_frame_index(get_frame_index_path(config, os.path.dirname(video_path), file_metadata.metadata["filename"]))
+        keyframe_frames = [entry[1] for entry in frame_index["keyframes"]] if frame_index else None
+
+        frame_step = content_config_params["total_frames_repetition"]
+        first_frame_index = metadata_frames + content_config_params["pick_frame_to_read"] - 1
+        print(f"Extracting bytes [{offset}..{offset + length}) from data frames {first_data_frame}..{last_data_frame}") if debug else None
+
+        frame_strip_databoxes = content_config_params["frame_strip_databoxes"]
+        extracted_baseN_ascii = []
+        for data_frame in range(first_data_frame, last_data_frame + 1):
+            frame_to_decode = read_frame_at(cap, first_frame_index + data_frame * frame_step, keyframe_frames)
+            if frame_to_decode is None:
+                raise ValueError(f"Data frame {data_frame} (frame {first_frame_index + data_frame * frame_step}) could not be read.")
+            # The frame's header strip, if any, is skipped
+            extracted_baseN_ascii.append(
+                extract_baseN_data_numba(content_config_params["start_height"], content_config_params["start_width"],
+                                         content_config_params["box_step"], content_config_params["usable_w"], content_config_params["usable_h"],
+                                         content_config_params["databoxes_per_frame"] + frame_strip_databoxes, frame_to_decode,
+                                         content_config_params["encoding_color_map_keys"], content_config_params["encoding_color_map_values"],
+                                         content_config_params["encoding_color_map_values_lower_bounds"],
+                                         content_config_params["encoding_color_map_values_upper_bounds"], total_baseN_length, 0,
+                                         False)[frame_strip_databoxes:])
+    finally:
+        cap.release()
+
+    symbols_before_range = first_data_frame * content_config_params["databoxes_per_frame"]
+    extracted_baseN_values = np.concatenate(extracted_baseN_ascii).tobytes().decode('ascii')
+    extracted_baseN_values = extracted_baseN_values[first_symbol - symbols_before_range:end_symbol - symbols_before_range]
+
+    encoding_chunk_size = content_config_params["encoding_chunk_size"]
+    decoding_function = content_config_params["decoding_function"]
+    data_bytes = b''.join(
+        decoding_function(extracted_baseN_values[index:index + encoding_chunk_size])
+        for index in range(0, len(extracted_baseN_values), encoding_chunk_size))
+
+    return data_bytes[offset - first_chunk_byte:offset - first_chunk_byte + length]
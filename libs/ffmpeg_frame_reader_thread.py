@@ -0,0 +1,69 @@
+#############################################################################
+# A THREAD that lets ffmpeg pick, crop and downscale the wanted frames
+#    and pushes them, at one pixel per data box, into the frame queue.
+#############################################################################
+import ffmpeg
+import numpy as np
+
+
+def block_grid_config_params(config_params):
+    """
+    Returns a copy of `config_params` for frames already reduced to one pixel per data box,
+    so that extract_baseN_data_numba(...) reads every pixel of the frame as a box.
+    """
+    return {
+        **config_params,
+        "start_height": 0,
+        "start_width": 0,
+        "box_step": 1,
+        "usable_w": config_params["usable_w"] // config_params["box_step"],
+        "usable_h": config_params["usable_h"] // config_params["box_step"],
+    }
+
+
+def ffmpeg_frame_reader_thread(video_path, config_params, frame_queue, stop_event, start_index, end_index, frame_step):
+    """
+    Decodes the video with ffmpeg, which only passes on frames whose index is in [start_index..end_index]
+    and (index - start_index) % frame_step == 0, crops them to the data region and area-scales every
+    data box to a single pixel, so only a fraction of the bytes of a full BGR frame is ever produced.
+    Enqueues (frame_index, block_grid_frame), decode it with block_grid_config_params(config_params).
+    Once done, enqueues None to signal end.
+    """
+    box_step = config_params["box_step"]
+    usable_w, usable_h = config_params["usable_w"], config_params["usable_h"]
+    boxes_x, boxes_y = usable_w // box_step, usable_h // box_step
+    block_grid_frame_size = boxes_x * boxes_y * 3
+
+    process = (
+        ffmpeg.input(video_path)
+        #
+        .filter('select', f'between(n,{start_index},{end_index})*not(mod(n-{start_index},{frame_step}))')
+        #
+        .filter('crop', usable_w, usable_h, config_params["start_width"], config_params["start_height"])
+        # Upsample the chroma first, so that neighbouring boxes don't share a chroma sample
+        .filter('format', 'yuv444p')
+        #
+        .filter('scale', boxes_x, boxes_y, flags='area')
+        #
+        .output('pipe:', format='rawvideo', pix_fmt='bgr24', vsync='vfr')
+        #
+        .global_args('-loglevel', 'error')
+        #
+        .run_async(pipe_stdout=True))
+
+    frame_index = start_index
+    while not stop_event.is_set():
+        raw_frame = process.stdout.read(block_grid_frame_size)
+        if len(raw_frame) < block_grid_frame_size:
+            break
+
+        frame_queue.put((frame_index, np.frombuffer(raw_frame, dtype=np.uint8).reshape(boxes_y, boxes_x, 3)))
+        frame_index += frame_step
+
+    process.stdout.close()
+    if process.poll() is None:
+        process.terminate()
+    process.wait()
+
+    # Signal that we're done reading frames:
+    frame_queue.put(None)
@@ -4,9 +4,11 @@ import subprocess
 from .content_type import ContentType
 
 
-def create_ffmpeg_process(output_dir, config, segment_idx, content_type):
+def create_ffmpeg_process(output_dir, config, segment_idx, content_type, output_filename=None):
     content_output_path = None
-    if content_type == ContentType.PREMETADATA:
+    if output_filename is not None:
+        content_output_path = path.join(output_dir, output_filename)
+    elif content_type == ContentType.PREMETADATA:
         content_output_path = path.join(output_dir, 'pre_metadata.mp4')
     elif content_type == ContentType.METADATA:
         content_output_path = path.join(output_dir, f'metadata.mp4')
@@ -17,6 +19,11 @@ def create_ffmpeg_process(output_dir, config, segment_idx, content_type):
     
     preset_dict = { 1: 'veryslow', 2: 'slower', 3: 'slow', 4: 'medium', 5: 'fast', 6: 'faster', 7: 'veryfast', 8: 'superfast', 9: 'ultrafast'}
     preset = preset_dict.get(config['encoding_speed'], "medium")
+
+    # Force a keyframe at the start of every keyframe_interval_groups'th repetition group (and nowhere else),
+    # so that a seek to a data frame decodes at most one such interval.
+    keyframe_interval = config['keyframe_interval_groups'] * config['total_frames_repetition'][content_type.value]
+    keyframe_args = {'g': keyframe_interval, 'keyint_min': keyframe_interval, 'sc_threshold': 0} if keyframe_interval > 0 else {}
     
     return (ffmpeg.input('pipe:',
                          framerate=ffmpeg_input_framerate,
@@ -32,7 +39,8 @@ def create_ffmpeg_process(output_dir, config, segment_idx, content_type):
                     preset=preset,
                     tune='zerolatency',
                     bufsize='1024k',
-                    r=f'{config["output_fps"]}')
+                    r=f'{config["output_fps"]}',
+                    **keyframe_args)
             #
             .global_args('-loglevel', 'error')
             #
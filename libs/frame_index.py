@@ -0,0 +1,54 @@
+import json
+import os
+from .content_type import ContentType
+
+FRAME_INDEX_VERSION = 1
+
+
+def get_frame_index_path(config, directory, filename):
+    """Returns the path of the frame index sidecar of the encoded `filename`, inside `directory`."""
+    return os.path.join(directory, f"{filename}{config['frame_index_suffix']}")
+
+
+def build_frame_index(config, filename, file_size, metadata_frames, keyframe_data_frames, tree_hash_leaves=None):
+    """
+    Builds the frame index of an encoded video, mapping every data frame that starts on a keyframe to its
+    presentation frame (the first frame of its repetition group) and the offset of its bytes in the payload.
+    Every other data frame follows from the geometry stored along with it.
+    The tree hash leaves (hex, one per leaf of get_tree_hash_leaf_size(...) bytes) pin a failed decoding down to its data frames.
+    """
+    databoxes_per_frame = config['usable_databoxes_in_frame'][ContentType.DATACONTENT.value]
+    frames_per_data_frame = config['total_frames_repetition'][ContentType.DATACONTENT.value]
+    bits_per_data_frame = int(databoxes_per_frame * config['encoding_bits_per_value'])
+
+    # [data_frame, presentation_frame, byte_offset], the byte_offset is floored if frames split bytes
+    keyframes = [[data_frame, metadata_frames + data_frame * frames_per_data_frame, data_frame * bits_per_data_frame // 8]
+                 for data_frame in keyframe_data_frames]
+
+    return {
+        "version": FRAME_INDEX_VERSION,
+        "filename": filename,
+        "filesize": file_size,
+        "metadata_frames": metadata_frames,
+        "frames_per_data_frame": frames_per_data_frame,
+        "pick_frame_to_read": config['pick_frame_to_read'][ContentType.DATACONTENT.value],
+        "databoxes_per_frame": databoxes_per_frame,
+        "bits_per_data_frame": bits_per_data_frame,
+        "keyframe_interval_groups": config['keyframe_interval_groups'],
+        "keyframes": keyframes,
+        "tree_hash_leaves": tree_hash_leaves or [],
+    }
+
+
+def write_frame_index(frame_index, frame_index_path):
+    with open(frame_index_path, "w", encoding="utf-8") as f:
+        json.dump(frame_index, f)
+
+
+def load_frame_index(frame_index_path):
+    """Returns the frame index at `frame_index_path`, or None if there is none (or it isn't one we understand)."""
+    if not os.path.exists(frame_index_path):
+        return None
+    with open(frame_index_path, "r", encoding="utf-8") as f:
+        frame_index = json.load(f)
+    return frame_index if frame_index.get("version") == FRAME_INDEX_VERSION else None
@@ -1,43 +1,108 @@
 #############################################################################
-# A THREAD that continuously reads frames from cap.read()
+# A THREAD that continuously reads frames from cap.grab()/cap.retrieve()
 #    and pushes them into a multiprocessing-safe queue.
 #############################################################################
+import cv2
 import numpy as np
+from .read_frame_at import MAX_FORWARD_GRABS
+from .vote_copies import sample_block_grid, vote_block_grids
 
 
-def frame_reader_thread(cap, frame_queue, stop_event, start_index, end_index, frame_step):
+def frame_reader_thread(cap,
+                        frame_queue,
+                        stop_event,
+                        start_index,
+                        end_index,
+                        frame_step,
+                        frame_ring=None,
+                        seek=False,
+                        copy_offsets=None,
+                        vote_config_params=None,
+                        debug=False):
     """
     Reads frames from OpenCV in a dedicated thread.
     Only enqueues frames whose index is in [start_index..end_index]
     and (index - start_index) % frame_step == 0.
+    Every other frame is only grab()-ed, so it is decoded but never converted to BGR,
+    and only the wanted frames are retrieve()-d.
+    Reading starts at the capture's current position, with `seek` it first jumps to start_index
+    (OpenCV decodes forward from the keyframe before it), unless start_index is close enough to grab forward to.
+    With a `frame_ring` (SharedFrameRing), wanted frames are decoded straight into a shared memory slot
+    and (index, slot_index) is enqueued instead of (index, frame).
+    With `copy_offsets` (see get_copy_offsets(...)), the frames at those offsets from every wanted frame, copies of it
+    in its repetition group, are reduced to block grids with `vote_config_params` and their per box median is enqueued
+    as the wanted frame, decode it with block_grid_config_params(...).
+    With `debug`, the frames grabbed and retrieved are printed once done.
     Once done, enqueues None to signal end.
     """
-    frame_index = 0
+    copy_offsets = copy_offsets or [0]
+    voting = len(copy_offsets) > 1
+    first_index = start_index + copy_offsets[0]
+    block_grids = []
 
-    ret, frame = cap.read()
-    if not ret:
-        return
+    frame_index = int(cap.get(cv2.CAP_PROP_POS_FRAMES))
+    if seek and not frame_index <= first_index <= frame_index + MAX_FORWARD_GRABS:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, first_index)
+        frame_index = int(cap.get(cv2.CAP_PROP_POS_FRAMES))
 
-    # Ensure dtype=uint8
-    if frame.dtype != np.uint8:
-        raise ValueError("Unexpected frame type: " + str(frame.dtype))
+    grabbed_frames = 0
+    retrieved_frames = 0
 
-    while not stop_event.is_set():
-        ret, frame = cap.read()
-        if not ret:
+    while not stop_event.is_set() and frame_index <= end_index + copy_offsets[-1]:
+        if not cap.grab():
             break
+        grabbed_frames += 1
 
-        # Only push frames that we actually want to decode:
-        if frame_index >= start_index and frame_index <= end_index:
-            if (frame_index - start_index) % frame_step == 0:
-                # Put (frame_index, frame) in the queue
-                frame_queue.put((frame_index, frame))
+        # The wanted frame of this frame's repetition group, and this frame's offset from it
+        wanted_index = start_index + (frame_index - first_index) // frame_step * frame_step
+        offset = frame_index - wanted_index
+
+        # Only retrieve and push frames that we actually want to decode:
+        if frame_index >= first_index and wanted_index <= end_index and offset in copy_offsets:
+            if voting:
+                ret, frame = cap.retrieve()
+                if not ret:
+                    break
+                retrieved_frames += 1
+                block_grids.append(sample_block_grid(frame, vote_config_params))
+                if offset == copy_offsets[-1]:
+                    frame_queue.put((wanted_index, vote_block_grids(block_grids)))
+                    block_grids = []
+                frame_index += 1
+                continue
+
+            if frame_ring is not None:
+                slot_index = frame_ring.acquire(frame_index, stop_event)
+                if slot_index is None:
+                    break
+                slot = frame_ring.slots[slot_index]
+                ret, frame = cap.retrieve(slot)
+                if not ret:
+                    frame_ring.release(frame_index)
+                    break
+                if not np.shares_memory(frame, slot):
+                    slot[...] = frame
+            else:
+                ret, frame = cap.retrieve()
+                if not ret:
+                    break
+
+            # Ensure dtype=uint8
+            if frame.dtype != np.uint8:
+                raise ValueError("Unexpected frame type: " + str(frame.dtype))
+
+            retrieved_frames += 1
+            # Put (frame_index, frame or slot_index) in the queue
+            frame_queue.put((frame_index, slot_index if frame_ring is not None else frame))
 
         frame_index += 1
-        # If we have already passed end_index, we can break
-        if frame_index > end_index:
-            # print("Breaking because frame_index set end_index to", end_index)
-            break
+
+    # The video ended inside the last repetition group, vote with the copies it had
+    if block_grids and not stop_event.is_set():
+        frame_queue.put((start_index + (frame_index - 1 - first_index) // frame_step * frame_step, vote_block_grids(block_grids)))
+
+    print(f"frame_reader_thread: grabbed {grabbed_frames} frames, retrieved {retrieved_frames} "
+          f"({grabbed_frames / max(retrieved_frames, 1):.2f} grabs per retrieve)") if debug else None
 
     # Signal that we're done reading frames:
     frame_queue.put(None)
@@ -0,0 +1,38 @@
+import struct
+import zlib
+from .bytes_to_baseN import bytes_to_baseN
+
+FRAME_STRIP_VERSION = 1
+# version, sequence number of the data frame, CRC32 of the frame's payload baseN values
+FRAME_STRIP_STRUCT = struct.Struct("<BII")
+
+
+def get_frame_strip_size(encoding_base, format_string, bytes_per_chunk, databoxes_alignment):
+    """
+    Returns (strip_bytes, strip_databoxes), the strip is padded to whole decoding chunks and to a multiple
+    of `databoxes_alignment` boxes, so that the payload after it keeps the frame's alignment.
+    """
+    strip_bytes = -(-FRAME_STRIP_STRUCT.size // bytes_per_chunk) * bytes_per_chunk
+    while len(bytes_to_baseN(bytes(strip_bytes), encoding_base, format_string)) % databoxes_alignment:
+        strip_bytes += bytes_per_chunk
+    return strip_bytes, len(bytes_to_baseN(bytes(strip_bytes), encoding_base, format_string))
+
+
+def pack_frame_strip(sequence_number, payload_baseN, strip_bytes, encoding_base, format_string):
+    """Returns the baseN values of the strip for the data frame `sequence_number` carrying `payload_baseN`."""
+    strip = FRAME_STRIP_STRUCT.pack(FRAME_STRIP_VERSION, sequence_number, zlib.crc32(payload_baseN.encode('ascii')))
+    return bytes_to_baseN(strip.ljust(strip_bytes, b'\0'), encoding_base, format_string)
+
+
+def check_frame_strip(strip_baseN, payload_baseN, decoding_function, encoding_chunk_size):
+    """
+    Returns (sequence_number, crc_matches) of a decoded frame, `sequence_number` is None if the strip itself is unreadable.
+    """
+    try:
+        strip = b''.join(decoding_function(strip_baseN[i:i + encoding_chunk_size]) for i in range(0, len(strip_baseN), encoding_chunk_size))
+        version, sequence_number, crc32 = FRAME_STRIP_STRUCT.unpack(strip[:FRAME_STRIP_STRUCT.size])
+    except Exception:
+        return None, False
+    if version != FRAME_STRIP_VERSION:
+        return None, False
+    return sequence_number, zlib.crc32(payload_baseN.encode('ascii')) == crc32
@@ -2,22 +2,34 @@ import time
 import psutil
 
 
-def generate_frame_args(frame_queue, config, frame_data_iter, debug):
+def generate_frame_args(frame_queue, config, frame_data_iter, debug, metrics=None):
+    """
+    Yields the encode_frame(...) arguments of every frame data of `frame_data_iter`, with the background frames it is drawn on.
+    With `metrics` (PipelineMetrics), the symbolization is counted to the "symbolize" stage, the pauses on low RAM
+    to "ram_throttle" and the waits for background frames to the "bgr_frame_queue".
+    """
     while True:
         if psutil.virtual_memory().available < config['ram_threshold_trigger']:
+            start_time = time.perf_counter()
             while psutil.virtual_memory().available < config['ram_threshold_trigger']:
                 time.sleep(1)
             while psutil.virtual_memory().available < config['ram_threshold_resume']:
                 time.sleep(1)
+            metrics and metrics.count("ram_throttle", time.perf_counter() - start_time)
 
         try:
+            start_time = time.perf_counter()
             content_type, frame_data = next(frame_data_iter)
+            symbolize_seconds = time.perf_counter() - start_time
+            metrics and metrics.count("symbolize", symbolize_seconds, 1, int(len(frame_data or '') * config['encoding_bits_per_value']) // 8)
             if frame_data is None:
                 break
             bgr_frames_count = 1 if config["use_same_bgr_frame_for_repetetion"] else config["total_frames_repetition"][content_type.value]
             frames_batch = []
             for _ in range(bgr_frames_count):
+                start_time = time.perf_counter()
                 frame = frame_queue.get()
+                metrics and metrics.wait("bgr_frame_queue", time.perf_counter() - start_time)
                 if frame is None:
                     break
                 frames_batch.append(frame)
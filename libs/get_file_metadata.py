@@ -1,6 +1,5 @@
 import base64
 import sys
-import cv2
 import zfec
 from reedsolo import RSCodec
 from .content_type import ContentType
@@ -8,8 +7,10 @@ from .PreMetadata import PreMetadata
 from .Metadata import Metadata
 from .rot13_rot5 import rot13_rot5
 from .determine_color_key import determine_color_key
-from .detect_base_from_json import get_length_in_base
+from .detect_base_from_json import get_length_in_base, get_length_from_base
+from .binary_header import unpack_binary_header, get_binary_header_length
 from .process_frame_optimized import process_frame_optimized
+from .read_frame_at import read_frame_at
 
 
 def read_frames(cap,
@@ -20,10 +21,13 @@ def read_frames(cap,
                 total_baseN_length=None,
                 convert_return_output_data=None,
                 debug=False):
-    """Reads frames and extracts encoded data as per the encoding map's base."""
+    """
+    Reads frames and extracts encoded data as per the encoding map's base.
+    The frames are read in a single forward pass (see read_frame_at(...)), so consecutive calls never seek,
+    and the output of every frame is appended to the output of the previous ones.
+    """
 
-    baseN_data_buffer = ''
-    output_data = ''
+    output_data = None
     data_current_length = 0
 
     frame_step = config_params['total_frames_repetition']
@@ -34,12 +38,11 @@ def read_frames(cap,
         print(
             f"read_frames: Loop: Reading frame {frame_index}, frame_step: {frame_step}, start_frame_index: {start_frame_index}, content_type: {content_type}"
         ) if debug else None
-        # Set the video position to the desired frame
-        cap.set(cv2.CAP_PROP_POS_FRAMES, frame_index)
-        # Read the frame
-        _, frame_to_decode = cap.read()
+        frame_to_decode = read_frame_at(cap, frame_index)
         args = (config_params, content_type, frame_to_decode, frame_index, frame_step, total_baseN_length, num_frames, 0, convert_return_output_data)
-        (_, output_data, total_baseN_length, data_current_length) = process_frame_optimized(args)
+        (_, frame_output_data, total_baseN_length, frame_data_length, _) = process_frame_optimized(args)
+        output_data = frame_output_data if output_data is None else output_data + frame_output_data
+        data_current_length += frame_data_length
 
         total_frames_consumed = frame_index + 1 - config_params['pick_frame_to_read'] + frame_step - start_frame_index
         # Break out of the loop once the full metadata has been read.
@@ -82,22 +85,11 @@ def check_metadata_valid_using_checksum(metadata_str):
     return True, actual_metadata
 
 
-def read_metadata(cap, config_params_metadata, pm_obj, num_frames, debug=False):
-    # 1st pass
-    """
-    MODE: Normal metadata
-    """
-    frames_consumed = pm_obj.premetadata_frame_count
-    print(f"read_metadata: Init: Frames consumed before metadata: {frames_consumed}") if debug else None
-
-    metadata_normal, metadata_normal_frames_consumed = read_frames(cap, config_params_metadata, ContentType.METADATA, frames_consumed, num_frames,
-                                                                   pm_obj.sections["normal"]["data_size"], "string", debug)
-
+def decode_metadata_normal(metadata_normal, pm_obj):
+    """MODE: Normal metadata, three copies merged by a bitwise majority vote."""
     metadata_normal = metadata_normal.encode()
     triplet_length = len(metadata_normal) // 3
 
-    print("read_metadata: Read metadata_normal: ", metadata_normal) if debug else None
-
     # Extract the three copies.
     metadata_normal_copy1 = metadata_normal[:triplet_length]
     metadata_normal_copy2 = metadata_normal[triplet_length:2 * triplet_length]
@@ -113,86 +105,106 @@ def read_metadata(cap, config_params_metadata, pm_obj, num_frames, debug=False):
             metadata_normal_copy2[i] & metadata_normal_copy3[i])
 
     # The final metadata with checksum (majority-corrected) is:
-    metadata_with_checksum = bytes(majority_data).decode()
-
-    is_metadata_valid, metadata_or_errormesg = check_metadata_valid_using_checksum(metadata_with_checksum)
-
-    if is_metadata_valid:
-        return metadata_or_errormesg
+    return bytes(majority_data).decode()
 
-    # 2nd Pass
-    """
-    MODE: Base64 metadata
-    """
-    frames_consumed += metadata_normal_frames_consumed
-    metadata_base64, metadata_base64_frames_consumed = read_frames(cap, config_params_metadata, ContentType.METADATA, frames_consumed, num_frames,
-                                                                   pm_obj.sections["base64"]["data_size"], "string", debug)
-    metadata_base64 = base64.b64decode(metadata_base64).decode()
 
-    is_metadata_valid, metadata_or_errormesg = check_metadata_valid_using_checksum(metadata_base64)
+def decode_metadata_base64(metadata_base64, pm_obj):
+    """MODE: Base64 metadata"""
+    return base64.b64decode(metadata_base64).decode()
 
-    if is_metadata_valid:
-        return metadata_or_errormesg
 
-    # 3rd Pass
-    """
-    MODE: Rot13 metadata
-    """
-    frames_consumed += metadata_base64_frames_consumed
-    metadata_rot13, metadata_rot13_frames_consumed = read_frames(cap, config_params_metadata, ContentType.METADATA, frames_consumed, num_frames,
-                                                                 pm_obj.sections["rot13"]["data_size"], "string", debug)
-    metadata_rot13 = rot13_rot5(metadata_rot13)
+def decode_metadata_rot13(metadata_rot13, pm_obj):
+    """MODE: Rot13 metadata"""
+    return rot13_rot5(metadata_rot13)
 
-    is_metadata_valid, metadata_or_errormesg = check_metadata_valid_using_checksum(metadata_rot13)
 
-    if is_metadata_valid:
-        return metadata_or_errormesg
-
-    # 4th Pass
-    """
-    MODE: Reed-Solomon metadata
-    """
-    frames_consumed += metadata_rot13_frames_consumed
-    metadata_reed_solomon, metadata_reed_solomon_frames_consumed = read_frames(cap, config_params_metadata, ContentType.METADATA, frames_consumed,
-                                                                               num_frames, pm_obj.sections["reed_solomon"]["data_size"], "bytearray",
-                                                                               debug)
-
-    # Decode using Reed-Solomon
+def decode_metadata_reed_solomon(metadata_reed_solomon, pm_obj):
+    """MODE: Reed-Solomon metadata"""
     metadata_reed_solomon = base64.b64decode(metadata_reed_solomon)
     metadata_reed_solomon = RSCodec(int(pm_obj.sections["reed_solomon"]["rscodec_value"])).decode(metadata_reed_solomon)
     metadata_reed_solomon = metadata_reed_solomon[0] if isinstance(metadata_reed_solomon, tuple) else metadata_reed_solomon
-    metadata_reed_solomon = metadata_reed_solomon.decode('utf-8', errors='ignore')
+    return metadata_reed_solomon.decode('utf-8', errors='ignore')
 
-    is_metadata_valid, metadata_or_errormesg = check_metadata_valid_using_checksum(metadata_reed_solomon)
-
-    if is_metadata_valid:
-        return metadata_or_errormesg
-
-    # 5th Pass
-    """
-    MODE: Zfec metadata
-    """
-    frames_consumed += metadata_reed_solomon_frames_consumed
-    metadata_zfec, metadata_zfec_frames_consumed = read_frames(cap, config_params_metadata, ContentType.METADATA, frames_consumed, num_frames,
-                                                               pm_obj.sections["zfec"]["data_size"], "string", debug)
 
-    # Decode using Zfec
+def decode_metadata_zfec(metadata_zfec, pm_obj):
+    """MODE: Zfec metadata"""
     zfec_k, zfec_m = 3, 5  # Same values used for encoding
     zfec_decoder = zfec.Decoder(zfec_k, zfec_m)
     metadata_zfec = bytes.fromhex(metadata_zfec)
     fragment_size = len(metadata_zfec) // zfec_m
     metadata_zfec_fragments = [metadata_zfec[i * fragment_size:(i + 1) * fragment_size] for i in range(zfec_m)]
     metadata_zfec = zfec_decoder.decode(metadata_zfec_fragments[:zfec_k], range(zfec_k))
-    metadata_zfec = b"".join(metadata_zfec).rstrip(b' ').decode()
-    is_metadata_valid, metadata_or_errormesg = check_metadata_valid_using_checksum(metadata_zfec)
+    return b"".join(metadata_zfec).rstrip(b' ').decode()
 
-    if is_metadata_valid:
-        return metadata_or_errormesg
-    else:
-        raise ValueError("Invalid metadata found in all metadata types.")
 
+# The metadata sections in the order they are encoded, which is also the order they are trusted in:
+# (section name, what read_frames(...) returns it as, decoder)
+METADATA_SECTIONS = [
+    ("normal", "string", decode_metadata_normal),
+    ("base64", "string", decode_metadata_base64),
+    ("rot13", "string", decode_metadata_rot13),
+    ("reed_solomon", "bytearray", decode_metadata_reed_solomon),
+    ("zfec", "string", decode_metadata_zfec),
+]
+
+
+def read_metadata(cap, config_params_metadata, pm_obj, num_frames, debug=False):
+    """
+    Reads the five redundant metadata sections in one forward pass over the metadata frames,
+    then returns the first one, in priority order, that decodes and passes its checksum.
+    """
+    frames_consumed = pm_obj.premetadata_frame_count
+    print(f"read_metadata: Init: Frames consumed before metadata: {frames_consumed}") if debug else None
 
-def get_file_metadata(cap, config_params_premetadata, config_params_metadata, num_frames, debug):
+    raw_sections = {}
+    for section, convert_return_output_data, _ in METADATA_SECTIONS:
+        raw_sections[section], _ = read_frames(cap, config_params_metadata, ContentType.METADATA, frames_consumed, num_frames,
+                                               pm_obj.sections[section]["data_size"], convert_return_output_data, debug)
+        print(f"read_metadata: Read metadata_{section}: ", raw_sections[section]) if debug else None
+        frames_consumed += pm_obj.sections[section]["frame_count"] * config_params_metadata['total_frames_repetition']
+
+    for section, _, decode_section in METADATA_SECTIONS:
+        try:
+            metadata_with_checksum = decode_section(raw_sections[section], pm_obj)
+        except Exception as e:
+            print(f"Metadata section {section} could not be decoded: {e}")
+            continue
+
+        is_metadata_valid, metadata_or_errormesg = check_metadata_valid_using_checksum(metadata_with_checksum)
+        if is_metadata_valid:
+            return metadata_or_errormesg
+
+    raise ValueError("Invalid metadata found in all metadata types.")
+
+
+def read_binary_header(cap, config_params_premetadata, start_frame_index, num_frames, debug=False):
+    """Returns the fields of the binary header in the pre_metadata frame group at `start_frame_index`, None if it has none."""
+    frame_index = start_frame_index + config_params_premetadata['pick_frame_to_read'] - 1
+    frame_to_decode = read_frame_at(cap, frame_index)
+    if frame_to_decode is None:
+        return None
+
+    # A known length skips the pre_metadata length sniffing, the frame is read as raw bytes
+    bytes_per_chunk = get_length_from_base(config_params_premetadata['encoding_chunk_size'], config_params_premetadata['encoding_bits_per_value'])
+    header_baseN_length = get_length_in_base(get_binary_header_length(bytes_per_chunk), config_params_premetadata['encoding_bits_per_value'])
+    args = (config_params_premetadata, ContentType.PREMETADATA, frame_to_decode, frame_index, config_params_premetadata['total_frames_repetition'],
+            header_baseN_length, num_frames, frame_index, "bytearray")
+    header = unpack_binary_header(process_frame_optimized(args).output_data)
+    print(f"read_binary_header: Binary header at frame {frame_index}: {header}") if debug else None
+    return header
+
+
+def find_binary_header(cap, config_params_premetadata, num_frames, debug=False):
+    """Returns the fields of the binary header at the start of the video, or else of its trailer copy at the end, None if it has neither."""
+    header_frame_count = config_params_premetadata['total_frames_repetition']
+    header = read_binary_header(cap, config_params_premetadata, 0, num_frames, debug)
+    if header is None and num_frames > header_frame_count:
+        header = read_binary_header(cap, config_params_premetadata, num_frames - header_frame_count, num_frames, debug)
+    return header
+
+
+def read_text_header(cap, config_params_premetadata, config_params_metadata, num_frames, debug):
+    """Reads the text pre_metadata and the five redundant metadata sections, returns (header frames, Metadata)."""
     # PREMETADATA
     pre_metadata, pre_metadata_frame_count = read_frames(cap, config_params_premetadata, ContentType.PREMETADATA, 0, num_frames, None, "string",
                                                          debug)
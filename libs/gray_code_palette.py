@@ -0,0 +1,77 @@
+import cv2
+import numpy as np
+from .detect_base_from_json import BASE64_CHARS
+
+DIGIT_CHARS = "0123456789abcdef"
+
+
+def get_symbol_value(symbol, base):
+    """Returns the digit value of a baseN symbol, the bits it stands for."""
+    if base == 64:
+        return BASE64_CHARS.index(symbol)
+    return DIGIT_CHARS.index(symbol.lower())
+
+
+def get_palette_lab(colors):
+    """Returns the CIELAB coordinates of #RRGGBB colors, where distances follow how alike the colors look."""
+    bgr = np.array([[(int(color[5:7], 16), int(color[3:5], 16), int(color[1:3], 16)) for color in colors]], dtype=np.float32) / 255
+    return cv2.cvtColor(bgr, cv2.COLOR_BGR2LAB)[0].astype(np.float64)
+
+
+def get_confusion_weights(colors):
+    """Returns how likely every two colors are mistaken for each other, falling with the fourth power of their distance (zero diagonal)."""
+    lab = get_palette_lab(colors)
+    distances = np.sqrt(((lab[:, None, :] - lab[None, :, :])**2).sum(axis=2))
+    np.fill_diagonal(distances, np.inf)
+    return 1 / np.maximum(distances, 1e-6)**4
+
+
+def get_palette_confusion_cost(encoding_color_map):
+    """Returns the expected number of bits flipped when a box is mistaken for another color (weighted by get_confusion_weights)."""
+    base = len(encoding_color_map)
+    weights = get_confusion_weights(list(encoding_color_map.values()))
+    values = np.array([get_symbol_value(symbol, base) for symbol in encoding_color_map])
+    bit_counts = np.array([bin(value).count("1") for value in range(base)])
+    return (weights * bit_counts[values[:, None] ^ values[None, :]]).sum() / weights.sum()
+
+
+def gray_code_palette(encoding_color_map):
+    """
+    Returns the encoding map with its colors reassigned to its symbols so that colors that look alike stand for values
+    a single bit apart, like a Gray code in color space: a box mistaken for a neighbouring color flips one bit, not several.
+    The colors are walked from the darkest one to the nearest one not visited yet, the i'th gets the Gray code of i,
+    then any two colors swap their values while that lowers get_palette_confusion_cost(...).
+    The result only depends on the map's colors, so the encoder and the decoder derive the same one. The map's key order is kept.
+    """
+    base = len(encoding_color_map)
+    if base & (base - 1):
+        raise ValueError(f"A Gray coded palette needs a power of two base, not {base}.")
+
+    colors = list(encoding_color_map.values())
+    weights = get_confusion_weights(colors)
+    bit_counts = np.array([bin(value).count("1") for value in range(base)])
+
+    # Nearest neighbour walk from the darkest color
+    lightness = get_palette_lab(colors)[:, 0]
+    walk = [int(np.argmin(lightness))]
+    while len(walk) < base:
+        candidates = [index for index in range(base) if index not in walk]
+        walk.append(max(candidates, key=lambda index: weights[walk[-1], index]))
+    values = np.empty(base, dtype=np.int64)
+    for position, color_index in enumerate(walk):
+        values[color_index] = position ^ (position >> 1)
+
+    improved = True
+    while improved:
+        improved = False
+        for a in range(base):
+            for b in range(a + 1, base):
+                # The cost change of swapping the values of a and b, the pair itself keeps its cost
+                hamming_difference = bit_counts[values[b] ^ values] - bit_counts[values[a] ^ values]
+                delta = (weights[a] - weights[b]) * hamming_difference
+                if delta.sum() - delta[a] - delta[b] < -1e-12:
+                    values[a], values[b] = values[b], values[a]
+                    improved = True
+
+    color_of_value = {int(value): color for value, color in zip(values, colors)}
+    return {symbol: color_of_value[get_symbol_value(symbol, base)] for symbol in encoding_color_map}
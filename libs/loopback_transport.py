@@ -0,0 +1,98 @@
+import os
+import time
+import tempfile
+import cv2
+import numpy as np
+from .content_type import ContentType
+from .bytes_to_baseN import bytes_to_baseN
+from .FileToEncodedData import FileToEncodedData
+from .encode_frame import encode_frame
+from .build_config_params import build_config_params
+from .process_frame_optimized import process_frame_optimized
+
+# none: the frames as rendered, gaussian: additive noise of standard deviation channel_strength,
+# jpeg: JPEG compressed at quality channel_strength (4:2:0, DCT quantized, like an x264 intra frame),
+# yuv420: converted to yuv420p and back, the chroma subsampling every video codec applies
+CHANNEL_MODELS = ("none", "gaussian", "jpeg", "yuv420")
+DEFAULT_CHANNEL_STRENGTHS = {"gaussian": 4.0, "jpeg": 75}
+
+
+def apply_channel_model(frame, channel_model, channel_strength=None, rng=None):
+    """Returns `frame` (BGR) as it comes out of the simulated channel, the frame itself for the lossless "none"."""
+    if channel_strength is None:
+        channel_strength = DEFAULT_CHANNEL_STRENGTHS.get(channel_model)
+    if channel_model == "none":
+        return frame
+    if channel_model == "gaussian":
+        rng = rng if rng is not None else np.random.default_rng()
+        noise = rng.normal(0.0, channel_strength, frame.shape).astype(np.float32)
+        return np.clip(frame + noise, 0, 255).astype(np.uint8)
+    if channel_model == "jpeg":
+        _, jpeg = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, int(channel_strength)])
+        return cv2.imdecode(jpeg, cv2.IMREAD_COLOR)
+    if channel_model == "yuv420":
+        return cv2.cvtColor(cv2.cvtColor(frame, cv2.COLOR_BGR2YUV_I420), cv2.COLOR_YUV2BGR_I420)
+    raise ValueError(f"Unknown channel model: {channel_model}, expected one of {', '.join(CHANNEL_MODELS)}")
+
+
+def get_frames_data(config, data):
+    """
+    Returns (frames_data, total_baseN_length), the baseN values of every data frame of `data` (bytes), header strip included,
+    produced by FileToEncodedData, like the encoder does, from a temporary file holding `data`.
+    """
+    with tempfile.TemporaryDirectory(prefix="loopback_") as temp_dir:
+        file_path = os.path.join(temp_dir, "payload")
+        with open(file_path, "wb") as f:
+            f.write(data)
+        # Its first StopIteration ends the data frames, the header frames following them are not sent
+        encoded_data = FileToEncodedData(config, file_path)
+        frames_data = [frame_data for _, frame_data in encoded_data]
+        encoded_data.pbar.close()
+    return frames_data, encoded_data.total_baseN_length
+
+
+def loopback_round_trip(config, data, channel_model="none", channel_strength=None, seed=0):
+    """
+    Sends `data` (bytes) through an in-memory loopback instead of ffmpeg and a video file: every data frame rendered by
+    encode_frame(...) is handed, through the channel model, straight to the decoder kernel process_frame_optimized(...).
+    Returns (decoded_bytes, stats), stats holding the seconds spent rendering, in the channel and decoding,
+    the data frames, the payload boxes (baseN symbols) decoded wrong and the frames failing their header strip CRC.
+    """
+    content_type = ContentType.DATACONTENT
+    config_params = build_config_params(config)[content_type.name]
+    frame_strip_databoxes = config_params["frame_strip_databoxes"]
+    rng = np.random.default_rng(seed)
+
+    frames_data, total_baseN_length = get_frames_data(config, data)
+    num_frames = len(frames_data)
+    blank_frame = np.zeros((config['frame_height'], config['frame_width'], 3), dtype=np.uint8)
+
+    stats = dict(render_seconds=0.0, channel_seconds=0.0, decode_seconds=0.0, data_frames=num_frames, crc_failed_frames=0)
+    decoded_data = []
+    for frame_index, frame_data in enumerate(frames_data):
+        start_time = time.perf_counter()
+        frame = encode_frame(([blank_frame], config, frame_data, content_type, False))[0]
+        channel_start_time = time.perf_counter()
+        frame = apply_channel_model(frame, channel_model, channel_strength, rng)
+        decode_start_time = time.perf_counter()
+        decoded_frame = process_frame_optimized((config_params, content_type, frame, frame_index, 1, total_baseN_length, num_frames, 0, None))
+        end_time = time.perf_counter()
+
+        stats["render_seconds"] += channel_start_time - start_time
+        stats["channel_seconds"] += decode_start_time - channel_start_time
+        stats["decode_seconds"] += end_time - decode_start_time
+
+        decoded_data.append(b''.join(decoded_frame.output_data))
+        if decoded_frame.frame_check is not None and not decoded_frame.frame_check[1]:
+            stats["crc_failed_frames"] += 1
+
+    # The decoded bytes symbolized again are the symbols the boxes were read as
+    decoded_data = b''.join(decoded_data)
+    sent_baseN = np.frombuffer(''.join(frame_data[frame_strip_databoxes:] for frame_data in frames_data).encode('ascii'), dtype=np.uint8)
+    received_baseN = np.frombuffer(bytes_to_baseN(decoded_data, config["encoding_base"], config["encoding_format_string"]).encode('ascii'),
+                                   dtype=np.uint8)
+    compared = min(len(sent_baseN), len(received_baseN))
+    stats["symbols"] = total_baseN_length
+    stats["symbol_errors"] = int(np.count_nonzero(sent_baseN[:compared] != received_baseN[:compared])) + abs(len(sent_baseN) - len(received_baseN))
+    stats["symbol_error_rate"] = stats["symbol_errors"] / total_baseN_length if total_baseN_length else 0.0
+    return decoded_data, stats
@@ -70,8 +70,12 @@ def merge_mp4_files_incremental(input_directory, final_output_path, frame_output
         filename = os.path.basename(x)
         if "pre_metadata" in filename:
             return (0, "")
+        if "header_trailer" in filename:
+            return (3, "")
         if "metadata" in filename:
             return (1, "")
+        if "calibration" in filename:
+            return (1, "calibration")
         elif "delimiter" in filename:
             return (2, "")
         else:
@@ -5,7 +5,7 @@ from .rot13_rot5 import rot13_rot5
 from reedsolo import RSCodec
 
 
-def get_metadata(config, file_path, file_size, total_baseN_length, sha1hex):
+def get_metadata(config, file_path, file_size, total_baseN_length, sha1hex, tree_hash_hex):
     """
     Returns the metadata.
     """
@@ -20,7 +20,8 @@ def get_metadata(config, file_path, file_size, total_baseN_length, sha1hex):
                      f"{sub_delim}{os.path.basename(file_path)}"
                      f"{sub_delim}{file_size}"
                      f"{sub_delim}{total_baseN_length}"
-                     f"{sub_delim}{sha1hex}"
+                     f"{sub_delim}{sha1hex or ''}"
+                     f"{sub_delim}{tree_hash_hex}"
                      f"{main_delim}")
 
     # ------------------------------------------------
@@ -0,0 +1,24 @@
+import os
+
+
+def open_for_positional_write(file_path, file_size=None):
+    """Opens (creating it if needed) `file_path` for positional writes, preallocated to `file_size` bytes if given."""
+    fd = os.open(file_path, os.O_WRONLY | os.O_CREAT | getattr(os, 'O_BINARY', 0), 0o644)
+    if file_size is not None:
+        os.ftruncate(fd, file_size)
+    return fd
+
+
+def positional_write(fd, data, offset):
+    """Writes `data` at `offset` without moving a shared file position, so writers can complete in any order."""
+    data = memoryview(data)
+    if hasattr(os, 'pwrite'):
+        while data:
+            written = os.pwrite(fd, data, offset)
+            data = data[written:]
+            offset += written
+    else:  # Windows has no pwrite, every process opens its own descriptor, so lseek + write is safe there
+        os.lseek(fd, offset, os.SEEK_SET)
+        while data:
+            written = os.write(fd, data)
+            data = data[written:]
@@ -1,19 +1,33 @@
 import sys
+from typing import NamedTuple, Optional
 import numpy as np
 import numba
 from .determine_color_key import determine_color_key
 from .content_type import ContentType
+from .frame_strip import check_frame_strip
 
-# Global dictionary to carry over partial chunks across frames
+# Global dictionary to carry over partial chunks across frames, only used when frames are not chunk aligned
+# (allow_byte_to_be_split_between_frames = True), which ties the decoding to an ordered, single process.
 carry_over_chunk = {}
 
 
+class DecodedFrame(NamedTuple):
+    """A frame decoded by process_frame_optimized(...)."""
+    frame_index: int
+    # The decoded chunks' bytes, joined into a str or bytearray if asked to
+    output_data: object
+    total_baseN_length: Optional[int]
+    output_length: int
+    # The (sequence_number, crc_matches) of the frame's header strip, None for frames without one
+    frame_check: Optional[tuple]
+
+
 def get_chunks(data, size):
     for i in range(0, len(data), size):
         yield data[i:i + size], i
 
 
-@numba.njit
+@numba.njit(nogil=True)
 def extract_baseN_data_numba(start_height: int, start_width: int, box_step: int, usable_w: int, usable_h: int, databoxes_per_frame: int,
                              frame_to_decode: np.ndarray, encoding_color_map_keys: np.ndarray, encoding_color_map_values: np.ndarray,
                              encoding_color_map_values_lower_bounds: np.ndarray, encoding_color_map_values_upper_bounds: np.ndarray,
@@ -63,6 +77,8 @@ def extract_baseN_data_numba(start_height: int, start_width: int, box_step: int,
 def process_frame_optimized(args):
     """
     Optimized frame processing with correct chunk carry-over handling.
+    Chunk aligned frames are decoded statelessly, so they can be processed by any worker in any order.
+    Returns a DecodedFrame.
     """
     global carry_over_chunk
 
@@ -83,37 +99,46 @@ def process_frame_optimized(args):
     premetadata_metadata_main_delimiter = config_params["premetadata_metadata_main_delimiter"]
     premetadata_metadata_sub_delimiter = config_params["premetadata_metadata_sub_delimiter"]
     length_of_digits_to_represent_size = config_params["length_of_digits_to_represent_size"]
+    frames_are_chunk_aligned = config_params["frames_are_chunk_aligned"]
+    frame_strip_databoxes = config_params["frame_strip_databoxes"]
 
     is_last_frame = (frame_index + 1 >= (num_frames - frame_step + 1))
-    frames_consumed = ((frame_index - 1 - frames_traversed) // frame_step) if is_last_frame else 0
-    data_index = frames_consumed * databoxes_per_frame if is_last_frame else 0
+    frames_consumed = ((frame_index - frames_traversed) // frame_step) if is_last_frame else 0
+    # The header strip boxes come before the payload, they don't count towards total_baseN_length
+    data_index = frames_consumed * databoxes_per_frame - frame_strip_databoxes if is_last_frame else 0
 
-    extracted_baseN_ascii = extract_baseN_data_numba(start_height, start_width, box_step, usable_w, usable_h, databoxes_per_frame, frame_to_decode,
-                                                     encoding_color_map_keys, encoding_color_map_values, encoding_color_map_values_lower_bounds,
+    extracted_baseN_ascii = extract_baseN_data_numba(start_height, start_width, box_step, usable_w, usable_h,
+                                                     databoxes_per_frame + frame_strip_databoxes, frame_to_decode, encoding_color_map_keys,
+                                                     encoding_color_map_values, encoding_color_map_values_lower_bounds,
                                                      encoding_color_map_values_upper_bounds, total_baseN_length, data_index, is_last_frame)
 
     # Convert all ASCII codes to character values first
     extracted_baseN_values = extracted_baseN_ascii.tobytes().decode('ascii')
 
+    # (sequence_number, crc_matches) from the frame's header strip, if it has one
+    frame_check = None
+    if frame_strip_databoxes:
+        frame_check = check_frame_strip(extracted_baseN_values[:frame_strip_databoxes], extracted_baseN_values[frame_strip_databoxes:],
+                                        decoding_function, encoding_chunk_size)
+        extracted_baseN_values = extracted_baseN_values[frame_strip_databoxes:]
+
     # Use `extracted_baseN_values` instead of `extracted_baseN_ascii`
     output_data = []
-    extracted_baseN_values_len = len(extracted_baseN_values)
 
-    # Carry over partial chunk from the previous frame as bytes
-    previous_chunk = carry_over_chunk.get(frame_index - 1, "")
+    # Carry over partial chunk from the previous frame, it completes the first chunk of this frame
+    if not frames_are_chunk_aligned:
+        extracted_baseN_values = carry_over_chunk.pop(frame_index - frame_step, "") + extracted_baseN_values
 
+    extracted_baseN_values_len = len(extracted_baseN_values)
     baseN_data_counter = 0
 
     for chunk_slice, index in get_chunks(extracted_baseN_values, encoding_chunk_size):
         # If last chunk is incomplete, carry it over
         if index + encoding_chunk_size > extracted_baseN_values_len:
-            carry_over_chunk[frame_index] = extracted_baseN_values[index:]
+            if not frames_are_chunk_aligned:
+                carry_over_chunk[frame_index] = extracted_baseN_values[index:]
             break
 
-        if previous_chunk:
-            chunk_slice = previous_chunk + chunk_slice
-            previous_chunk = ""
-
         try:
             # decoding_function expects a string
             decoded_value = decoding_function(chunk_slice)  # Now passing string directly
@@ -146,4 +171,4 @@ def process_frame_optimized(args):
         output_data = b"".join(output_data).decode("utf-8")
     elif convert_return_output_data == "bytearray":
         output_data = bytearray(b''.join(output_data))
-    return (frame_index, output_data, total_baseN_length, len(output_data))
+    return DecodedFrame(frame_index, output_data, total_baseN_length, len(output_data), frame_check)
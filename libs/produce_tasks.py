@@ -1,16 +1,30 @@
+import time
+
+
 #############################################################################
 # A GENERATOR that yields tasks to the pool from the queue.
 #############################################################################
-def produce_tasks(frame_queue, stop_event, config_params, content_type, frame_step, total_baseN_length, num_frames, metadata_frames,
-                  convert_return_output_data):
+def produce_tasks(frame_queue,
+                  stop_event,
+                  config_params,
+                  content_type,
+                  frame_step,
+                  total_baseN_length,
+                  num_frames,
+                  metadata_frames,
+                  convert_return_output_data,
+                  metrics=None):
     """
     Takes items from the frame_queue (pushed by the reader thread),
     and yields them in the format that process_frame_optimized(...) expects:
        (config_params, frame_to_decode, frame_index, frame_step, 
         total_baseN_length, num_frames, metadata_frames)
+    With `metrics` (PipelineMetrics), the seconds spent waiting on the frame_queue are counted.
     """
     while not stop_event.is_set():
+        start_time = time.perf_counter()
         item = frame_queue.get()
+        metrics and metrics.wait("frame_queue", time.perf_counter() - start_time)
         if item is None:
             # End of stream
             break
@@ -0,0 +1,178 @@
+import os
+import io
+import sys
+import glob
+import json
+import time
+import pstats
+import cProfile
+import threading
+import numba
+from multiprocessing import util
+from . import process_frame_optimized as process_frame_optimized_module
+
+# Per process profiling state, set up by enable_profiling(...) in the parent and by the pool initializer in the workers
+profile_dir = None
+profiled_name = None
+profiled_pid = None
+profiles = []
+kernel_times = {}
+kernel_times_lock = threading.Lock()
+
+# The numba kernels called from Python, (module, name), a kernel called from another kernel (determine_color_key) is typed
+# and compiled into it, so it can neither be replaced in its module's globals nor timed on its own
+NUMBA_KERNELS = ((process_frame_optimized_module, "extract_baseN_data_numba"), )
+
+
+def start_profiling(directory, name):
+    """
+    Profiles the calling thread, dumped into `directory` as <name>.<pid>.<thread id>.pstats by dump_profiles().
+    From Python 3.12 on, a profiler sees every thread of its process and only one can run at a time,
+    so threads started while another one runs are counted by it instead.
+    """
+    profile = cProfile.Profile()
+    try:
+        profile.enable()
+    except ValueError:
+        return
+    profiles.append((f"{name}.{os.getpid()}.{threading.get_ident()}", profile))
+
+
+def timed_kernel(name, kernel):
+    """
+    Returns `kernel` (a numba dispatcher) counting its calls and seconds into kernel_times, which cProfile can't tell apart
+    from their caller's. Calls compiling a new signature are counted as compile seconds.
+    """
+
+    def call(*args, **kwargs):
+        signatures = len(kernel.signatures)
+        start_time = time.perf_counter()
+        result = kernel(*args, **kwargs)
+        seconds = time.perf_counter() - start_time
+        with kernel_times_lock:
+            times = kernel_times.setdefault(name, [0, 0.0, 0.0])
+            if len(kernel.signatures) != signatures:
+                times[2] += seconds
+            else:
+                times[0] += 1
+                times[1] += seconds
+        return result
+
+    call.kernel = kernel
+    return call
+
+
+def time_numba_kernels():
+    for module, name in NUMBA_KERNELS:
+        kernel = getattr(module, name)
+        if isinstance(kernel, numba.core.dispatcher.Dispatcher):
+            setattr(module, name, timed_kernel(f"{module.__name__}.{name}", kernel))
+
+
+def enable_profiling(directory, name):
+    """Profiles the calling thread and times the numba kernels of this process, see start_profiling(...) and timed_kernel(...)."""
+    global profile_dir, profiled_name, profiled_pid, profiles, kernel_times
+
+    # A forked worker inherits its parent's profilers and counts, which are the parent's to dump
+    if profiled_pid != os.getpid():
+        for _, profile in profiles:
+            profile.disable()
+        profiles = []
+        kernel_times = {}
+    profile_dir = directory
+    profiled_name = name
+    profiled_pid = os.getpid()
+    os.makedirs(directory, exist_ok=True)
+    time_numba_kernels()
+    start_profiling(directory, name)
+
+
+def dump_profiles():
+    """Stops the profilers of this process and dumps their stats, and the numba kernel times, into the profile_dir."""
+    if profile_dir is None or profiled_pid != os.getpid():
+        return
+    for profile_name, profile in profiles:
+        profile.disable()
+        profile.dump_stats(os.path.join(profile_dir, f"{profile_name}.pstats"))
+    profiles.clear()
+    if kernel_times:
+        with open(os.path.join(profile_dir, f"{profiled_name}.{profiled_pid}.numba.json"), "w", encoding="utf-8") as f:
+            json.dump(kernel_times, f)
+    kernel_times.clear()
+
+
+def init_profiled_worker(directory, name, initializer=None, initargs=()):
+    """Pool initializer, profiles the worker process (dumped when it exits, the pool must be closed and joined, not terminated) and calls `initializer`."""
+    enable_profiling(directory, name)
+    util.Finalize(None, dump_profiles, exitpriority=10)
+    if initializer is not None:
+        initializer(*initargs)
+
+
+def profiled_initializer(name, initializer=None, initargs=(), threads=False):
+    """
+    Returns the (initializer, initargs) of a pool, or of a ThreadPoolExecutor with `threads`, whose workers are profiled
+    as `name` when this process is (see enable_profiling(...)), `initializer` and `initargs` unchanged otherwise.
+    """
+    if profile_dir is None or profiled_pid != os.getpid():
+        return initializer, initargs
+    if threads:
+        return start_profiling, (profile_dir, name)
+    return init_profiled_worker, (profile_dir, name, initializer, initargs)
+
+
+def start_profiling_run(directory, name):
+    """Clears the stats of a previous run from `directory` and profiles this process as `name`, its pools' workers with it."""
+    for file_path in glob.glob(os.path.join(directory, "*.pstats")) + glob.glob(os.path.join(directory, "*.numba.json")):
+        os.remove(file_path)
+    enable_profiling(directory, name)
+
+
+def finish_profiling_run(top=30):
+    """Dumps this process' stats and writes the report of the run, merging every process' stats, see write_profile_report(...)."""
+    directory = profile_dir
+    dump_profiles()
+    return write_profile_report(directory, top)
+
+
+def write_profile_report(directory, top=30):
+    """
+    Merges the stats dumped into `directory` per process name (the parent, its pool workers...) into one report, profile_report.txt:
+    the numba kernel times summed over the processes, then every name's `top` functions by their own time.
+    Every name's merged stats are written too, <name>.merged.pstats, for pstats or snakeviz. Returns the report path.
+    """
+    stats_paths = {}
+    for stats_path in sorted(glob.glob(os.path.join(directory, "*.pstats"))):
+        name = os.path.basename(stats_path).split(".")[0]
+        if not stats_path.endswith(".merged.pstats"):
+            stats_paths.setdefault(name, []).append(stats_path)
+
+    kernels = {}
+    for kernel_times_path in sorted(glob.glob(os.path.join(directory, "*.numba.json"))):
+        name = os.path.basename(kernel_times_path).split(".")[0]
+        with open(kernel_times_path, "r", encoding="utf-8") as f:
+            for kernel, (calls, seconds, compile_seconds) in json.load(f).items():
+                totals = kernels.setdefault((name, kernel), [0, 0.0, 0.0, 0])
+                totals[0] += calls
+                totals[1] += seconds
+                totals[2] += compile_seconds
+                totals[3] += 1
+
+    report = io.StringIO()
+    report.write("Numba kernels (compiled code, cProfile counts it as its caller's own time)\n")
+    report.write(f"{'process':>16} {'kernel':>60} {'processes':>10} {'calls':>10} {'seconds':>10} {'ms/call':>9} {'compile s':>10}\n")
+    for (name, kernel), (calls, seconds, compile_seconds, processes) in sorted(kernels.items()):
+        report.write(f"{name:>16} {kernel:>60} {processes:>10} {calls:>10} {seconds:>10.3f} "
+                     f"{seconds / calls * 1e3 if calls else 0.0:>9.3f} {compile_seconds:>10.3f}\n")
+
+    for name, paths in stats_paths.items():
+        stats = pstats.Stats(*paths, stream=report)
+        stats.dump_stats(os.path.join(directory, f"{name}.merged.pstats"))
+        report.write(f"\n{'=' * 100}\n{name}: {len(paths)} profiled thread(s)/process(es)\n")
+        stats.strip_dirs().sort_stats("tottime").print_stats(top)
+
+    report_path = os.path.join(directory, "profile_report.txt")
+    with open(report_path, "w", encoding="utf-8") as f:
+        f.write(report.getvalue())
+    print(f"Profile report written at: {report_path}", file=sys.stderr)
+    return report_path
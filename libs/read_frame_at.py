@@ -0,0 +1,32 @@
+import cv2
+from bisect import bisect_right
+
+# Without a frame index, targets up to this many frames ahead are reached by grabbing forward instead of seeking
+MAX_FORWARD_GRABS = 250
+
+
+def read_frame_at(cap, frame_index, keyframe_frames=None):
+    """
+    Returns the frame at `frame_index` of `cap` (None if it can't be read), leaving `cap` right after it.
+    A target ahead of the capture is reached by grab()-ing forward, unless a seek is cheaper: a seek decodes
+    forward from the keyframe before the target, so it only pays off when that keyframe is past the current position.
+    `keyframe_frames`, the sorted presentation frames of the keyframes (from the frame index), tells exactly where they are.
+    """
+    position = int(cap.get(cv2.CAP_PROP_POS_FRAMES))
+
+    if keyframe_frames:
+        keyframe_position = bisect_right(keyframe_frames, frame_index)
+        keyframe_before_target = keyframe_frames[keyframe_position - 1] if keyframe_position > 0 else 0
+        grab_forward = position <= frame_index and keyframe_before_target <= position
+    else:
+        grab_forward = position <= frame_index <= position + MAX_FORWARD_GRABS
+
+    if grab_forward:
+        for _ in range(frame_index - position):
+            if not cap.grab():
+                return None
+    else:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, frame_index)
+
+    ret, frame = cap.read()
+    return frame if ret else None
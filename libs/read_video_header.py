@@ -0,0 +1,61 @@
+import math
+import cv2
+from .content_type import ContentType
+from .check_video_file import check_video_file
+from .count_frames import count_frames
+from .build_config_params import build_config_params
+from .config_loader import apply_video_layout, LEGACY_VIDEO_LAYOUT
+from .get_file_metadata import find_binary_header, read_text_header
+from .Metadata import Metadata
+from .read_frame_at import read_frame_at
+from .calibration import fit_calibration_palette, apply_calibration_palette
+
+
+def read_video_header(config, video_path, debug=False):
+    """
+    Opens `video_path` and reads its pre_metadata and metadata frames.
+    Returns (cap, num_frames, video_config, config_params, metadata_frames, file_metadata), `cap` is left open for the caller,
+    positioned right after the last header frame it read, `num_frames` counts the frames up to the end of the content.
+    `video_config` is `config` with the layout the video was encoded with (see binary_header.BINARY_HEADER_LAYOUT_FLAGS):
+    the one its binary header records, and the legacy layout for text headers, whatever `config` says.
+    With a calibration frame, the calibration group following the header is read too: config_params' color lookup tables
+    are rebuilt from the colors it shows and `metadata_frames` counts it, so it still is where the content starts.
+    """
+    cap = cv2.VideoCapture(video_path)
+    check_video_file(config, cap)
+    num_frames = count_frames(video_path)
+    print(f"Number of frames: {num_frames}")
+
+    # The header frames are drawn with the palette too, a binary header not read with the decoder's one is tried with the other one
+    palette_config = config
+    header = find_binary_header(cap, build_config_params(palette_config)["PREMETADATA"], num_frames, debug)
+    if header is None:
+        palette_config = apply_video_layout(config, {'gray_coded_palette': not config['gray_coded_palette']})
+        header = find_binary_header(cap, build_config_params(palette_config)["PREMETADATA"], num_frames, debug)
+    if header is not None:
+        video_config = apply_video_layout(palette_config, header.pop("layout"))
+        metadata_frames = config['total_frames_repetition'][ContentType.PREMETADATA.value]
+        file_metadata = Metadata()
+        file_metadata.metadata.update(header)
+        print(file_metadata) if debug else None
+    else:
+        video_config = apply_video_layout(config, LEGACY_VIDEO_LAYOUT)
+        config_params = build_config_params(video_config)
+        metadata_frames, file_metadata = read_text_header(cap, config_params["PREMETADATA"], config_params["METADATA"], num_frames, debug)
+    config_params = build_config_params(video_config)
+
+    # The content ends where the header says it does, anything after it (e.g. the header trailer) is not content,
+    # and frames are labelled by where they were encoded, even if the platform dropped or added some
+    content_config_params = config_params["DATACONTENT"]
+    if video_config["calibration_frame"]:
+        calibration_frame = read_frame_at(cap, metadata_frames + content_config_params["pick_frame_to_read"] - 1)
+        if calibration_frame is None:
+            cap.release()
+            raise ValueError("Calibration frame could not be read.")
+        apply_calibration_palette(config_params, fit_calibration_palette(calibration_frame, content_config_params, video_config["color_threshold"]))
+        metadata_frames += content_config_params["total_frames_repetition"]
+        print(f"Color lookup tables fitted to the calibration frame") if debug else None
+
+    data_frames = math.ceil(file_metadata.metadata["total_baseN_length"] / content_config_params["databoxes_per_frame"])
+    num_frames = metadata_frames + data_frames * content_config_params["total_frames_repetition"]
+    return cap, num_frames, video_config, config_params, metadata_frames, file_metadata
@@ -0,0 +1,27 @@
+from .read_frame_at import read_frame_at
+from .process_frame_optimized import process_frame_optimized
+
+
+def reread_data_frame(cap, process_frame_args, pick_frame_to_read):
+    """
+    Decodes the other copies of a data frame whose header strip CRC failed, the other frames of its repetition group,
+    with the same process_frame_optimized(...) arguments (frame_index still being the picked frame).
+    Returns the DecodedFrame of the first copy whose CRC matches, None if none of them does.
+    Needs chunk aligned frames, the copies are decoded out of the stream's order.
+    """
+    config_params, content_type, _, frame_index, frame_step = process_frame_args[:5]
+    group_start = frame_index - (pick_frame_to_read - 1)
+
+    for copy_index in range(group_start, group_start + frame_step):
+        if copy_index == frame_index:
+            continue
+        frame_to_decode = read_frame_at(cap, copy_index)
+        if frame_to_decode is None:
+            break
+        decoded_frame = process_frame_optimized((config_params, content_type, frame_to_decode) + tuple(process_frame_args[3:]))
+        if decoded_frame.frame_check is not None and decoded_frame.frame_check[1]:
+            print(f"Data frame at frame {frame_index} failed its CRC, recovered from its copy at frame {copy_index}")
+            return decoded_frame
+
+    print(f"Data frame at frame {frame_index} failed its CRC in all {frame_step} copies")
+    return None
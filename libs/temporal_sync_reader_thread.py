@@ -0,0 +1,131 @@
+#############################################################################
+# A THREAD that finds the repetition groups from the frames themselves
+#    and pushes the cleanest frame of every group into the frame queue.
+#############################################################################
+import math
+import cv2
+import numpy as np
+from .read_frame_at import MAX_FORWARD_GRABS
+
+# Boxes sampled per frame for its signature
+SIGNATURE_SAMPLES = 4096
+# A sampled box whose channel moved by more than this counts as changed
+BOX_CHANGE_THRESHOLD = 64
+
+
+def sample_box_grid(frame, config_params):
+    """Returns the frame's signature, the colors at the centers of an evenly strided subset of its data boxes (int16, for differences)."""
+    box_step = config_params["box_step"]
+    boxes = (config_params["usable_w"] // box_step) * (config_params["usable_h"] // box_step)
+    sample_step = box_step * max(1, int(math.sqrt(boxes / SIGNATURE_SAMPLES)))
+    start_y, start_x = config_params["start_height"] + box_step // 2, config_params["start_width"] + box_step // 2
+    return frame[start_y:config_params["start_height"] + config_params["usable_h"]:sample_step,
+                 start_x:config_params["start_width"] + config_params["usable_w"]:sample_step].astype(np.int16)
+
+
+def changed_box_fraction(signature, previous_signature):
+    """Returns the fraction of sampled boxes that changed color between two signatures."""
+    return np.count_nonzero(np.abs(signature - previous_signature).max(axis=2) > BOX_CHANGE_THRESHOLD) / signature.shape[0] / signature.shape[1]
+
+
+def pick_cleanest_frame(group_frames, group_signatures):
+    """Returns the frame of a repetition group closest to the group's per box median, the one least touched by codec noise or blending."""
+    median_signature = np.median(np.stack(group_signatures), axis=0)
+    return group_frames[int(np.argmin([np.abs(signature - median_signature).sum() for signature in group_signatures]))]
+
+
+def temporal_sync_reader_thread(cap,
+                                config_params,
+                                frame_queue,
+                                stop_event,
+                                sync_start,
+                                start_index,
+                                end_index,
+                                frame_step,
+                                boundary_fraction,
+                                frame_ring=None,
+                                debug=False):
+    """
+    Reads every frame from `sync_start` (a frame inside the header's last repetition group) onwards and splits them into
+    repetition groups wherever more than `boundary_fraction` of the sampled boxes change, instead of trusting that
+    the picked frame of group k is at start_index + k * frame_step. The first group, the rest of the header, is skipped,
+    so the content's start is found the same way.
+    Every content group's cleanest frame is enqueued under that canonical frame index, so the decoding stays unchanged.
+    A group is at least half of frame_step long (a transition frame doesn't start one). Consecutive groups showing the same frame
+    (identical data frames, e.g. a zero filled region) have no boundary between them, so a run between two boundaries is split
+    into round(run length / frame_step) groups, its leading frame_step frames are emitted as a group once it is 2 * frame_step long.
+    With a `frame_ring` (SharedFrameRing), the frame is copied into a shared memory slot and (index, slot_index) is enqueued.
+    With `debug`, the frames read and the groups found are printed once done.
+    Once done, enqueues None to signal end.
+    """
+    position = int(cap.get(cv2.CAP_PROP_POS_FRAMES))
+    if position <= sync_start <= position + MAX_FORWARD_GRABS:
+        for _ in range(sync_start - position):
+            cap.grab()
+    else:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, sync_start)
+
+    min_group_frames = max(1, frame_step // 2)
+    # The header group is labelled one step before the content's first group, and never emitted
+    frame_index = start_index - frame_step
+    group_frames, group_signatures = [], []
+    read_frames = 0
+
+    def emit_group(frames, signatures):
+        frame = pick_cleanest_frame(frames, signatures)
+        if frame_ring is not None:
+            slot_index = frame_ring.acquire(frame_index, stop_event)
+            if slot_index is None:
+                return False
+            frame_ring.slots[slot_index][...] = frame
+            frame_queue.put((frame_index, slot_index))
+        else:
+            frame_queue.put((frame_index, frame))
+        return True
+
+    def emit_run(frames, signatures):
+        """Emits a run of frames as round(len(frames) / frame_step) groups (at least one), returns False once stopped."""
+        nonlocal frame_index
+        groups = max(1, round(len(frames) / frame_step))
+        for group in range(groups):
+            first_frame, end_frame = group * len(frames) // groups, (group + 1) * len(frames) // groups
+            if frame_index > end_index:
+                break
+            if not emit_group(frames[first_frame:end_frame], signatures[first_frame:end_frame]):
+                return False
+            frame_index += frame_step
+        return True
+
+    while not stop_event.is_set() and frame_index <= end_index:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        read_frames += 1
+        signature = sample_box_grid(frame, config_params)
+
+        is_boundary = bool(group_frames) and changed_box_fraction(signature, group_signatures[-1]) > boundary_fraction
+        if frame_index < start_index:
+            if is_boundary:
+                frame_index += frame_step
+                group_frames, group_signatures = [], []
+        elif is_boundary and len(group_frames) >= min_group_frames:
+            if not emit_run(group_frames, group_signatures):
+                break
+            group_frames, group_signatures = [], []
+        elif len(group_frames) >= 2 * frame_step:
+            # The run goes on past two groups, its leading frame_step frames are a group whatever its length turns out to be
+            if not emit_run(group_frames[:frame_step], group_signatures[:frame_step]):
+                break
+            group_frames, group_signatures = group_frames[frame_step:], group_signatures[frame_step:]
+
+        group_frames.append(frame)
+        group_signatures.append(signature)
+
+    if group_frames and start_index <= frame_index <= end_index and not stop_event.is_set():
+        emit_run(group_frames, group_signatures)
+
+    print(f"temporal_sync_reader_thread: read {read_frames} frames, "
+          f"found {(frame_index - start_index) // frame_step} repetition groups") if debug else None
+
+    # Signal that we're done reading frames:
+    frame_queue.put(None)
@@ -0,0 +1,32 @@
+from collections import deque
+from concurrent.futures import wait, FIRST_COMPLETED
+
+
+def thread_pool_imap(executor, func, iterable, max_pending, ordered=True):
+    """
+    Lazy counterpart of Pool.imap / Pool.imap_unordered for a ThreadPoolExecutor.
+    Unlike executor.map(...), it keeps at most `max_pending` tasks submitted, so a
+    generator fed by a bounded queue is consumed at the pace of the workers.
+    """
+    pending = deque() if ordered else set()
+
+    for item in iterable:
+        future = executor.submit(func, item)
+        if ordered:
+            pending.append(future)
+            if len(pending) >= max_pending:
+                yield pending.popleft().result()
+        else:
+            pending.add(future)
+            if len(pending) >= max_pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+
+    while pending:
+        if ordered:
+            yield pending.popleft().result()
+        else:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
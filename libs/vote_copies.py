@@ -0,0 +1,38 @@
+import numpy as np
+
+
+def get_copy_offsets(pick_frame_to_read, frame_step, vote_copies):
+    """
+    Returns the offsets, from the picked frame, of the `vote_copies` frames of a repetition group
+    closest to the picked frame (which is always one of them), in ascending order.
+    """
+    group_offsets = range(1 - pick_frame_to_read, frame_step - pick_frame_to_read + 1)
+    return sorted(sorted(group_offsets, key=abs)[:max(1, vote_copies)])
+
+
+def sample_block_grid(frame, config_params):
+    """
+    Returns the frame reduced to one pixel per data box, sampled the way determine_color_key(...) samples a box:
+    its center pixel, or the average of its 4 center pixels for an even box_step.
+    """
+    box_step = config_params["box_step"]
+    start_y, start_x = config_params["start_height"], config_params["start_width"]
+    end_y, end_x = start_y + config_params["usable_h"], start_x + config_params["usable_w"]
+    half = box_step // 2
+
+    if box_step % 2 == 1:
+        return frame[start_y + half:end_y:box_step, start_x + half:end_x:box_step]
+
+    center_y, center_x = start_y + half - 1, start_x + half - 1
+    block_grid = frame[center_y:end_y:box_step, center_x:end_x:box_step].astype(np.uint16)
+    block_grid += frame[center_y:end_y:box_step, center_x + 1:end_x:box_step]
+    block_grid += frame[center_y + 1:end_y:box_step, center_x:end_x:box_step]
+    block_grid += frame[center_y + 1:end_y:box_step, center_x + 1:end_x:box_step]
+    return (block_grid // 4).astype(np.uint8)
+
+
+def vote_block_grids(block_grids):
+    """Returns the per box, per channel median of the copies' block grids, decode it with block_grid_config_params(...)."""
+    if len(block_grids) == 1:
+        return block_grids[0]
+    return np.median(np.stack(block_grids), axis=0).astype(np.uint8)
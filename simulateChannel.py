@@ -0,0 +1,130 @@
+import argparse
+import json
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+import ffmpeg
+import decodeVids
+from libs.channel_simulator import CHANNEL_PROFILES, simulate_channel, get_video_duration, count_symbol_errors
+from libs.corruption_map import find_differing_ranges
+
+
+def decode_video(video_path, decode_dir, decoded_path_sender):
+    """
+    Decodes `video_path` into `decode_dir`, keeping the file even when it fails its check, so it can be compared with the original,
+    and sends its path (relative to `decode_dir`) through `decoded_path_sender`. The pipeline metrics are not exported,
+    they would be written next to the decoded file.
+    """
+    os.chdir(decode_dir)
+    decodeVids.config['pipeline_metrics'] = False
+    decoded_path_sender.send(decodeVids.process_images(video_path, keep_failed_file=True))
+
+
+def make_decode_dir(config):
+    """Returns a scratch directory to decode in, holding the config.ini and the files it refers to, which the decoder reads from its working directory."""
+    decode_dir = tempfile.mkdtemp(prefix="simulate_channel_")
+    for file_path in ("config.ini", config['encoding_map_path']):
+        os.makedirs(os.path.join(decode_dir, os.path.dirname(file_path)), exist_ok=True)
+        shutil.copy(file_path, os.path.join(decode_dir, file_path))
+    return decode_dir
+
+
+def measure_decode(config, video_path, original_path, video_seconds):
+    """Decodes `video_path` in a process of its own (the decoder exits on unreadable videos) and compares the result with the original."""
+    decode_dir = make_decode_dir(config)
+    decoded_path_receiver, decoded_path_sender = multiprocessing.Pipe(duplex=False)
+    try:
+        start_time = time.perf_counter()
+        process = multiprocessing.Process(target=decode_video, args=(os.path.abspath(video_path), decode_dir, decoded_path_sender))
+        process.start()
+        process.join()
+        decode_seconds = time.perf_counter() - start_time
+
+        # Nothing is sent when the decoder exits on an unreadable video
+        decoded_path = os.path.join(decode_dir, decoded_path_receiver.recv()) if decoded_path_receiver.poll() else None
+        decoded = decoded_path is not None and os.path.exists(decoded_path)
+        original_size = os.path.getsize(original_path)
+        if decoded:
+            starts, ends = find_differing_ranges(original_path, decoded_path)
+            differing_bytes = int((ends - starts).sum())
+            symbol_errors, symbols = count_symbol_errors(original_path, decoded_path, config['encoding_bits_per_value'])
+        else:
+            differing_bytes = original_size
+            symbol_errors, symbols = count_symbol_errors(original_path, os.devnull, config['encoding_bits_per_value'])
+    finally:
+        decoded_path_receiver.close()
+        decoded_path_sender.close()
+        shutil.rmtree(decode_dir, ignore_errors=True)
+
+    return {
+        "decodable": decoded and differing_bytes == 0,
+        "decode_seconds": decode_seconds,
+        "differing_bytes": differing_bytes,
+        "symbol_errors": symbol_errors,
+        "box_error_rate": symbol_errors / symbols if symbols else 0.0,
+        # Payload bytes delivered intact per second of video, what a platform upload of this config carries
+        "goodput_bytes_per_second": (original_size - differing_bytes) / video_seconds if video_seconds else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Re-encodes a finished encode the way a platform would (downscaling, yuv420p at a bitrate or crf, VP9/H.264, "
+        "frame rate resampling) and reports how the decoder copes: box error rate and goodput, per channel profile.")
+    parser.add_argument("video_path", help="The merged video, next to its frame index sidecar.")
+    parser.add_argument("original_path", help="The file encoded in the video, the decoded files are compared against it.")
+    parser.add_argument("--profiles", nargs="+", default=list(CHANNEL_PROFILES), choices=list(CHANNEL_PROFILES))
+    parser.add_argument("--no-reference", action="store_true", help="Skip decoding the video as it is, before any channel.")
+    parser.add_argument("--keep-videos", action="store_true", help="Keep the re-encoded videos, next to the original one.")
+    parser.add_argument("--json", help="File to write the report to, as JSON.")
+    args = parser.parse_args()
+
+    for file_path in (args.video_path, args.original_path):
+        if not os.path.exists(file_path):
+            print(f"File not found: {file_path}", file=sys.stderr)
+            sys.exit(1)
+
+    config = decodeVids.config
+    video_stem = os.path.splitext(args.video_path)[0]
+    report = []
+    profiles = ([] if args.no_reference else [None]) + args.profiles
+    for profile_name in profiles:
+        if profile_name is None:
+            channel_video_path, channel_seconds = args.video_path, 0.0
+        else:
+            # Next to the original video, so the decoder finds the frame index sidecar
+            channel_video_path = f"{video_stem}.{profile_name}.mkv"
+            start_time = time.perf_counter()
+            try:
+                simulate_channel(args.video_path, channel_video_path, config['frame_width'], config['frame_height'], CHANNEL_PROFILES[profile_name])
+            except ffmpeg.Error as e:
+                print(f"The {profile_name} channel failed: {e.stderr.decode(errors='replace')[-2000:]}", file=sys.stderr)
+                continue
+            channel_seconds = time.perf_counter() - start_time
+
+        video_seconds = get_video_duration(channel_video_path)
+        result = {
+            "profile": profile_name or "reference",
+            "video_bytes": os.path.getsize(channel_video_path),
+            "video_seconds": video_seconds,
+            "channel_seconds": channel_seconds,
+            **measure_decode(config, channel_video_path, args.original_path, video_seconds),
+        }
+        report.append(result)
+        if profile_name is not None and not args.keep_videos:
+            os.remove(channel_video_path)
+
+    print(f"{'profile':>12} {'video MB':>9} {'decodable':>10} {'box errors':>11} {'bad bytes':>10} {'goodput kB/s':>13} {'decode s':>9}")
+    for result in report:
+        print(f"{result['profile']:>12} {result['video_bytes'] / 1e6:>9.2f} {str(result['decodable']):>10} {result['box_error_rate']:>11.4%} "
+              f"{result['differing_bytes']:>10} {result['goodput_bytes_per_second'] / 1e3:>13.2f} {result['decode_seconds']:>9.2f}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
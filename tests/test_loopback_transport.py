@@ -0,0 +1,27 @@
+import os
+import numpy as np
+import pytest
+from libs.config_loader import load_config, apply_video_layout, LEGACY_VIDEO_LAYOUT
+from libs.loopback_transport import loopback_round_trip
+
+REPOSITORY_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def config(monkeypatch):
+    # The config refers to the encoding map relative to the repository root
+    monkeypatch.chdir(REPOSITORY_DIR)
+    return load_config("config.ini")
+
+
+@pytest.mark.parametrize("layout", [{}, LEGACY_VIDEO_LAYOUT], ids=["shipped", "legacy"])
+@pytest.mark.parametrize("size", [0, 1, 1000, 300 * 1024 + 7])
+def test_round_trip_on_the_lossless_channel(config, layout, size):
+    config = apply_video_layout(config, layout)
+    payload = np.random.default_rng(size).integers(0, 256, size, dtype=np.uint8).tobytes()
+
+    decoded, stats = loopback_round_trip(config, payload, "none")
+
+    assert decoded == payload
+    assert stats["symbol_errors"] == 0
+    assert stats["crc_failed_frames"] == 0
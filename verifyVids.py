@@ -0,0 +1,28 @@
+import argparse
+import json
+import sys
+import decodeVids
+from libs.profiling import start_profiling_run, finish_profiling_run
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Checks that a video decodes to the file encoded in it, without writing the file.")
+    parser.add_argument("video_path")
+    parser.add_argument("--json", help="File to write the verification report to, as JSON.")
+    parser.add_argument("--debug", action="store_true")
+    parser.add_argument("--profile",
+                        metavar="DIR",
+                        help="Profile this process and its pool workers, their stats and a merged report (profile_report.txt) are written to DIR.")
+    args = parser.parse_args()
+
+    args.profile and start_profiling_run(args.profile, "verify")
+    report = decodeVids.process_images(args.video_path, args.debug, verify_only=True)
+    args.profile and finish_profiling_run()
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=4)
+    sys.exit(0 if report["decodable"] else 1)
+
+
+if __name__ == "__main__":
+    main()